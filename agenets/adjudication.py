@@ -0,0 +1,203 @@
+"""
+Adjudication Engine - Vectorized claim payout calculation.
+For every claim the insurer pays the amount above the policy deductible, capped
+by the coverage still remaining after earlier approved/closed claims on the
+same policy; inactive policies and denied claims pay nothing. Claims are
+processed as NumPy columns, so one claim for the agent tool and a what-if run
+over the whole claims book share the same code.
+
+Usage:
+    python agenets/adjudication.py                                   # adjudicate the sample store
+    python agenets/adjudication.py --synthetic 5000000 --deductible-multiplier 1.5
+"""
+
+import argparse
+import json
+import time
+from datetime import date
+from typing import Any, Dict
+
+import numpy as np
+
+import metrics
+from date_index import to_ordinal
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Claims that have used up coverage
+PAID_STATUSES = ("Approved", "Closed")
+
+# Decision codes, in order of precedence
+DECISIONS = ("covered", "coverage_limited", "coverage_exhausted", "below_deductible",
+             "denied", "policy_inactive", "policy_not_found")
+COVERED, COVERAGE_LIMITED, COVERAGE_EXHAUSTED, BELOW_DEDUCTIBLE, DENIED, POLICY_INACTIVE, POLICY_NOT_FOUND = range(7)
+
+
+def adjudicate_arrays(policy_row: np.ndarray, amount: np.ndarray, filed: np.ndarray, paid: np.ndarray,
+                      denied: np.ndarray, coverage: np.ndarray, deductible: np.ndarray,
+                      active: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute payouts for claims given as parallel arrays.
+
+    Args:
+        policy_row: Row of each claim's policy in the policy arrays (-1 when the policy is unknown)
+        amount: Claimed amounts
+        filed: Filing date ordinals; earlier claims on a policy use up coverage first
+        paid: True for approved/closed claims (they reduce the coverage of later claims)
+        denied: True for denied claims
+        coverage: Coverage amount per policy
+        deductible: Deductible per policy
+        active: True for active policies
+
+    Returns:
+        Column name -> array, one row per claim: deductible_applied, remaining_coverage (before the claim),
+        payout, customer_responsibility and decision (index into DECISIONS)
+    """
+    policy_row = np.asarray(policy_row, dtype=np.int64)
+    amount = np.asarray(amount, dtype=np.float64)
+    count = len(amount)
+    known = policy_row >= 0
+    # Unknown policies read a zero-coverage, inactive sentinel row
+    rows = np.where(known, policy_row, len(coverage))
+    coverage = np.append(np.asarray(coverage, dtype=np.float64), 0.0)[rows]
+    deductible = np.append(np.asarray(deductible, dtype=np.float64), 0.0)[rows]
+    active = np.append(np.asarray(active, dtype=bool), False)[rows]
+
+    # Approved/closed amounts filed earlier on the same policy: exclusive running sum per policy
+    # One int64 sort key (policy, filing date) sorts ~2x faster than lexsort on two keys
+    filed = np.asarray(filed, dtype=np.int64)
+    first_day = filed.min() if count else 0
+    order = np.argsort(rows * (filed.max() - first_day + 1 if count else 1) + (filed - first_day), kind="stable")
+    sorted_rows = rows[order]
+    paid_amount = np.where(np.asarray(paid, dtype=bool), amount, 0.0)[order]
+    running = np.cumsum(paid_amount) - paid_amount
+    group_start = np.ones(count, dtype=bool)
+    group_start[1:] = sorted_rows[1:] != sorted_rows[:-1]
+    start_index = np.maximum.accumulate(np.where(group_start, np.arange(count), 0))
+    prior_paid = np.empty(count)
+    prior_paid[order] = running - running[start_index]
+
+    remaining = np.maximum(coverage - prior_paid, 0.0)
+    deductible_applied = np.minimum(deductible, amount)
+    eligible = amount - deductible_applied
+    payable = known & active & ~np.asarray(denied, dtype=bool)
+    payout = np.where(payable, np.minimum(eligible, remaining), 0.0)
+
+    decision = np.select(
+        [~known, ~active, np.asarray(denied, dtype=bool), eligible <= 0, remaining <= 0, payout < eligible],
+        [POLICY_NOT_FOUND, POLICY_INACTIVE, DENIED, BELOW_DEDUCTIBLE, COVERAGE_EXHAUSTED, COVERAGE_LIMITED],
+        default=COVERED,
+    ).astype(np.int8)
+    return {
+        "deductible_applied": deductible_applied,
+        "remaining_coverage": remaining,
+        "payout": np.round(payout, 2),
+        "customer_responsibility": np.round(amount - payout, 2),
+        "decision": decision,
+    }
+
+
+def adjudicate_claims(claims: Dict[str, Dict[str, Any]], policies: Dict[str, Dict[str, Any]],
+                      deductible_multiplier: float = 1.0, coverage_multiplier: float = 1.0) -> Dict[str, np.ndarray]:
+    """
+    Adjudicate store records: gathers claim and policy columns, then calls adjudicate_arrays.
+
+    Args:
+        claims: claim_id -> claim record (policy_id, amount, status, claim_date/created_date)
+        policies: policy_id -> policy record (coverage_amount, deductible, status)
+        deductible_multiplier: What-if scaling of every deductible
+        coverage_multiplier: What-if scaling of every coverage amount
+
+    Returns:
+        The adjudicate_arrays columns, one row per claim in the order of `claims`
+    """
+    policy_rows = {policy_id: row for row, policy_id in enumerate(policies)}
+    records = list(claims.values())
+    today = date.today().toordinal()
+    return adjudicate_arrays(
+        np.fromiter((policy_rows.get(claim.get("policy_id"), -1) for claim in records), dtype=np.int64),
+        np.fromiter((float(claim.get("amount") or 0) for claim in records), dtype=np.float64),
+        np.fromiter((to_ordinal(claim.get("claim_date") or claim.get("created_date")) or today
+                     for claim in records), dtype=np.int64),
+        np.fromiter((claim.get("status") in PAID_STATUSES for claim in records), dtype=bool),
+        np.fromiter((claim.get("status") == "Denied" for claim in records), dtype=bool),
+        np.fromiter((float(p.get("coverage_amount") or 0) for p in policies.values()), dtype=np.float64)
+        * coverage_multiplier,
+        np.fromiter((float(p.get("deductible") or 0) for p in policies.values()), dtype=np.float64)
+        * deductible_multiplier,
+        np.fromiter((p.get("status", "Active") == "Active" for p in policies.values()), dtype=bool),
+    )
+
+
+def summarize(amount: np.ndarray, result: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Book-level totals of an adjudication run."""
+    decisions = np.bincount(result["decision"], minlength=len(DECISIONS))
+    return {
+        "claims": len(amount),
+        "total_claimed": round(float(np.sum(amount)), 2),
+        "total_payout": round(float(result["payout"].sum()), 2),
+        "total_customer_responsibility": round(float(result["customer_responsibility"].sum()), 2),
+        "decisions": {name: int(n) for name, n in zip(DECISIONS, decisions) if n},
+    }
+
+
+def synthetic_book(claims: int, policies: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Random claims and policies for batch what-if runs."""
+    rng = np.random.default_rng(seed)
+    return {
+        "policy_row": rng.integers(0, policies, claims),
+        "amount": np.round(rng.lognormal(8.0, 1.2, claims), 2),
+        "filed": rng.integers(date(2015, 1, 1).toordinal(), date(2025, 1, 1).toordinal(), claims),
+        "paid": rng.random(claims) < 0.6,
+        "denied": rng.random(claims) < 0.05,
+        "coverage": rng.choice([50_000.0, 100_000.0, 250_000.0, 500_000.0], policies),
+        "deductible": rng.choice([0.0, 250.0, 500.0, 1000.0, 2000.0], policies),
+        "active": rng.random(policies) < 0.9,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adjudicate the claims book (optionally with what-if terms)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Adjudicate N random claims instead of the store")
+    parser.add_argument("--policies", type=int, default=0, help="Policies in the synthetic book (default claims / 4)")
+    parser.add_argument("--deductible-multiplier", type=float, default=1.0)
+    parser.add_argument("--coverage-multiplier", type=float, default=1.0)
+    parser.add_argument("--out", default=None, help="Write all payout columns to this .npz file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        book = synthetic_book(args.synthetic, args.policies or max(1, args.synthetic // 4))
+        book["deductible"] = book["deductible"] * args.deductible_multiplier
+        book["coverage"] = book["coverage"] * args.coverage_multiplier
+        claim_ids, amount = None, book["amount"]
+        start = time.perf_counter()
+        result = adjudicate_arrays(**book)
+    else:
+        from langgraph.store.memory import InMemoryStore
+        from inmemory_store import bootstrap_memory_store, claims_namespace, policies_namespace, search_all
+        store = InMemoryStore()
+        bootstrap_memory_store(store)
+        claims = {item.key: item.value for item in search_all(store, claims_namespace)}
+        policies = {item.key: item.value for item in search_all(store, policies_namespace)}
+        claim_ids = list(claims)
+        amount = np.array([float(claim.get("amount") or 0) for claim in claims.values()])
+        start = time.perf_counter()
+        result = adjudicate_claims(claims, policies, args.deductible_multiplier, args.coverage_multiplier)
+    elapsed = time.perf_counter() - start
+    metrics.observe("adjudication.batch_ms", elapsed * 1000)
+
+    if args.out:
+        np.savez(args.out, **result)
+    summary = summarize(amount, result)
+    summary["seconds"] = round(elapsed, 3)
+    if claim_ids is not None:
+        summary["payouts"] = {
+            claim_id: {"payout": float(payout), "decision": DECISIONS[decision]}
+            for claim_id, payout, decision in zip(claim_ids, result["payout"], result["decision"])
+        }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
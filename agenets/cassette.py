@@ -0,0 +1,441 @@
+"""
+LLM Cassettes - Record real chat-model traffic and replay it offline.
+RecordingChatModel wraps a real model (ChatOpenAI) and appends every response,
+with its latency, to a gzip-compressed JSONL cassette keyed by a hash of the
+prompt. Each entry is written as its own gzip member, so a killed process
+leaves every earlier entry readable. A process that finds the cassette being
+recorded by another one (forked workers) records to "<path>.<pid>" instead;
+loading merges those files. ReplayChatModel answers from the cassette instead of the network, either
+at full speed or with the recorded latencies, so the tool, store and
+serialization overhead of real traces can be measured without API cost.
+
+Prompts are matched exactly first, then structurally (tool results, call IDs and
+the bound tool subset ignored), because replayed tools run against a different
+store state and the per-turn tool selection may differ from the recording.
+
+Usage:
+    LLM_CASSETTE=traffic.jsonl.gz python chat_with_agent.py          # record
+    python agenets/cassette.py info --path traffic.jsonl.gz
+    python agenets/cassette.py replay --path traffic.jsonl.gz --latency-scale 1
+"""
+
+import argparse
+import asyncio
+import atexit
+import fcntl
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+import metrics
+from resilience import record_call
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+FORMAT = "agenets-cassette"
+# Version 2: structural hashes no longer include the bound tool names
+FORMAT_VERSION = 2
+
+
+class CassetteMissError(LookupError):
+    """Raised when a replayed prompt has no recorded response."""
+
+
+def _message_key(message: BaseMessage, structural: bool) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"type": message.type}
+    if isinstance(message, ToolMessage) and structural:
+        entry["name"] = message.name
+    else:
+        entry["content"] = message.content
+    if isinstance(message, AIMessage) and message.tool_calls:
+        # Call IDs are generated per run; names and arguments identify the call
+        entry["tool_calls"] = [[call["name"], call.get("args", {})] for call in message.tool_calls]
+    return entry
+
+
+def prompt_hash(messages: Sequence[BaseMessage], tool_names: Sequence[str] = (), structural: bool = False) -> str:
+    """
+    Hash of a model request.
+
+    Args:
+        messages: Prompt messages
+        tool_names: Names of the tools bound to the model
+        structural: Ignore tool-result contents and the bound tools (match the shape of the conversation only)
+    """
+    payload = json.dumps([[_message_key(m, structural) for m in messages], [] if structural else sorted(tool_names)],
+                         sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _tool_names(tools: Optional[List[Dict[str, Any]]]) -> List[str]:
+    return [tool["function"]["name"] for tool in tools or []]
+
+
+def _turn_question(messages: Sequence[BaseMessage]) -> Optional[str]:
+    """The human question when a request starts a new turn."""
+    if messages and isinstance(messages[-1], HumanMessage):
+        content = messages[-1].content
+        return content if isinstance(content, str) else json.dumps(content)
+    return None
+
+
+def cassette_files(path: str) -> List[str]:
+    """The cassette file and the per-process files recorded next to it."""
+    others = [name for name in glob.glob(glob.escape(path) + ".*") if name.rsplit(".", 1)[1].isdigit()]
+    return ([path] if os.path.exists(path) else []) + sorted(others, key=lambda name: int(name.rsplit(".", 1)[1]))
+
+
+def _read_lines(path: str) -> Tuple[List[str], bool]:
+    """Complete lines of a cassette file, and whether it ended cleanly (not cut off by a killed process)."""
+    lines: List[str] = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    return lines, False
+                lines.append(line)
+    except (EOFError, gzip.BadGzipFile, zlib.error):
+        return lines, False
+    return lines, True
+
+
+def _member(line: str) -> bytes:
+    return gzip.compress(line.encode("utf-8"))
+
+
+class Cassette:
+    """
+    Recorded model responses in a gzip-compressed JSONL file.
+
+    Args:
+        path: Cassette file; existing entries (with those of per-process files) are loaded, new ones appended
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, List[int]] = defaultdict(list)
+        self._by_structure: Dict[str, List[int]] = defaultdict(list)
+        self._used: set = set()
+        # Recorded latency of the responses handed out since the last rewind
+        self.replayed_latency_ms = 0.0
+        self._writer = None
+        self._writer_pid = None
+        files = cassette_files(path)
+        for file in files:
+            self._load(file)
+        if files:
+            logger.info(f"Loaded {len(self.entries)} recorded responses from {', '.join(files)}")
+
+    def _load(self, path: str) -> None:
+        lines, complete = _read_lines(path)
+        if not lines:
+            return
+        header = json.loads(lines[0])
+        if header.get("format") != FORMAT or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} cassette")
+        for line in lines[1:]:
+            if line.strip():
+                self._index(json.loads(line))
+        if not complete:
+            logger.warning(f"{path} ends in a partly written entry; loaded the complete ones")
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        position = len(self.entries)
+        self.entries.append(entry)
+        self._by_key[entry["key"]].append(position)
+        self._by_structure[entry["structure"]].append(position)
+
+    def _open_writer(self) -> None:
+        """Lock the cassette file for appending, or this process's own file when another process holds it."""
+        for path in (self.path, f"{self.path}.{os.getpid()}"):
+            writer = open(path, "ab")
+            try:
+                fcntl.flock(writer, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                writer.close()
+        else:
+            raise RuntimeError(f"Another process is recording to {path}")
+        lines, complete = _read_lines(path)
+        if not complete:
+            # Appending after a cut-off entry would make the rest of the file unreadable
+            logger.warning(f"Rewriting {path} without its partly written last entry")
+            os.ftruncate(writer.fileno(), 0)
+            writer.write(b"".join(_member(line) for line in lines))
+            writer.flush()
+        if os.fstat(writer.fileno()).st_size == 0:
+            writer.write(_member(json.dumps({"format": FORMAT, "version": FORMAT_VERSION}) + "\n"))
+        self._writer, self._writer_pid = writer, os.getpid()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Append an entry to the file as a complete gzip member, so a crash keeps every earlier entry."""
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                # A forked child must not share its parent's file and lock
+                self._writer = None
+                self._open_writer()
+            self._writer.write(_member(line))
+            self._writer.flush()
+            self._index(entry)
+
+    def lookup(self, key: str, structure: str) -> Optional[Dict[str, Any]]:
+        """
+        Next unused response for a prompt: exact hash first, then structural hash.
+        A prompt seen more often than recorded reuses its last response.
+        """
+        with self._lock:
+            for candidates, match in ((self._by_key.get(key), "exact"), (self._by_structure.get(structure), "structural")):
+                if not candidates:
+                    continue
+                position = next((p for p in candidates if p not in self._used), candidates[-1])
+                self._used.add(position)
+                self.replayed_latency_ms += self.entries[position]["latency_ms"]
+                metrics.incr("cassette.hits", match=match)
+                return self.entries[position]
+        metrics.incr("cassette.misses")
+        return None
+
+    def rewind(self) -> None:
+        """Make every recorded response available again (for repeated replays)."""
+        with self._lock:
+            self._used.clear()
+            self.replayed_latency_ms = 0.0
+
+    def turns(self) -> List[Dict[str, str]]:
+        """Recorded conversation turns in order: [{"thread": ..., "question": ...}, ...]."""
+        return [{"thread": entry.get("thread") or "default", "question": entry["question"]}
+                for entry in self.entries if entry.get("question") is not None]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is not None and self._writer_pid == os.getpid():
+                self._writer.close()
+            self._writer = self._writer_pid = None
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str) -> Cassette:
+    """Process-wide cassette per path (all model tiers share one file)."""
+    path = os.path.abspath(path)
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+def close_cassettes() -> None:
+    """Close the recording files of every cassette opened with get_cassette (runs at exit)."""
+    with _cassettes_lock:
+        cassettes = list(_cassettes.values())
+    for cassette in cassettes:
+        cassette.close()
+
+
+atexit.register(close_cassettes)
+
+
+class _CassetteModel(BaseChatModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Cassette
+    model_name: str = "cassette"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+
+class RecordingChatModel(_CassetteModel):
+    """Calls the wrapped model and records each response with its latency."""
+
+    inner: BaseChatModel
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-recorder"
+
+    def _bound_inner(self, tools: Optional[List[Dict[str, Any]]]):
+        return self.inner.bind_tools(tools) if tools else self.inner
+
+    def _record(self, messages: List[BaseMessage], tools, response: AIMessage, latency_s: float, run_manager) -> None:
+        names = _tool_names(tools)
+        entry = {
+            "key": prompt_hash(messages, names),
+            "structure": prompt_hash(messages, names, structural=True),
+            "thread": (getattr(run_manager, "metadata", None) or {}).get("thread_id"),
+            "question": _turn_question(messages),
+            "model": self.model_name,
+            "latency_ms": round(latency_s * 1000, 1),
+            "response": message_to_dict(response),
+        }
+        # Of a hedged call, only the attempt whose response the agent uses is recorded
+        record_call(lambda: self.cassette.record(entry))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        response = self._bound_inner(tools).invoke(messages, stop=stop, **kwargs)
+        self._record(messages, tools, response, time.perf_counter() - start, run_manager)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        response = await self._bound_inner(tools).ainvoke(messages, stop=stop, **kwargs)
+        self._record(messages, tools, response, time.perf_counter() - start, run_manager)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+class ReplayChatModel(_CassetteModel):
+    """
+    Answers from a cassette instead of calling a model.
+
+    latency_scale: 0 replays at full speed, 1 sleeps for the recorded latency, 0.5 for half of it
+    """
+
+    latency_scale: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _replay(self, messages: List[BaseMessage], tools) -> Dict[str, Any]:
+        names = _tool_names(tools)
+        entry = self.cassette.lookup(prompt_hash(messages, names), prompt_hash(messages, names, structural=True))
+        if entry is None:
+            question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+            raise CassetteMissError(f"No recorded response for prompt in turn {str(question)[:80]!r}")
+        return entry
+
+    @staticmethod
+    def _result(entry: Dict[str, Any]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=messages_from_dict([entry["response"]])[0])])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        entry = self._replay(messages, tools)
+        if self.latency_scale:
+            time.sleep(entry["latency_ms"] / 1000 * self.latency_scale)
+        return self._result(entry)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        entry = self._replay(messages, tools)
+        if self.latency_scale:
+            await asyncio.sleep(entry["latency_ms"] / 1000 * self.latency_scale)
+        return self._result(entry)
+
+
+def replay_turns(cassette: Cassette, latency_scale: float = 0.0,
+                 tool_selection: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Replay every recorded turn through a fresh agent and store, timing the non-model overhead.
+
+    The agent routes through a ModelRouter with the same per-turn tool selection
+    as the production router, so prompts bind the tools they were recorded with.
+
+    Args:
+        cassette: Recorded responses
+        latency_scale: Share of the recorded latency to sleep per response
+        tool_selection: Bind per-turn tool subsets (default: on unless TOOL_SELECTION=off)
+
+    Returns:
+        Turn count, misses, wall time, replayed model time and overhead per turn
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from inmemory_store import bootstrap_memory_store
+    from insurance_tools import TOOLS
+    from model_router import LARGE_TIER, SMALL_TIER, ModelRouter, ModelTier
+    from simple_agent import build_agent
+    from tool_selection import ToolSelector, tool_selection_enabled
+
+    if tool_selection is None:
+        tool_selection = tool_selection_enabled()
+
+    def model():
+        return ReplayChatModel(cassette=cassette, latency_scale=latency_scale)
+
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    router = ModelRouter({SMALL_TIER: ModelTier(SMALL_TIER, model), LARGE_TIER: ModelTier(LARGE_TIER, model)},
+                         TOOLS, tool_selector=ToolSelector(TOOLS) if tool_selection else None)
+    agent = build_agent(model=router, store=store, checkpointer=InMemorySaver())
+    cassette.rewind()
+    turn_ms, misses = [], 0
+    start = time.perf_counter()
+    for turn in cassette.turns():
+        turn_start = time.perf_counter()
+        try:
+            agent.invoke({"messages": [HumanMessage(content=turn["question"])]},
+                         config={"configurable": {"thread_id": turn["thread"]}})
+        except CassetteMissError as e:
+            misses += 1
+            logger.warning(str(e))
+        turn_ms.append((time.perf_counter() - turn_start) * 1000)
+    wall_ms = (time.perf_counter() - start) * 1000
+    recorded_ms = cassette.replayed_latency_ms
+    model_ms = recorded_ms * latency_scale
+    turn_ms.sort()
+    return {
+        "turns": len(turn_ms),
+        "misses": misses,
+        "wall_ms": round(wall_ms, 1),
+        "recorded_model_ms": round(recorded_ms, 1),
+        "replayed_model_ms": round(model_ms, 1),
+        "overhead_ms": round(wall_ms - model_ms, 1),
+        "overhead_ms_per_turn": round((wall_ms - model_ms) / len(turn_ms), 2) if turn_ms else 0.0,
+        "turn_ms_p50": round(turn_ms[len(turn_ms) // 2], 2) if turn_ms else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay LLM cassettes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info_parser = subparsers.add_parser("info", help="Summarize a cassette")
+    info_parser.add_argument("--path", required=True)
+    replay_parser = subparsers.add_parser("replay", help="Replay recorded turns through the agent offline")
+    replay_parser.add_argument("--path", required=True)
+    replay_parser.add_argument("--latency-scale", type=float, default=0.0,
+                               help="0 = full speed, 1 = recorded latencies")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.path)
+    if args.command == "info":
+        usage = [entry["response"].get("data", {}).get("usage_metadata") or {} for entry in cassette.entries]
+        report = {
+            "responses": len(cassette.entries),
+            "turns": len(cassette.turns()),
+            "threads": len({turn["thread"] for turn in cassette.turns()}),
+            "models": sorted({entry.get("model") for entry in cassette.entries}),
+            "recorded_model_ms": round(sum(entry["latency_ms"] for entry in cassette.entries), 1),
+            "input_tokens": sum(u.get("input_tokens", 0) for u in usage),
+            "output_tokens": sum(u.get("output_tokens", 0) for u in usage),
+            "file_bytes": sum(os.path.getsize(path) for path in cassette_files(args.path)),
+        }
+    else:
+        report = replay_turns(cassette, args.latency_scale)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Change Log - Append-only change-data-capture stream for store writes.
+Every put to a watched namespace (claims, policies) becomes an event with a
+monotonically increasing offset. Events are kept in file segments (JSONL) so
+consumers can replay from any offset, and live consumers can subscribe with
+an async iterator instead of re-scanning the store.
+
+Events of one record are appended in the order their writes were committed,
+and values written by transactions carry their committed _version.
+
+Usage:
+    python agenets/change_log.py tail --dir ./changelog --from-offset 0
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, PutOp
+
+import metrics
+from inmemory_store import VERSION_FIELD, commit_transaction
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+
+# Event op telling consumers that records were loaded from a snapshot file instead of logged
+SNAPSHOT_OP = "snapshot"
+
+_CAPTURE_STRIPES = 256
+
+
+class ChangeLog:
+    """
+    Offset-addressed event log with optional on-disk segments.
+
+    Args:
+        directory: Folder for segment files; None keeps events in memory only
+        segment_size: Events per segment file before rolling to a new one
+        memory_retention: Events kept in memory (all replay source when directory is None)
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_size: int = 10000,
+                 memory_retention: int = 100000):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._recent: deque = deque(maxlen=memory_retention)
+        self._lock = threading.Lock()
+        self._subscribers: List[tuple] = []
+        self._segment_file = None
+        self._segment_count = 0
+        self._next_offset = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._recover()
+
+    # ---- segments ---------------------------------------------------------
+
+    def _segment_bases(self) -> List[int]:
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def _segment_path(self, base_offset: int) -> str:
+        return os.path.join(self.directory, f"{base_offset:020d}{SEGMENT_SUFFIX}")
+
+    def _recover(self) -> None:
+        """Resume offsets after the last complete event of the newest segment."""
+        bases = self._segment_bases()
+        if not bases:
+            return
+        count = 0
+        with open(self._segment_path(bases[-1]), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    json.loads(line)
+                    count += 1
+                except json.JSONDecodeError:
+                    break  # torn write from a crash
+        self._next_offset = bases[-1] + count
+        # Start a fresh segment; a torn tail in the old one is never read past
+        self._segment_count = self.segment_size
+        logger.info(f"Change log recovered at offset {self._next_offset} from {self.directory}")
+
+    def _write_to_segment(self, event: Dict[str, Any]) -> None:
+        if self._segment_file is None or self._segment_count >= self.segment_size:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_file = open(self._segment_path(event["offset"]), "a", encoding="utf-8")
+            self._segment_count = 0
+        self._segment_file.write(json.dumps(event, default=str) + "\n")
+        self._segment_file.flush()
+        self._segment_count += 1
+
+    # ---- producing --------------------------------------------------------
+
+    def append(self, namespace: tuple, key: str, value: Optional[Dict[str, Any]], op: Optional[str] = None) -> int:
+        """Append a put (or delete when value is None) and return its offset."""
+        with self._lock:
+            event = {
+                "offset": self._next_offset,
+                "ts": time.time(),
+                "namespace": list(namespace),
+                "key": key,
+                "op": op or ("delete" if value is None else "put"),
+                "value": value,
+            }
+            self._next_offset += 1
+            if self.directory:
+                self._write_to_segment(event)
+            self._recent.append(event)
+            # Queued under the lock, so every subscriber receives events in offset order
+            for loop, queue in self._subscribers:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        metrics.incr("changelog.events", namespace=namespace[0])
+        return event["offset"]
+
+    def mark_snapshot(self, path: str) -> int:
+        """
+        Record that the store was loaded from a snapshot file rather than from logged puts.
+
+        A consumer replaying from offset 0 loads the snapshot at this event and
+        applies the events after it.
+        """
+        return self.append((SNAPSHOT_OP,), os.path.abspath(path), None, op=SNAPSHOT_OP)
+
+    @property
+    def next_offset(self) -> int:
+        return self._next_offset
+
+    # ---- consuming --------------------------------------------------------
+
+    def read(self, from_offset: int = 0, to_offset: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Replay events with from_offset <= offset < to_offset (default: up to now)."""
+        end = self._next_offset if to_offset is None else to_offset
+        with self._lock:
+            oldest_in_memory = self._recent[0]["offset"] if self._recent else self._next_offset
+            recent = list(self._recent) if from_offset >= oldest_in_memory else None
+        if recent is not None:
+            for event in recent:
+                if from_offset <= event["offset"] < end:
+                    yield event
+            return
+        if not self.directory:
+            raise ValueError(f"Offset {from_offset} is no longer retained in memory")
+
+        bases = self._segment_bases()
+        start_index = max(0, bisect.bisect_right(bases, from_offset) - 1)
+        for base in bases[start_index:]:
+            if base >= end:
+                return
+            with open(self._segment_path(base), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if event["offset"] >= end:
+                        return
+                    if event["offset"] >= from_offset:
+                        yield event
+
+    async def subscribe(self, from_offset: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async iterator over events: replays history from `from_offset` (if given),
+        then yields live events as they are appended.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((loop, queue))
+            live_from = self._next_offset
+        try:
+            expected = live_from
+            if from_offset is not None and from_offset < live_from:
+                for event in self.read(from_offset, live_from):
+                    yield event
+            while True:
+                event = await queue.get()
+                if event["offset"] < expected:
+                    continue
+                expected = event["offset"] + 1
+                yield event
+        finally:
+            with self._lock:
+                self._subscribers.remove((loop, queue))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+
+
+class ChangeCapturingStore(BaseStore):
+    """
+    BaseStore wrapper that appends every put to watched namespaces to a ChangeLog.
+
+    Events are appended after the backend accepted the write, so wrap the durable
+    store. Under a WriteBehindStore, puts are captured when the flusher commits
+    them, and writes coalesced within one grouped commit produce a single event
+    with the latest value of the record.
+
+    A write and its event happen under a lock on the record, so events of one
+    record reach the log in commit order.
+    """
+
+    def __init__(self, backend: BaseStore, change_log: ChangeLog,
+                 namespaces: Iterable[tuple] = (("claims",), ("policies",))):
+        self.backend = backend
+        self.change_log = change_log
+        self.namespaces = {tuple(ns) for ns in namespaces}
+        self._stripes = [threading.Lock() for _ in range(_CAPTURE_STRIPES)]
+
+    def _watched(self, keys: Iterable[Tuple[tuple, str]]) -> List[Tuple[tuple, str]]:
+        return [(tuple(namespace), key) for namespace, key in keys if tuple(namespace) in self.namespaces]
+
+    @contextmanager
+    def _locked(self, keys: List[Tuple[tuple, str]]):
+        # Fixed order, so two writers of overlapping records cannot deadlock
+        stripes = sorted({hash(key) % _CAPTURE_STRIPES for key in keys})
+        for index in stripes:
+            self._stripes[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(stripes):
+                self._stripes[index].release()
+
+    def _capture(self, ops: List[Any]) -> None:
+        for op in ops:
+            if isinstance(op, PutOp) and tuple(op.namespace) in self.namespaces:
+                self.change_log.append(tuple(op.namespace), op.key, op.value)
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        watched = self._watched((op.namespace, op.key) for op in ops if isinstance(op, PutOp))
+        if not watched:
+            return self.backend.batch(ops)
+        with self._locked(watched):
+            results = self.backend.batch(ops)
+            self._capture(ops)
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        if not any(isinstance(op, PutOp) and tuple(op.namespace) in self.namespaces for op in ops):
+            return await self.backend.abatch(ops)
+        # Record locks are thread locks; hold them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, ops)
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        """Commit a transaction through the backend and capture its writes, stamped with their committed versions."""
+        with self._locked(self._watched(writes)):
+            versions = commit_transaction(self.backend, read_versions, writes)
+            self._capture([PutOp(namespace, key, {**value, VERSION_FIELD: versions[(namespace, key)]})
+                           for (namespace, key), value in writes.items()])
+        return versions
+
+    def __getattr__(self, name):
+        # Expose wrapped-store helpers such as flush()/close()
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+
+def find_change_log(store) -> Optional[ChangeLog]:
+    """The change log capturing a store's writes, from its wrapper layers (None if not captured here)."""
+    while store is not None:
+        if isinstance(store, ChangeCapturingStore):
+            return store.change_log
+        store = getattr(store, "backend", None)
+    return None
+
+
+def changes_since(store, from_offset: Optional[int] = None) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Writes captured for a store since an offset.
+
+    Stores owned by another process answer from the owning process's log.
+
+    Args:
+        store: Store (or wrapped store) whose writes are captured
+        from_offset: First offset to return; None returns only the current position
+
+    Returns:
+        (next offset, events) or None when the store's writes are not captured
+
+    Raises:
+        ValueError: If from_offset is no longer retained
+    """
+    log = find_change_log(store)
+    if log is None:
+        remote = getattr(store, "changes_since", None)
+        return remote(from_offset) if remote is not None else None
+    end = log.next_offset
+    if from_offset is None or from_offset >= end:
+        return end, []
+    return end, list(log.read(from_offset, end))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a change log directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    tail_parser = subparsers.add_parser("tail", help="Print events from an offset")
+    tail_parser.add_argument("--dir", required=True)
+    tail_parser.add_argument("--from-offset", type=int, default=0)
+    args = parser.parse_args()
+
+    log = ChangeLog(args.dir)
+    for event in log.read(args.from_offset):
+        print(json.dumps(event, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Claim Search - BM25 full-text search over claim descriptions.
+An inverted index maps each term to compact posting arrays (claim number and
+term frequency). Queries score only the postings of their terms with NumPy,
+so ranking stays in milliseconds for millions of claims. The index follows the
+store's writes; updates that do not touch the indexed text are skipped, and
+replaced entries are compacted away once they make up a large share.
+"""
+
+import math
+import re
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from index_registry import IndexArrays, IndexRegistry, pack_strings, text_signature, unpack_strings
+from inmemory_store import claims_namespace, search_all
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Claim fields that are searchable
+INDEXED_FIELDS = ("claim_type", "description")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were with any all "
+    "due my me i we our".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords and fold simple plurals."""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class ClaimSearchIndex:
+    """
+    Inverted index with BM25 ranking.
+
+    Args:
+        k1: Term-frequency saturation
+        b: Document-length normalization
+        common_term_fraction: Terms in more than this share of claims only re-rank rarer-term matches
+        compact_fraction: Renumber the live claims once replaced/removed entries exceed this share
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, common_term_fraction: float = 0.5,
+                 compact_fraction: float = 0.3):
+        self.k1 = k1
+        self.b = b
+        self.common_term_fraction = common_term_fraction
+        self.compact_fraction = compact_fraction
+        self._lock = threading.Lock()
+        # term -> (claim numbers, term frequencies), appended in claim-number order;
+        # a loaded index starts with read-only views of its snapshot, copied on the first write
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_lengths = array("I")
+        self._doc_customers = array("I")
+        self._claim_ids: List[str] = []
+        self._claim_numbers: Dict[str, int] = {}
+        # claim ID -> signature of its indexed text and customer, so unchanged claims are not re-indexed
+        self._signatures: Dict[str, int] = {}
+        self._customer_codes: Dict[str, int] = {}
+        self._dead = np.zeros(0, dtype=bool)
+        self._dead_count = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._claim_ids) - self._dead_count
+
+    def add(self, claim_id: str, claim: Dict[str, Any]) -> None:
+        """
+        Index a claim; re-adding an existing claim replaces its previous version.
+        Writes that leave the indexed text and customer unchanged (e.g. a status update) are skipped.
+        """
+        text = " ".join(str(claim.get(field) or "") for field in INDEXED_FIELDS)
+        customer = str(claim.get("user_id", ""))
+        signature = text_signature(text, customer)
+        if self._signatures.get(claim_id) == signature and claim_id in self._claim_numbers:
+            return
+        tokens = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+
+        with self._lock:
+            previous = self._claim_numbers.get(claim_id)
+            if previous is not None:
+                self._mark_dead(previous)
+            self._own_arrays()
+            number = len(self._claim_ids)
+            self._claim_ids.append(claim_id)
+            self._claim_numbers[claim_id] = number
+            self._signatures[claim_id] = signature
+            self._doc_lengths.append(len(tokens))
+            self._doc_customers.append(self._customer_codes.setdefault(customer, len(self._customer_codes)))
+            self._total_length += len(tokens)
+            for term, count in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("I"))
+                elif not isinstance(postings[0], array):
+                    postings = self._postings[term] = (array("I", postings[0].tobytes()),
+                                                       array("I", postings[1].tobytes()))
+                postings[0].append(number)
+                postings[1].append(count)
+            self._maybe_compact()
+
+    def remove(self, claim_id: str) -> None:
+        """Drop a claim from the results."""
+        with self._lock:
+            number = self._claim_numbers.pop(claim_id, None)
+            self._signatures.pop(claim_id, None)
+            if number is not None:
+                self._mark_dead(number)
+                self._maybe_compact()
+
+    def _mark_dead(self, number: int) -> None:
+        if number >= len(self._dead):
+            grown = np.zeros(max(len(self._claim_ids), 2 * len(self._dead), 1024), dtype=bool)
+            grown[:len(self._dead)] = self._dead
+            self._dead = grown
+        if not self._dead[number]:
+            self._dead[number] = True
+            self._dead_count += 1
+            self._total_length -= int(self._doc_lengths[number])
+
+    def _own_arrays(self) -> None:
+        """Copy per-claim arrays that are still snapshot views before appending to them (caller holds the lock)."""
+        if not isinstance(self._doc_lengths, array):
+            self._doc_lengths = array("I", self._doc_lengths.tobytes())
+            self._doc_customers = array("I", self._doc_customers.tobytes())
+
+    def _maybe_compact(self) -> None:
+        if self._dead_count > self.compact_fraction * len(self._claim_ids):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop replaced/removed entries and renumber the live claims (caller holds the lock)."""
+        start = time.perf_counter()
+        total = len(self._claim_ids)
+        dead = np.zeros(total, dtype=bool)
+        dead[:min(total, len(self._dead))] = self._dead[:total]
+        live = np.flatnonzero(~dead)
+        renumber = np.zeros(total, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (term_docs, frequencies) in self._postings.items():
+            docs = np.frombuffer(term_docs, dtype=np.uint32)
+            keep = ~dead[docs]
+            if keep.any():
+                # Renumbering keeps the order, so the posting lists stay sorted
+                postings[term] = (array("I", renumber[docs[keep]].astype(np.uint32).tobytes()),
+                                  array("I", np.frombuffer(frequencies, dtype=np.uint32)[keep].tobytes()))
+        self._postings = postings
+        self._doc_lengths = array("I", np.frombuffer(self._doc_lengths, dtype=np.uint32)[live].tobytes())
+        self._doc_customers = array("I", np.frombuffer(self._doc_customers, dtype=np.uint32)[live].tobytes())
+        self._claim_ids = [self._claim_ids[number] for number in live.tolist()]
+        self._claim_numbers = {claim_id: number for number, claim_id in enumerate(self._claim_ids)}
+        self._dead = np.zeros(0, dtype=bool)
+        self._dead_count = 0
+        metrics.incr("claim_search.compactions")
+        logger.info(f"Compacted claim search index: {total} -> {len(live)} entries "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def add_many(self, claims: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        for claim_id, claim in claims:
+            self.add(claim_id, claim)
+
+    def to_arrays(self) -> IndexArrays:
+        """The live claims as flat arrays (posting lists concatenated in term order) for a snapshot."""
+        with self._lock:
+            if self._dead_count:
+                self._compact()
+            terms = list(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+            offsets[1:] = np.cumsum([len(self._postings[term][0]) for term in terms])
+            docs = [np.frombuffer(self._postings[term][0], dtype=np.uint32) for term in terms]
+            frequencies = [np.frombuffer(self._postings[term][1], dtype=np.uint32) for term in terms]
+            customers = sorted(self._customer_codes, key=self._customer_codes.get)
+            arrays = {
+                "terms": pack_strings(terms),
+                "term_offsets": offsets,
+                "docs": np.concatenate(docs) if docs else np.zeros(0, dtype=np.uint32),
+                "frequencies": np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.uint32),
+                "doc_lengths": np.frombuffer(self._doc_lengths, dtype=np.uint32).copy(),
+                "doc_customers": np.frombuffer(self._doc_customers, dtype=np.uint32).copy(),
+                "claim_ids": pack_strings(self._claim_ids),
+                "signatures": np.array([self._signatures.get(c, 0) for c in self._claim_ids], dtype=np.uint64),
+                "customers": pack_strings(customers),
+            }
+            meta = {"k1": self.k1, "b": self.b, "common_term_fraction": self.common_term_fraction,
+                    "compact_fraction": self.compact_fraction, "terms": len(terms),
+                    "claims": len(self._claim_ids), "customers": len(customers)}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "ClaimSearchIndex":
+        """An index over the arrays of to_arrays(); they may be read-only views of a mapped file."""
+        index = cls(meta["k1"], meta["b"], meta["common_term_fraction"], meta["compact_fraction"])
+        offsets = arrays["term_offsets"].tolist()
+        docs, frequencies = arrays["docs"], arrays["frequencies"]
+        index._postings = {term: (docs[offsets[i]:offsets[i + 1]], frequencies[offsets[i]:offsets[i + 1]])
+                           for i, term in enumerate(unpack_strings(arrays["terms"], meta["terms"]))}
+        index._doc_lengths = arrays["doc_lengths"]
+        index._doc_customers = arrays["doc_customers"]
+        index._claim_ids = unpack_strings(arrays["claim_ids"], meta["claims"])
+        index._claim_numbers = {claim_id: number for number, claim_id in enumerate(index._claim_ids)}
+        index._signatures = dict(zip(index._claim_ids, arrays["signatures"].tolist()))
+        customers = unpack_strings(arrays["customers"], meta["customers"])
+        index._customer_codes = {customer: code for code, customer in enumerate(customers)}
+        index._total_length = int(arrays["doc_lengths"].sum())
+        return index
+
+    def search(self, query: str, limit: int = 10, offset: int = 0,
+               customer_id: Optional[str] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Rank claims for a query.
+
+        Args:
+            query: Free-text query
+            limit: Page size
+            offset: Number of ranked hits to skip
+            customer_id: Only return claims of this customer
+
+        Returns:
+            ([(claim_id, score), ...] for the requested page, total number of matching claims)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        start = time.perf_counter()
+        with self._lock:
+            docs, scores = self._score(terms, customer_id)
+            total = len(docs)
+            wanted = min(offset + limit, total)
+            if wanted <= 0:
+                return [], total
+            # Partial sort: only the top offset+limit hits need ordering
+            top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < total else np.arange(total)
+            top = top[np.lexsort((docs[top], -scores[top]))][offset:wanted]
+            # Claim numbers change when the index is compacted, so map them while holding the lock
+            hits = [(self._claim_ids[docs[i]], float(scores[i])) for i in top]
+        metrics.observe("claim_search.query_ms", (time.perf_counter() - start) * 1000)
+        return hits, total
+
+    def _score(self, terms: List[str], customer_id: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 scores of live matching claims (caller holds the lock; returned arrays are copies)."""
+        empty = (np.zeros(0, dtype=np.uint32), np.zeros(0))
+        total_docs = len(self)
+        present = [(term, self._postings[term]) for term in terms if term in self._postings]
+        if not present or total_docs == 0:
+            return empty
+        average_length = self._total_length / total_docs
+        # Views into the posting arrays must not outlive the lock (appends would fail with BufferError)
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+
+        def term_scores(df: int, term_docs: np.ndarray, frequencies: np.ndarray) -> np.ndarray:
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[term_docs] / average_length)
+            return idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        # Common terms (in most claims) only add to claims matched by the rarer terms,
+        # so "damage" in "water damage" does not force scoring every claim
+        common = [(t, p) for t, p in present if len(p[0]) > self.common_term_fraction * total_docs]
+        driving = [(t, p) for t, p in present if len(p[0]) <= self.common_term_fraction * total_docs]
+        if not driving:
+            driving, common = present, []
+
+        matched_docs, matched_scores = [], []
+        for _, postings in driving:
+            term_docs = np.array(postings[0], dtype=np.uint32)
+            matched_docs.append(term_docs)
+            matched_scores.append(term_scores(len(term_docs), term_docs, np.array(postings[1], dtype=np.float64)))
+        docs = np.concatenate(matched_docs)
+        scores = np.concatenate(matched_scores)
+        if len(matched_docs) > 1:
+            # Sum per-term scores of claims matching several terms (BM25 term scores are always > 0)
+            dense = np.bincount(docs, weights=scores, minlength=len(self._claim_ids))
+            docs = np.flatnonzero(dense).astype(np.uint32)
+            scores = dense[docs]
+
+        keep = np.ones(len(docs), dtype=bool)
+        if self._dead_count:
+            tracked = docs < len(self._dead)
+            keep[tracked] &= ~self._dead[docs[tracked]]
+        if customer_id is not None:
+            code = self._customer_codes.get(customer_id)
+            if code is None:
+                return empty
+            keep &= np.frombuffer(self._doc_customers, dtype=np.uint32)[docs] == code
+        docs, scores = docs[keep], scores[keep]
+
+        for _, postings in common:
+            # Posting lists are sorted by claim number, so membership is a binary search
+            term_docs = np.frombuffer(postings[0], dtype=np.uint32)
+            positions = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+            found = term_docs[positions] == docs
+            frequencies = np.frombuffer(postings[1], dtype=np.uint32)[positions[found]].astype(np.float64)
+            scores[found] += term_scores(len(term_docs), docs[found], frequencies)
+        return docs, scores
+
+
+def _build_index(store) -> ClaimSearchIndex:
+    start = time.perf_counter()
+    index = ClaimSearchIndex()
+    index.add_many((item.key, item.value) for item in search_all(store, claims_namespace))
+    logger.info(f"Built claim search index: {len(index)} claims in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return index
+
+
+def _apply_write(index: ClaimSearchIndex, namespace: tuple, claim_id: str, claim: Optional[Dict[str, Any]]) -> None:
+    if namespace == claims_namespace:
+        if claim is None:
+            index.remove(claim_id)
+        else:
+            index.add(claim_id, claim)
+
+
+_registry = IndexRegistry("claim_search", _build_index, _apply_write,
+                          dump=ClaimSearchIndex.to_arrays, load=ClaimSearchIndex.from_arrays)
+
+
+def get_claim_index(store) -> ClaimSearchIndex:
+    """Return the search index for a store, built from its claims and kept current with its writes."""
+    return _registry.get(store)
+
+
+def index_claim(store, claim_id: str, claim: Dict[str, Any]) -> None:
+    """Add a claim this process just wrote to the store's index (if built; stores with a change log catch up from it)."""
+    _registry.update(store, claims_namespace, claim_id, claim)
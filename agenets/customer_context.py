@@ -0,0 +1,162 @@
+"""
+Customer Context - Pre-rendered profile of the logged-in customer for the system prompt.
+When a session is authenticated (configurable "customer_id"), the customer's
+profile, policies and open claims are read from the store once, rendered into a
+compact block and cached per customer, so the model does not spend its first
+tool calls discovering who it is talking to. Claim writes invalidate the
+customer's cached block; CUSTOMER_CONTEXT_TTL_S (default 300 s) bounds staleness
+from writes made by other processes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import metrics
+from inmemory_store import VERSION_FIELD, claims_namespace, policies_namespace, search_all, user_namespace
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+TTL_S = float(os.environ.get("CUSTOMER_CONTEXT_TTL_S", 300))
+MAX_CUSTOMERS = 10000
+OPEN_CLAIM_STATUSES = ("Processing", "Under Investigation")
+
+
+def _value(item, id_field: Optional[str] = None) -> Dict[str, Any]:
+    value = {k: v for k, v in item.value.items() if k != VERSION_FIELD}
+    if id_field:
+        value[id_field] = item.key
+    return value
+
+
+def render_customer_context(store, customer_id: str) -> Optional[str]:
+    """
+    Compact profile, policies and open claims of a customer (None when the customer does not exist).
+
+    Args:
+        store: Store holding the users, policies and claims namespaces
+        customer_id: Logged-in customer's ID
+    """
+    item = store.get(user_namespace, customer_id)
+    if item is None:
+        return None
+    user = _value(item)
+    owned = {"user_id": customer_id}
+    policies = sorted((_value(p, "policy_id") for p in search_all(store, policies_namespace, filter=owned)),
+                      key=lambda p: p["policy_id"])
+    claims = sorted((_value(c, "claim_id") for c in search_all(store, claims_namespace, filter=owned)),
+                    key=lambda c: c.get("claim_date") or c.get("created_date") or "")
+    open_claims = [c for c in claims if c.get("status") in OPEN_CLAIM_STATUSES]
+
+    lines = [
+        f"Customer {customer_id}: {user.get('name')}, born {user.get('date_of_birth')}, "
+        f"customer since {user.get('join_date')}",
+        f"Contact: {user.get('email')}, {user.get('phone')}, {user.get('address')}",
+        "Policies:" if policies else "Policies: none",
+    ]
+    for policy in policies:
+        lines.append(
+            f"- {policy.get('policy_id')} {policy.get('policy_type')}, {policy.get('status', 'Active')}, "
+            f"{policy.get('start_date')} to {policy.get('end_date')}, "
+            f"coverage ${policy.get('coverage_amount', 0):,.2f}, deductible ${policy.get('deductible', 0):,.2f}, "
+            f"premium ${policy.get('premium', 0):,.2f}"
+        )
+    lines.append("Open claims:" if open_claims else "Open claims: none")
+    for claim in open_claims:
+        filed = claim.get("claim_date") or claim.get("created_date")
+        lines.append(
+            f"- {claim.get('claim_id')} on {claim.get('policy_id')}: ${claim.get('amount', 0):,.2f}, "
+            f"{claim.get('status')}, filed {filed}"
+            + (f", {claim['description']}" if claim.get("description") else "")
+        )
+    resolved = len(claims) - len(open_claims)
+    if resolved:
+        lines.append(f"Resolved claims (approved, closed or denied): {resolved}")
+    return "\n".join(lines)
+
+
+class CustomerContextCache:
+    """
+    Rendered context per customer and store, least recently used first out.
+
+    Keyed by customer rather than conversation thread, so every session of a
+    customer (and every turn of a client that starts a new thread per turn)
+    shares one rendering.
+
+    Args:
+        ttl_s: Seconds a rendered context is reused
+        max_customers: Customers kept before the least recently used is dropped
+    """
+
+    def __init__(self, ttl_s: float = TTL_S, max_customers: int = MAX_CUSTOMERS):
+        self.ttl_s = ttl_s
+        self.max_customers = max_customers
+        # (id(store), customer_id) -> (store, customer_id, rendered, loaded_at)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Any, str, Optional[str], float]]" = OrderedDict()
+        # customer_id -> renders in flight, and invalidations seen while they run
+        self._loading: Dict[str, int] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, store, customer_id: str) -> Optional[str]:
+        """The customer's rendered context, loading it from the store on first use or after invalidation."""
+        key = (id(store), customer_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is store and time.monotonic() - entry[3] <= self.ttl_s:
+                self._entries.move_to_end(key)
+                metrics.incr("customer_context.hits")
+                return entry[2]
+            self._loading[customer_id] = self._loading.get(customer_id, 0) + 1
+            generation = self._generations.get(customer_id, 0)
+        start = time.perf_counter()
+        try:
+            rendered = render_customer_context(store, customer_id)
+        finally:
+            with self._lock:
+                # A write invalidated the customer mid-render, so the rendering may predate it
+                stale = self._generations.get(customer_id, 0) != generation
+                self._loading[customer_id] -= 1
+                if not self._loading[customer_id]:
+                    del self._loading[customer_id]
+                    self._generations.pop(customer_id, None)
+        metrics.observe("customer_context.load_ms", (time.perf_counter() - start) * 1000)
+        if rendered is None:
+            logger.warning(f"Session is logged in as unknown customer {customer_id}")
+        if stale:
+            metrics.incr("customer_context.stale_renders")
+            return rendered
+        with self._lock:
+            self._entries[key] = (store, customer_id, rendered, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_customers:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def invalidate(self, customer_id: str) -> None:
+        """Drop the cached context of a customer in every store (called after writes)."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == customer_id]:
+                del self._entries[key]
+            if customer_id in self._loading:
+                self._generations[customer_id] = self._generations.get(customer_id, 0) + 1
+
+
+_cache = CustomerContextCache()
+
+
+def session_customer_context(store, config: Dict[str, Any]) -> Optional[str]:
+    """Rendered context of the run's logged-in customer (configurable "customer_id"), if any."""
+    configurable = config.get("configurable", {}) if config else {}
+    customer_id = configurable.get("customer_id")
+    if not customer_id or store is None:
+        return None
+    return _cache.get(store, str(customer_id))
+
+
+def invalidate_customer_context(customer_id: str) -> None:
+    """Forget the cached context of a customer after a write to their records."""
+    _cache.invalidate(customer_id)
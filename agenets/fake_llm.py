@@ -0,0 +1,136 @@
+"""
+Offline scripted chat model for benchmarks and load tests.
+Behaves like a tool-calling LLM: it picks tools from the IDs mentioned in the
+question, then summarizes the tool results. No network access required.
+"""
+
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_ID_PATTERN = re.compile(r"\b([upc])(\d+)\b", re.IGNORECASE)
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+_AMOUNT_PATTERN = re.compile(r"\$\s?([\d,]+(?:\.\d+)?)|([\d,]+(?:\.\d+)?)\s*dollars", re.IGNORECASE)
+_CLAIM_STATUSES = ("Under Investigation", "Processing", "Approved", "Closed", "Denied")
+
+
+def _plan_write(question: str) -> Optional[Dict[str, Any]]:
+    """A claim creation or status update the question asks for, if it names everything the tool needs."""
+    lowered = question.lower()
+    ids: Dict[str, str] = {}
+    for prefix, number in _ID_PATTERN.findall(question):
+        ids.setdefault(prefix.lower(), f"{prefix.lower()}{number}")
+    if ("file" in lowered or "new claim" in lowered) and "u" in ids and "p" in ids:
+        amount = _AMOUNT_PATTERN.search(question)
+        if amount:
+            return {"name": "add_new_claim", "args": {
+                "customer_id": ids["u"], "policy_id": ids["p"],
+                "amount": float((amount.group(1) or amount.group(2)).replace(",", "")),
+                "description": question}}
+    if ("update" in lowered or "mark" in lowered) and "c" in ids:
+        status = next((s for s in _CLAIM_STATUSES if s.lower() in lowered), None)
+        if status:
+            return {"name": "update_claim_status", "args": {"claim_id": ids["c"], "new_status": status}}
+    return None
+
+
+def _plan_tool_calls(question: str) -> List[Dict[str, Any]]:
+    """Map the IDs in a question to the tool calls a real model would make."""
+    lowered = question.lower()
+    write = _plan_write(question)
+    if write is not None:
+        return [write]
+    calls = []
+    for prefix, number in _ID_PATTERN.findall(question):
+        entity_id = f"{prefix.lower()}{number}"
+        if prefix.lower() == "c":
+            calls.append({"name": "get_claim_status", "args": {"claim_id": entity_id}})
+        elif prefix.lower() == "p":
+            if "premium" in lowered:
+                calls.append({"name": "get_premium_breakdown", "args": {"policy_id": entity_id}})
+            else:
+                calls.append({"name": "get_policy_details", "args": {"policy_id": entity_id}})
+        elif "claim" in lowered:
+            calls.append({"name": "get_customer_claims", "args": {"customer_id": entity_id}})
+        else:
+            calls.append({"name": "get_customer_information", "args": {"customer_id": entity_id}})
+    return calls
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for ChatOpenAI with configurable latency (fixed plus per prompt token)."""
+
+    latency_s: float = 0.0
+    prefill_s_per_1k_tokens: float = 0.0
+    model_name: str = "scripted-fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        bound_names = {t["function"]["name"] for t in tools} if tools else None
+        last = messages[-1] if messages else None
+        tool_calls = []
+
+        if isinstance(last, ToolMessage):
+            # Summarize every tool result since the last human turn
+            results = []
+            for message in reversed(messages):
+                if isinstance(message, HumanMessage):
+                    break
+                if isinstance(message, ToolMessage):
+                    results.append(str(message.content)[:400])
+            content = "Here is what I found:\n" + "\n".join(reversed(results))
+        elif isinstance(last, HumanMessage):
+            question = last.content if isinstance(last.content, str) else json.dumps(last.content)
+            for call in _plan_tool_calls(question):
+                if bound_names is None or call["name"] in bound_names:
+                    tool_calls.append({**call, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"})
+            content = "" if tool_calls else "I'm InsureBot. How can I help with your policies or claims?"
+        else:
+            content = "How else can I help?"
+
+        prompt_text = "".join(str(m.content) for m in messages) + json.dumps(tools or [])
+        input_tokens = _estimate_tokens(prompt_text)
+        if self.prefill_s_per_1k_tokens:
+            # Time to first token grows with the prompt, tool schemas included
+            time.sleep(input_tokens / 1000 * self.prefill_s_per_1k_tokens)
+        output_tokens = _estimate_tokens(content + json.dumps(tool_calls))
+        message = AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,255 @@
+"""
+Local stand-in servers for offline testing and benchmarks.
+FakeOpenAIServer speaks the OpenAI chat completions API and can inject
+latency, slow tail requests and error responses. FakePlacesServer stands in
+for Google Geocoding and Places searchNearby.
+
+Usage:
+    python agenets/fake_servers.py openai --port 8090 --error-rate 0.2 --latency 0.05
+    python agenets/fake_servers.py places --port 8091
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _FakeOpenAIHandler(_QuietHandler):
+
+    def do_POST(self):
+        server = self.server
+        request = self._read_json()
+        with server.lock:
+            server.request_count += 1
+
+        delay = server.latency_s
+        if server.slow_rate and random.random() < server.slow_rate:
+            delay = server.slow_latency_s
+        if delay:
+            time.sleep(delay)
+
+        if server.error_rate and random.random() < server.error_rate:
+            with server.lock:
+                server.error_count += 1
+            self._send_json(server.error_status,
+                            {"error": {"message": "Injected failure", "type": "fake_error", "code": None}},
+                            {"Retry-After": "0"})
+            return
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in request.get("messages", []))
+        content = server.reply
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_chars // 4 + len(content) // 4,
+            },
+        })
+
+
+class _FakePlacesHandler(_QuietHandler):
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        with self.server.lock:
+            self.server.request_count += 1
+        if not parts.path.endswith("/geocode/json"):
+            self._send_json(404, {"error": {"message": f"Unknown path {parts.path}"}})
+            return
+        address = parse_qs(parts.query).get("address", [""])[0]
+        # Deterministic coordinate inside the continental US derived from the address
+        digest = hashlib.sha256(address.strip().lower().encode()).digest()
+        lat = 30.0 + digest[0] / 255 * 15
+        lng = -120.0 + digest[1] / 255 * 45
+        self._send_json(200, {"status": "OK", "results": [
+            {"formatted_address": address, "geometry": {"location": {"lat": lat, "lng": lng}}}
+        ]})
+
+    def do_POST(self):
+        request = self._read_json()
+        with self.server.lock:
+            self.server.request_count += 1
+        if not self.path.endswith("places:searchNearby"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        center = request["locationRestriction"]["circle"]["center"]
+        place_type = request.get("includedTypes", ["place"])[0]
+        places = []
+        for i in range(min(int(request.get("maxResultCount", 10)), 5)):
+            places.append({
+                "displayName": {"text": f"{place_type.replace('_', ' ').title()} #{i + 1}"},
+                "formattedAddress": f"{100 + i} Sample St",
+                "nationalPhoneNumber": f"(555) 010-{1000 + i}",
+                "rating": round(3.5 + i * 0.3, 1),
+                "businessStatus": "OPERATIONAL",
+                "location": {"latitude": center["latitude"] + i * 0.001,
+                             "longitude": center["longitude"] + i * 0.001},
+            })
+        self._send_json(200, {"places": places})
+
+
+class _BackgroundServer:
+    """Runs a ThreadingHTTPServer on a background thread; usable as a context manager."""
+
+    handler_class = _QuietHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeOpenAIServer(_BackgroundServer):
+    """
+    OpenAI-compatible chat completions endpoint with fault injection.
+
+    Point ChatOpenAI at it with base_url=server.base_url and any api_key.
+    """
+
+    handler_class = _FakeOpenAIHandler
+
+    def __init__(self, latency_s: float = 0.0, error_rate: float = 0.0, error_status: int = 429,
+                 slow_rate: float = 0.0, slow_latency_s: float = 2.0,
+                 reply: str = "This is a canned answer from the fake OpenAI server.",
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.httpd.latency_s = latency_s
+        self.httpd.error_rate = error_rate
+        self.httpd.error_status = error_status
+        self.httpd.slow_rate = slow_rate
+        self.httpd.slow_latency_s = slow_latency_s
+        self.httpd.reply = reply
+        self.httpd.request_count = 0
+        self.httpd.error_count = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+
+class FakePlacesServer(_BackgroundServer):
+    """
+    Google Geocoding + Places searchNearby stand-in.
+
+    Set GOOGLE_GEOCODE_URL=server.geocode_url and PLACES_API_URL=server.places_url.
+    """
+
+    handler_class = _FakePlacesHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.httpd.request_count = 0
+
+    @property
+    def geocode_url(self) -> str:
+        return f"{self.url}/maps/api/geocode/json"
+
+    @property
+    def places_url(self) -> str:
+        return f"{self.url}/v1/places:searchNearby"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in servers")
+    subparsers = parser.add_subparsers(dest="server", required=True)
+    openai_parser = subparsers.add_parser("openai", help="Fake OpenAI chat completions server")
+    openai_parser.add_argument("--port", type=int, default=8090)
+    openai_parser.add_argument("--latency", type=float, default=0.0)
+    openai_parser.add_argument("--error-rate", type=float, default=0.0)
+    openai_parser.add_argument("--error-status", type=int, default=429)
+    openai_parser.add_argument("--slow-rate", type=float, default=0.0)
+    openai_parser.add_argument("--slow-latency", type=float, default=2.0)
+    places_parser = subparsers.add_parser("places", help="Fake Google Geocoding/Places server")
+    places_parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    if args.server == "places":
+        server = FakePlacesServer(port=args.port)
+        print(f"Fake Places server listening: GOOGLE_GEOCODE_URL={server.geocode_url} "
+              f"PLACES_API_URL={server.places_url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    server = FakeOpenAIServer(latency_s=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                              slow_rate=args.slow_rate, slow_latency_s=args.slow_latency, port=args.port)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
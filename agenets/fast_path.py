@@ -0,0 +1,132 @@
+"""
+Fast Path - Deterministic intent handler that answers exact-form lookups
+("claim c2 status", "policy p3 details", "premium for p7") without the LLM.
+Anything it is not fully confident about falls back to the ReAct agent.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+from insurance_tools import get_claim_status, get_policy_details, get_premium_breakdown
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Words that carry no intent and may surround an exact-form query
+_FILLER_WORDS = {
+    "what", "whats", "what's", "is", "are", "the", "of", "for", "on", "me", "my",
+    "show", "get", "give", "tell", "about", "please", "current", "a", "an", "id",
+    "number", "can", "you", "i", "see",
+}
+
+_ID_PATTERNS = {
+    "claim_id": re.compile(r"^c\d+$"),
+    "policy_id": re.compile(r"^p\d+$"),
+}
+
+# Intent grammar: (intent, id slot, required words, optional words)
+_INTENTS = [
+    ("claim_status", "claim_id", {"status"}, {"claim"}),
+    ("policy_details", "policy_id", {"policy"}, {"details", "detail", "info", "information"}),
+    ("premium_breakdown", "policy_id", {"premium"}, {"premiums", "breakdown", "policy", "payments", "payment"}),
+]
+
+
+def parse_intent(question: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Match a question against the fast-path grammar.
+
+    Args:
+        question: Raw user question
+
+    Returns:
+        (intent, tool arguments) when every word is accounted for, otherwise None
+    """
+    tokens = [t for t in re.split(r"[\s,?.!:]+", question.lower().strip()) if t]
+    tokens = [t for t in tokens if t not in _FILLER_WORDS]
+    for intent, slot, required, optional in _INTENTS:
+        ids = [t for t in tokens if _ID_PATTERNS[slot].match(t)]
+        if len(ids) != 1:
+            continue
+        words = {t for t in tokens if t != ids[0]}
+        if required <= words and words <= required | optional:
+            return intent, {slot: ids[0]}
+    return None
+
+
+def _money(value: Any) -> str:
+    try:
+        return f"${float(value):,.2f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _render_claim_status(result: Dict[str, Any]) -> str:
+    return (f"Claim **{result['claim_id']}** is currently **{result['status']}**.\n"
+            f"- Customer ID: {result.get('customer_id')}\n"
+            f"- Amount: {_money(result.get('amount'))}")
+
+
+def _render_policy_details(result: Dict[str, Any]) -> str:
+    return (f"Here are the details for policy **{result['policy_id']}**:\n"
+            f"- Policy Type: {result.get('policy_type')}\n"
+            f"- Coverage Amount: {_money(result.get('coverage_amount'))}\n"
+            f"- Deductible: {_money(result.get('deductible'))}\n"
+            f"- Premium: {_money(result.get('premium'))} annually\n"
+            f"- Term: {result.get('start_date')} to {result.get('end_date')}\n"
+            f"- Status: {result.get('status')}")
+
+
+def _render_premium_breakdown(result: Dict[str, Any]) -> str:
+    schedule = result.get("payment_schedule", {})
+    return (f"Premium breakdown for policy **{result['policy_id']}** ({result.get('policy_type')}):\n"
+            f"- Annual: {_money(schedule.get('annual'))}\n"
+            f"- Semi-annual: {_money(schedule.get('semi_annual'))}\n"
+            f"- Quarterly: {_money(schedule.get('quarterly'))}\n"
+            f"- Monthly: {_money(schedule.get('monthly'))}")
+
+
+_HANDLERS: Dict[str, Tuple[Any, Callable[[Dict[str, Any]], str]]] = {
+    "claim_status": (get_claim_status, _render_claim_status),
+    "policy_details": (get_policy_details, _render_policy_details),
+    "premium_breakdown": (get_premium_breakdown, _render_premium_breakdown),
+}
+
+
+def try_fast_path(question: str) -> Optional[str]:
+    """
+    Answer a question directly from the tools if it is an exact-form lookup.
+
+    Args:
+        question: Raw user question
+
+    Returns:
+        Templated answer, or None to fall back to the ReAct agent
+    """
+    start = time.perf_counter()
+    parsed = parse_intent(question)
+    if parsed is None:
+        metrics.incr("fast_path.misses")
+        return None
+
+    intent, args = parsed
+    tool_fn, render = _HANDLERS[intent]
+    try:
+        result = tool_fn.invoke(args)
+    except Exception as e:
+        logger.warning(f"Fast path {intent} failed, falling back to agent: {str(e)}")
+        metrics.incr("fast_path.errors", intent=intent)
+        return None
+
+    if "error" in result:
+        answer = f"Sorry, {result['error'][0].lower()}{result['error'][1:]}."
+    else:
+        answer = render(result)
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    metrics.incr("fast_path.hits", intent=intent)
+    metrics.observe("fast_path.latency_ms", latency_ms, intent=intent)
+    logger.info(f"Fast path answered {intent} {args} in {latency_ms:.1f} ms")
+    return answer
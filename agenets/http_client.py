@@ -0,0 +1,170 @@
+"""
+Shared HTTP Clients - One pooled httpx client pair per process.
+Used by the OpenAI chat models and by tools that call external APIs, so
+connections (and TLS sessions) are reused instead of re-established per call.
+Connection opens, reuse and handshake time are recorded in metrics.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+_lock = threading.Lock()
+# Clients keyed by process ID so forked workers never share a parent's sockets
+_clients: Dict[int, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _client_settings() -> Dict:
+    """Pool settings from the environment (HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, ...)."""
+    http2 = os.environ.get("HTTP2", "on").lower() != "off"
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30)),
+        ),
+        "timeout": httpx.Timeout(float(os.environ.get("HTTP_TIMEOUT", 60)), connect=10.0),
+    }
+
+
+def _make_trace(host: str):
+    """Build an httpcore trace callback recording connection setup for one request."""
+    started: Dict[str, float] = {}
+
+    def trace(event_name: str, info: Dict) -> None:
+        if event_name == "connection.connect_tcp.started":
+            started["connect"] = time.perf_counter()
+        elif event_name == "connection.connect_tcp.complete":
+            metrics.incr("http.connections_opened", host=host)
+        elif event_name == "connection.start_tls.complete" or (
+                event_name.endswith("send_request_headers.started") and "connect" in started):
+            # Handshake = TCP connect (+ TLS) until the connection is ready for the request
+            metrics.observe("http.handshake_ms", (time.perf_counter() - started.pop("connect")) * 1000, host=host)
+    return trace
+
+
+def _on_request(request: httpx.Request) -> None:
+    host = request.url.host
+    request.extensions["trace"] = _make_trace(host)
+    request.extensions["_started"] = time.perf_counter()
+    metrics.incr("http.requests", host=host)
+
+
+def _on_response(response: httpx.Response) -> None:
+    started = response.request.extensions.get("_started")
+    if started:
+        metrics.observe("http.request_ms", (time.perf_counter() - started) * 1000,
+                        host=response.request.url.host)
+
+
+async def _on_request_async(request: httpx.Request) -> None:
+    host = request.url.host
+    trace = _make_trace(host)
+
+    async def async_trace(event_name: str, info: Dict) -> None:
+        trace(event_name, info)
+
+    request.extensions["trace"] = async_trace
+    request.extensions["_started"] = time.perf_counter()
+    metrics.incr("http.requests", host=host)
+
+
+async def _on_response_async(response: httpx.Response) -> None:
+    _on_response(response)
+
+
+def _get_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    pid = os.getpid()
+    clients = _clients.get(pid)
+    if clients is None:
+        with _lock:
+            clients = _clients.get(pid)
+            if clients is None:
+                settings = _client_settings()
+                clients = (
+                    httpx.Client(event_hooks={"request": [_on_request], "response": [_on_response]}, **settings),
+                    httpx.AsyncClient(event_hooks={"request": [_on_request_async], "response": [_on_response_async]},
+                                      **settings),
+                )
+                _clients[pid] = clients
+                logger.info(f"Created shared HTTP clients for process {pid} "
+                            f"(http2={settings['http2']}, max_connections={settings['limits'].max_connections})")
+    return clients
+
+
+def get_http_client() -> httpx.Client:
+    """Return this process's shared synchronous httpx client."""
+    return _get_clients()[0]
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return this process's shared asynchronous httpx client."""
+    return _get_clients()[1]
+
+
+def connection_stats(url: str = None) -> Dict[str, float]:
+    """
+    Summarize connection reuse from the metrics registry.
+
+    Args:
+        url: Optional URL or host to restrict the summary to
+
+    Returns:
+        Requests, connections opened, reuse ratio and average handshake time
+    """
+    host = urlsplit(url).hostname if url and "://" in url else url
+    snap = metrics.snapshot()
+
+    def matching(series: Dict, name: str):
+        return [v for k, v in series.items() if k.startswith(name) and (host is None or f"host={host}" in k)]
+
+    requests = sum(matching(snap["counters"], "http.requests"))
+    opened = sum(matching(snap["counters"], "http.connections_opened"))
+    handshakes = matching(snap["timings"], "http.handshake_ms")
+    handshake_count = sum(h["count"] for h in handshakes)
+    return {
+        "requests": requests,
+        "connections_opened": opened,
+        "reuse_ratio": round(1 - opened / requests, 3) if requests else 0.0,
+        "avg_handshake_ms": round(sum(h["sum"] for h in handshakes) / handshake_count, 3) if handshake_count else 0.0,
+    }
+
+
+def close_http_clients() -> None:
+    """Close this process's shared sync and async clients (call on shutdown)."""
+    clients = _clients.pop(os.getpid(), None)
+    if not clients:
+        return
+    sync_client, async_client = clients
+    sync_client.close()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        # Called from inside an event loop: close once the loop gets to it
+        loop.create_task(async_client.aclose())
+    else:
+        asyncio.run(async_client.aclose())
@@ -0,0 +1,173 @@
+"""
+Index Registry - Per-store derived indexes kept in step with the store's writes.
+The claim search, vector and date indexes are built from a store's records and
+registered here, one per store. Before each use, the registry applies the writes
+published to the store's change log since the index was built or last used.
+That includes writes made by other worker processes through the shared store,
+so a worker never misses a claim filed on another worker. A log position that
+is no longer retained triggers a rebuild. Only stores without a change log use
+the write-through updates of the process that made the write, so no write is
+applied twice.
+
+build_indexes() builds every registered index up front, at store load time.
+Indexes that can be saved as arrays are written into store snapshots, and a
+store mapped from a snapshot loads them from the mapped file instead of
+rebuilding them from the records.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from change_log import SNAPSHOT_OP, changes_since
+from inmemory_store import VERSION_FIELD
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+_registries: List["IndexRegistry"] = []
+
+# (arrays by name, JSON-serializable metadata) of an index saved in a snapshot
+IndexArrays = Tuple[Dict[str, np.ndarray], Dict[str, Any]]
+
+
+class _Entry:
+    def __init__(self, store, index, offset: Optional[int]):
+        self.store = store
+        self.index = index
+        # Next change log offset to apply (None when the store has no change log)
+        self.offset = offset
+        self.lock = threading.Lock()
+
+
+class IndexRegistry:
+    """
+    One derived index per store.
+
+    Args:
+        name: Index name (metrics, memory reports and snapshot sections)
+        build: Builds the index from every record of a store
+        apply: Applies one write, apply(index, namespace, key, value); value None is a delete
+        dump: Saves an index as arrays for a snapshot (optional)
+        load: Builds an index from arrays saved by dump, possibly read-only views of a mapped file (optional)
+    """
+
+    def __init__(self, name: str, build: Callable[[Any], Any],
+                 apply: Callable[[Any, tuple, str, Optional[Dict[str, Any]]], None],
+                 dump: Optional[Callable[[Any], IndexArrays]] = None,
+                 load: Optional[Callable[[Dict[str, np.ndarray], Dict[str, Any]], Any]] = None):
+        self.name = name
+        self.build = build
+        self.apply = apply
+        self.dump = dump
+        self.load = load
+        self._entries: Dict[int, _Entry] = {}
+        self._lock = threading.Lock()
+        _registries.append(self)
+
+    def _build(self, store) -> _Entry:
+        # Read the log position first: writes racing the build are applied again, which is harmless
+        feed = changes_since(store)
+        start = time.perf_counter()
+        saved = _saved_index(store, self.name) if self.load is not None else None
+        if saved is not None:
+            entry = _Entry(store, self.load(*saved), feed[0] if feed is not None else None)
+            metrics.observe("indexes.load_ms", (time.perf_counter() - start) * 1000, index=self.name)
+            return entry
+        entry = _Entry(store, self.build(store), feed[0] if feed is not None else None)
+        metrics.observe("indexes.build_ms", (time.perf_counter() - start) * 1000, index=self.name)
+        return entry
+
+    def _entry(self, store) -> _Entry:
+        entry = self._entries.get(id(store))
+        if entry is None or entry.store is not store:
+            with self._lock:
+                entry = self._entries.get(id(store))
+                if entry is None or entry.store is not store:
+                    entry = self._entries[id(store)] = self._build(store)
+        return entry
+
+    def get(self, store) -> Any:
+        """The store's index, built on first use and caught up with the store's change log."""
+        entry = self._entry(store)
+        if entry.offset is not None:
+            with entry.lock:
+                self._catch_up(entry)
+        return self._entries[id(store)].index
+
+    def _catch_up(self, entry: _Entry) -> None:
+        try:
+            next_offset, events = changes_since(entry.store, entry.offset)
+        except ValueError as e:
+            logger.warning(f"Rebuilding {self.name} index: {str(e)}")
+            metrics.incr("indexes.rebuilds", index=self.name)
+            with self._lock:
+                self._entries[id(entry.store)] = self._build(entry.store)
+            return
+        for event in events:
+            if event["op"] == SNAPSHOT_OP:
+                continue
+            self.apply(entry.index, tuple(event["namespace"]), event["key"], _strip(event["value"]))
+        if events:
+            metrics.incr("indexes.applied_changes", len(events), index=self.name)
+        entry.offset = next_offset
+
+    def update(self, store, namespace: tuple, key: str, value: Optional[Dict[str, Any]]) -> None:
+        """
+        Apply a write made by this process right away (if the store's index has been built).
+        Stores with a change log get the write from the log on the next get(), so it is applied once.
+        """
+        entry = self._entries.get(id(store))
+        if entry is not None and entry.store is store and entry.offset is None:
+            self.apply(entry.index, tuple(namespace), key, _strip(value))
+
+    def entries(self) -> List[Tuple[Any, Any]]:
+        """(store, index) of every built index."""
+        return [(entry.store, entry.index) for entry in list(self._entries.values())]
+
+
+def _saved_index(store, name: str) -> Optional[IndexArrays]:
+    """An index saved with the snapshot a store (or a store it wraps) was mapped from."""
+    while store is not None:
+        saved_index = getattr(store, "saved_index", None)
+        if saved_index is not None:
+            return saved_index(name)
+        store = getattr(store, "backend", None)
+    return None
+
+
+def text_signature(*parts: str) -> int:
+    """Stable 64-bit hash of indexed text, to skip writes that leave it unchanged (saved with snapshots)."""
+    return int.from_bytes(hashlib.blake2b("\x00".join(parts).encode(), digest_size=8).digest(), "little")
+
+
+def pack_strings(strings: List[str]) -> np.ndarray:
+    """NUL-separated UTF-8 bytes of a list of strings, for saving in a snapshot."""
+    if any("\x00" in string for string in strings):
+        raise ValueError("Strings containing NUL cannot be packed")
+    return np.frombuffer("\x00".join(strings).encode(), dtype=np.uint8)
+
+
+def unpack_strings(packed: np.ndarray, count: int) -> List[str]:
+    """The strings of pack_strings() (count tells an empty list from one empty string)."""
+    return packed.tobytes().decode().split("\x00") if count else []
+
+
+def _strip(value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    return None if value is None else {k: v for k, v in value.items() if k != VERSION_FIELD}
+
+
+def registries() -> List[IndexRegistry]:
+    return list(_registries)
+
+
+def build_indexes(store) -> None:
+    """Build every registered index for a store now instead of on its first query."""
+    start = time.perf_counter()
+    for registry in _registries:
+        registry.get(store)
+    logger.info(f"Built {len(_registries)} store indexes in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,6 +1,12 @@
+import random
+import sys
+import threading
+import time
 from langgraph.store.memory import InMemoryStore
 from langgraph.config import get_store
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
 
 user_namespace = ("users",)
 claims_namespace = ("claims",)
@@ -365,4 +371,179 @@ def bootstrap_memory_store(store: InMemoryStore) -> InMemoryStore:
                         "description": claim["description"]
                   })
     
-    return store
\ No newline at end of file
+    return store
+
+
+# Limit of an unpaged search; stores only use it to cut their results
+SCAN_LIMIT = sys.maxsize
+
+
+def search_all(store, namespace: tuple, filter: Optional[Dict[str, Any]] = None) -> List:
+    """
+    Return every item in a namespace (store.search alone stops at its default limit of 10).
+    An optional filter is evaluated by the store (on every shard for sharded stores).
+    
+    This is one unpaged search: stores filter the whole namespace for every
+    search, so paging through it by offset would take quadratic time.
+    """
+    return store.search(namespace, filter=filter, limit=SCAN_LIMIT)
+
+
+# ===========================
+# OPTIMISTIC CONCURRENCY
+# ===========================
+
+# Every record written through a transaction carries a monotonically increasing version
+VERSION_FIELD = "_version"
+
+# Commits lock only the stripes of the keys they touch, never the whole store
+_LOCK_STRIPES = 256
+_stripe_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+
+class ConflictError(RuntimeError):
+    """Raised when a record changed between a transaction's read and its commit."""
+
+
+def _stripe_index(namespace: tuple, key: str) -> int:
+    return hash((namespace, key)) % _LOCK_STRIPES
+
+
+def get_versioned(store, namespace: tuple, key: str) -> Tuple[Optional[Dict[str, Any]], int]:
+    """
+    Read a record together with its version.
+    
+    Returns:
+        (copy of the value without the version field or None, version; 0 if never versioned)
+    """
+    item = store.get(namespace, key)
+    if item is None:
+        return None, 0
+    value = dict(item.value)
+    version = value.pop(VERSION_FIELD, 0)
+    return value, version
+
+
+def compare_and_swap(store, namespace: tuple, key: str, expected_version: int, value: Dict[str, Any]) -> int:
+    """
+    Write a record only if its version is still `expected_version`.
+    
+    Returns:
+        The new version
+    
+    Raises:
+        ConflictError: If another writer committed first
+    """
+    with _stripe_locks[_stripe_index(namespace, key)]:
+        _, current = get_versioned(store, namespace, key)
+        if current != expected_version:
+            raise ConflictError(f"{namespace[0]}/{key} is at version {current}, expected {expected_version}")
+        store.put(namespace, key, {**value, VERSION_FIELD: expected_version + 1})
+        return expected_version + 1
+
+
+class Transaction:
+    """
+    Optimistic multi-record transaction.
+    
+    Reads record the version they saw; commit() locks the stripes of all touched
+    keys (in a fixed order), validates that none of the read records changed and
+    applies the buffered writes with bumped versions.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+        self._read_versions: Dict[Tuple[tuple, str], int] = {}
+        self._writes: Dict[Tuple[tuple, str], Dict[str, Any]] = {}
+    
+    def get(self, namespace: tuple, key: str) -> Optional[Dict[str, Any]]:
+        """Read a record (a private copy), seeing this transaction's own writes."""
+        if (namespace, key) in self._writes:
+            return dict(self._writes[(namespace, key)])
+        value, version = get_versioned(self.store, namespace, key)
+        self._read_versions.setdefault((namespace, key), version)
+        return value
+    
+    def put(self, namespace: tuple, key: str, value: Dict[str, Any]) -> None:
+        """Buffer a write until commit."""
+        self._writes[(namespace, key)] = dict(value)
+    
+    def commit(self) -> Dict[Tuple[tuple, str], int]:
+        return commit_transaction(self.store, self._read_versions, self._writes)
+
+
+def commit_versioned(store, read_versions: Dict[Tuple[tuple, str], int],
+                     writes: Dict[Tuple[tuple, str], Dict[str, Any]]) -> Dict[Tuple[tuple, str], int]:
+    """
+    Validate read versions and apply writes with bumped versions, atomically
+    with respect to other committers in this process.
+    
+    Returns:
+        The committed version of every written record
+    
+    Raises:
+        ConflictError: If a record read by the transaction has changed
+    """
+    touched = set(read_versions) | set(writes)
+    stripes = sorted({_stripe_index(ns, key) for ns, key in touched})
+    for index in stripes:
+        _stripe_locks[index].acquire()
+    try:
+        current_versions = {}
+        for (namespace, key) in touched:
+            _, current = get_versioned(store, namespace, key)
+            expected = read_versions.get((namespace, key))
+            if expected is not None and current != expected:
+                raise ConflictError(f"{namespace[0]}/{key} changed during transaction "
+                                    f"(version {expected} -> {current})")
+            current_versions[(namespace, key)] = current
+        committed = {}
+        for (namespace, key), value in writes.items():
+            committed[(namespace, key)] = current_versions[(namespace, key)] + 1
+            store.put(namespace, key, {**value, VERSION_FIELD: committed[(namespace, key)]})
+        return committed
+    finally:
+        for index in reversed(stripes):
+            _stripe_locks[index].release()
+
+
+def commit_transaction(store, read_versions: Dict[Tuple[tuple, str], int],
+                       writes: Dict[Tuple[tuple, str], Dict[str, Any]]) -> Dict[Tuple[tuple, str], int]:
+    """
+    Commit a transaction on a store: through the store's own commit_versioned()
+    when it has one (stores owned by another process, shards, capturing wrappers),
+    otherwise with commit_versioned() in this process.
+    
+    Returns:
+        The committed version of every written record
+    
+    Raises:
+        ConflictError: If a record read by the transaction has changed
+    """
+    store_commit = getattr(store, "commit_versioned", None)
+    if store_commit is not None:
+        return store_commit(read_versions, writes)
+    return commit_versioned(store, read_versions, writes)
+
+
+def run_transaction(store, fn: Callable[[Transaction], Any], max_attempts: int = 20) -> Any:
+    """
+    Run `fn(tx)` as an optimistic transaction, retrying on conflicts.
+    
+    `fn` may be called several times, so it must only touch the store through
+    the transaction. Its return value is returned after a successful commit.
+    
+    Raises:
+        ConflictError: If every attempt conflicted
+    """
+    for attempt in range(max_attempts):
+        tx = Transaction(store)
+        result = fn(tx)
+        try:
+            tx.commit()
+            return result
+        except ConflictError:
+            metrics.incr("store.tx_conflicts")
+            # Small jittered backoff spreads out contending writers
+            time.sleep(random.uniform(0, 0.001 * (2 ** min(attempt, 6))))
+    raise ConflictError(f"Transaction failed after {max_attempts} attempts due to concurrent updates")
@@ -0,0 +1,80 @@
+"""
+Insurance Agent - The ReAct agent definition: system prompt, customer context and hooks.
+Importing this module sets nothing up (no store, model clients or threads), so
+worker processes build their agents from it without re-running the wiring in
+simple_agent, which builds the default agent on the bootstrapped store.
+"""
+
+from langchain_core.messages import AnyMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_store
+from langgraph.prebuilt import create_react_agent
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+from customer_context import session_customer_context
+from insurance_tools import TOOLS, get_default_store
+from prefetch import prefetch_entities
+from tool_dedup import dedup_tool_calls
+
+INSURANCE_SSTEM_PROMPT = """
+You are an insurance assistant that helps customers manage their policies and claims.
+You have access to the following tools to help customers with their insurance needs:
+- Get customer information and contact details
+- Retrieve all policies for a customer
+- Get detailed policy information including coverage amounts, deductibles, and premiums
+- Check if claims exist in the system
+- View all claims for a specific customer
+- Get current status of any claim (Processing, Approved, Closed, Under Investigation, Denied)
+- Add new claims (with validation that customer has active policy)
+- Update claim status
+- Calculate coverage remaining after potential claims
+- Calculate what insurance pays for a claim after the deductible and remaining coverage
+- Get premium breakdown (annual, monthly, quarterly payments)
+- Filter claims by status across all customers
+- Find nearby repair shops, clinics and other providers for a customer
+- Get current system date
+Always be helpful and professional when assisting customers with their insurance matters.
+Before creating new claims, verify the customer has an active policy that covers the claim type.
+Provide clear explanations of policy coverage, deductibles, and claim processes.
+When discussing claim amounts, always explain the customer's responsibility (deductible) and what insurance will cover.
+Use the claim payout calculator for these amounts instead of doing the arithmetic yourself.
+If you are asked about your name, respond with 'InsureBot'.
+When the customer's profile, policies and open claims are shown below, use them instead of looking the customer up;
+call the tools for anything not shown there.
+The customer you are helping is:
+"""
+
+UNKNOWN_CUSTOMER = "Not identified yet. Ask for their customer ID or look them up with the tools."
+
+
+def prompt(state: AgentState, config: RunnableConfig) -> list[AnyMessage]:
+    try:
+        store = get_store()
+    except RuntimeError:
+        store = get_default_store()
+    # Session-cached profile of the logged-in customer (configurable "customer_id")
+    customer = session_customer_context(store, config) or UNKNOWN_CUSTOMER
+    system_msg = f"{INSURANCE_SSTEM_PROMPT}{customer}"
+    return [{"role": "system", "content": system_msg}] + state["messages"]
+
+
+def build_agent(model, store=None, checkpointer=None):
+    """
+    Build the insurance ReAct agent.
+
+    Args:
+        model: Chat model or dynamic model router
+        store: Store to attach (None when the LangGraph server provides it)
+        checkpointer: Optional checkpointer that keeps conversation state per thread_id
+    """
+    return create_react_agent(
+        model=model,
+        tools=[*TOOLS],
+        store=store,
+        checkpointer=checkpointer,
+        prompt=prompt,
+        # Reads of the records a question mentions start while the first model call is in flight
+        pre_model_hook=prefetch_entities,
+        # Repeated identical read calls within a run get a back-reference instead of re-executing
+        post_model_hook=dedup_tool_calls,
+    )
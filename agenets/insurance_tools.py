@@ -30,16 +30,52 @@ except ImportError:
             logger.setLevel(logging.INFO)
         return logger
 
+# Feature modules are required: a missing dependency (e.g. numpy) must fail at import, not as a NameError in a tool
+from inmemory_store import VERSION_FIELD, run_transaction, search_all
+from places import PROVIDER_TYPES, find_providers_near_address
+from claim_search import get_claim_index, index_claim
+from vector_index import embed_claim, get_semantic_index
+from adjudication import DECISIONS, adjudicate_claims
+from quoting import quote_policies
+from date_index import from_ordinal, get_date_indexes, index_claim_date, period_label, to_ordinal
+from prefetch import cached_get, cached_search, invalidate_prefetch
+from customer_context import invalidate_customer_context
+
 logger = get_logger(__name__)
 
+# Store used when tools are invoked outside a LangGraph run (e.g. the fast path)
+_default_store = None
+
+
+def set_default_store(store) -> None:
+    """Register the store tools fall back to when called outside a LangGraph run."""
+    global _default_store
+    _default_store = store
+
+
+def get_default_store():
+    """The store registered with set_default_store (None before one is registered)."""
+    return _default_store
+
+
+def _get_store():
+    """Return the store of the current LangGraph run, or the registered default store."""
+    try:
+        return get_store()
+    except (RuntimeError, KeyError):
+        if _default_store is None:
+            raise
+        return _default_store
+
 
 def _unwrap_item(item):
-    """Helper to unwrap InMemoryStore Item objects."""
+    """Helper to unwrap InMemoryStore Item objects into a private copy without version metadata."""
     if item is None:
         return None
-    if hasattr(item, 'value'):
-        return item.value
-    return item
+    value = item.value if hasattr(item, 'value') else item
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k != VERSION_FIELD}
+    return value
 
 
 # ===========================
@@ -58,8 +94,8 @@ def get_customer_information(customer_id: str) -> Dict[str, Any]:
         Dictionary with customer details including name, age, and associated policy
     """
     try:
-        store = get_store()
-        user_data = _unwrap_item(store.get(namespace=user_namespace, key=customer_id))
+        store = _get_store()
+        user_data = _unwrap_item(cached_get(store, user_namespace, customer_id))
         
         if not user_data:
             logger.warning(f"Customer {customer_id} not found")
@@ -92,8 +128,8 @@ def get_customer_infoname(name: str) -> Dict[str, Any]:
         Dictionary with customer details including name, age, and associated policy
     """
     try:
-        store = get_store()
-        user_data = _unwrap_item(store.get(namespace=user_namespace, key=name))
+        store = _get_store()
+        user_data = _unwrap_item(cached_get(store, user_namespace, name))
         
         if not user_data:
             logger.warning(f"Customer {name} not found")
@@ -117,13 +153,13 @@ def get_customer_infoname(name: str) -> Dict[str, Any]:
 @tool
 def get_user_policy_info(user_id: str) -> Optional[Dict[str, Any]]:
     """Retrieve policy information for a given user ID."""
-    store = get_store()
-    user_data = _unwrap_item(store.get(namespace=user_namespace, key=user_id))
+    store = _get_store()
+    user_data = _unwrap_item(cached_get(store, user_namespace, user_id))
     if not user_data:
         logger.warning(f"User ID {user_id} not found.")
         return None
     policy_id = user_data.get("policy_id")
-    policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
+    policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
     if not policy_data:
         logger.warning(f"Policy ID {policy_id} for User ID {user_id} not found.")
         return None
@@ -151,29 +187,29 @@ def get_customer_policies(customer_id: str) -> Dict[str, Any]:
         List of policies associated with the customer
     """
     try:
-        store = get_store()
-        user_data = _unwrap_item(store.get(namespace=user_namespace, key=customer_id))
+        store = _get_store()
+        user_data = _unwrap_item(cached_get(store, user_namespace, customer_id))
         
         if not user_data:
             logger.warning(f"Customer {customer_id} not found")
             return {"error": f"Customer {customer_id} not found"}
         
-        policy_id = user_data.get("policy_id")
-        if not policy_id:
+        policies = [
+            {
+                "policy_id": policy.key,
+                **_unwrap_item(policy)
+            }
+            for policy in cached_search(store, policies_namespace, {"user_id": customer_id})
+        ]
+        if not policies:
             logger.info(f"No policies found for customer {customer_id}")
             return {"policies": [], "customer_id": customer_id}
         
-        policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
-        
-        if not policy_data:
-            logger.warning(f"Policy {policy_id} not found")
-            return {"policies": [], "customer_id": customer_id, "warning": f"Policy {policy_id} not found"}
-        
-        logger.info(f"Retrieved {1} policy for customer {customer_id}")
+        logger.info(f"Retrieved {len(policies)} policies for customer {customer_id}")
         return {
             "customer_id": customer_id,
-            "policies": [policy_data],
-            "count": 1
+            "policies": policies,
+            "count": len(policies)
         }
     except Exception as e:
         logger.error(f"Failed to retrieve customer policies: {str(e)}")
@@ -192,8 +228,8 @@ def get_policy_details(policy_id: str) -> Dict[str, Any]:
         Dictionary with detailed policy information
     """
     try:
-        store = get_store()
-        policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
+        store = _get_store()
+        policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
         
         if not policy_data:
             logger.warning(f"Policy {policy_id} not found")
@@ -232,10 +268,10 @@ def check_claims_exist(customer_id: str) -> Dict[str, Any]:
         Boolean indicating if claims exist and basic claim info
     """
     try:
-        store = get_store()
+        store = _get_store()
         
-        # Get all claims and filter by customer_id
-        all_claims = store.search(claims_namespace)
+        # The customer's claims (prefetched when the question mentioned the customer)
+        all_claims = cached_search(store, claims_namespace, {"user_id": customer_id})
         customer_claims = [
             claim for claim in all_claims 
             if _unwrap_item(claim).get("user_id") == customer_id
@@ -264,10 +300,10 @@ def get_customer_claims(customer_id: str) -> Dict[str, Any]:
         List of all claims for the customer
     """
     try:
-        store = get_store()
+        store = _get_store()
         
-        # Get all claims and filter by customer_id
-        all_claims = store.search(claims_namespace)
+        # The customer's claims (prefetched when the question mentioned the customer)
+        all_claims = cached_search(store, claims_namespace, {"user_id": customer_id})
         customer_claims = [
             {
                 "claim_id": claim.key,
@@ -300,8 +336,8 @@ def get_claim_status(claim_id: str) -> Dict[str, Any]:
         Current claim status and details
     """
     try:
-        store = get_store()
-        claim_data = _unwrap_item(store.get(namespace=claims_namespace, key=claim_id))
+        store = _get_store()
+        claim_data = _unwrap_item(cached_get(store, claims_namespace, claim_id))
         
         if not claim_data:
             logger.warning(f"Claim {claim_id} not found")
@@ -335,51 +371,59 @@ def add_new_claim(customer_id: str, policy_id: str, amount: float, description:
         Newly created claim details or error
     """
     try:
-        store = get_store()
-        
-        # Validate customer exists
-        user_data = _unwrap_item(store.get(namespace=user_namespace, key=customer_id))
-        if not user_data:
-            logger.warning(f"Customer {customer_id} not found for claim creation")
-            return {"error": f"Customer {customer_id} not found"}
-        
-        # Validate policy exists and is active
-        policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
-        if not policy_data:
-            logger.warning(f"Policy {policy_id} not found for claim creation")
-            return {"error": f"Policy {policy_id} not found"}
-        
-        if policy_data.get("status") != "Active" and policy_data.get("status"):
-            logger.warning(f"Policy {policy_id} is not active")
-            return {"error": f"Policy {policy_id} is not active"}
-        
-        # Validate customer has this policy
-        if user_data.get("policy_id") != policy_id:
-            logger.warning(f"Customer {customer_id} does not have policy {policy_id}")
-            return {"error": f"Customer {customer_id} does not have policy {policy_id}"}
-        
-        # Create new claim
+        store = _get_store()
         claim_id = f"c{uuid.uuid4().hex[:8]}"
-        new_claim = {
-            "claim_id": claim_id,
-            "user_id": customer_id,
-            "policy_id": policy_id,
-            "amount": amount,
-            "status": "Processing",
-            "description": description,
-            "created_date": _get_current_system_date(),
-            "last_updated": _get_current_system_date()
-        }
         
-        store.put(namespace=claims_namespace, key=claim_id, value=new_claim)
-        logger.info(f"New claim {claim_id} created for customer {customer_id}")
+        def create(tx):
+            # Validate customer exists
+            user_data = tx.get(user_namespace, customer_id)
+            if not user_data:
+                logger.warning(f"Customer {customer_id} not found for claim creation")
+                return {"error": f"Customer {customer_id} not found"}
+            
+            # Validate policy exists and is active; the commit fails if it changes meanwhile
+            policy_data = tx.get(policies_namespace, policy_id)
+            if not policy_data:
+                logger.warning(f"Policy {policy_id} not found for claim creation")
+                return {"error": f"Policy {policy_id} not found"}
+            
+            if policy_data.get("status") != "Active" and policy_data.get("status"):
+                logger.warning(f"Policy {policy_id} is not active")
+                return {"error": f"Policy {policy_id} is not active"}
+            
+            # Validate customer has this policy
+            if policy_data.get("user_id") != customer_id:
+                logger.warning(f"Customer {customer_id} does not have policy {policy_id}")
+                return {"error": f"Customer {customer_id} does not have policy {policy_id}"}
+            
+            # Create new claim
+            new_claim = {
+                "claim_id": claim_id,
+                "user_id": customer_id,
+                "policy_id": policy_id,
+                "amount": amount,
+                "status": "Processing",
+                "description": description,
+                "created_date": _get_current_system_date(),
+                "last_updated": _get_current_system_date()
+            }
+            tx.put(claims_namespace, claim_id, new_claim)
+            return {
+                "success": True,
+                "claim_id": claim_id,
+                "message": f"Claim {claim_id} created successfully",
+                "claim": new_claim
+            }
         
-        return {
-            "success": True,
-            "claim_id": claim_id,
-            "message": f"Claim {claim_id} created successfully",
-            "claim": new_claim
-        }
+        result = run_transaction(store, create)
+        if result.get("success"):
+            invalidate_prefetch(claims_namespace)
+            invalidate_customer_context(customer_id)
+            index_claim(store, claim_id, result["claim"])
+            embed_claim(store, claim_id, result["claim"])
+            index_claim_date(store, claim_id, result["claim"])
+            logger.info(f"New claim {claim_id} created for customer {customer_id}")
+        return result
     except Exception as e:
         logger.error(f"Failed to add new claim: {str(e)}")
         return {"error": f"Failed to add new claim: {str(e)}"}
@@ -398,12 +442,7 @@ def update_claim_status(claim_id: str, new_status: str) -> Dict[str, Any]:
         Updated claim details
     """
     try:
-        store = get_store()
-        claim_data = _unwrap_item(store.get(namespace=claims_namespace, key=claim_id))
-        
-        if not claim_data:
-            logger.warning(f"Claim {claim_id} not found for status update")
-            return {"error": f"Claim {claim_id} not found"}
+        store = _get_store()
         
         # Validate status
         valid_statuses = ["Processing", "Approved", "Closed", "Under Investigation", "Denied"]
@@ -411,23 +450,240 @@ def update_claim_status(claim_id: str, new_status: str) -> Dict[str, Any]:
             logger.warning(f"Invalid status {new_status} for claim {claim_id}")
             return {"error": f"Invalid status. Valid options: {', '.join(valid_statuses)}"}
         
-        # Update claim
-        claim_data["status"] = new_status
-        claim_data["last_updated"] = _get_current_system_date()
+        def update(tx):
+            claim_data = tx.get(claims_namespace, claim_id)
+            if not claim_data:
+                logger.warning(f"Claim {claim_id} not found for status update")
+                return {"error": f"Claim {claim_id} not found"}
+            
+            # Update claim (compare-and-swap on the version read above)
+            claim_data["status"] = new_status
+            claim_data["last_updated"] = _get_current_system_date()
+            tx.put(claims_namespace, claim_id, claim_data)
+            return {
+                "success": True,
+                "claim_id": claim_id,
+                "new_status": new_status,
+                "message": f"Claim {claim_id} status updated to {new_status}",
+                "claim": claim_data
+            }
+        
+        result = run_transaction(store, update)
+        if result.get("success"):
+            invalidate_prefetch(claims_namespace)
+            invalidate_customer_context(result["claim"].get("user_id"))
+            logger.info(f"Claim {claim_id} status updated to {new_status}")
+        return result
+    except Exception as e:
+        logger.error(f"Failed to update claim status: {str(e)}")
+        return {"error": f"Failed to update claim status: {str(e)}"}
+
+
+# ===========================
+# CLAIM SEARCH TOOLS
+# ===========================
+
+@tool
+def search_claims(query: str, customer_id: Optional[str] = None, page: int = 1, page_size: int = 10) -> Dict[str, Any]:
+    """
+    Full-text search over claim types and descriptions (e.g. "water damage", "windshield"), ranked by relevance.
+    
+    Args:
+        query: Free-text search terms
+        customer_id: Optional customer ID to restrict the search to
+        page: Page number starting at 1
+        page_size: Results per page (max 50)
+    
+    Returns:
+        Ranked claims with relevance scores and the total number of matches
+    """
+    try:
+        store = _get_store()
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), 50)
+        hits, total = get_claim_index(store).search(query, limit=page_size, offset=(page - 1) * page_size,
+                                                    customer_id=customer_id)
+        
+        results = []
+        for claim_id, score in hits:
+            claim_data = _unwrap_item(cached_get(store, claims_namespace, claim_id))
+            if claim_data:
+                results.append({"claim_id": claim_id, "score": round(score, 3), **claim_data})
+        
+        logger.info(f"Claim search '{query}' matched {total} claims")
+        return {
+            "query": query,
+            "total_matches": total,
+            "page": page,
+            "page_size": page_size,
+            "has_more": page * page_size < total,
+            "claims": results
+        }
+    except Exception as e:
+        logger.error(f"Failed to search claims: {str(e)}")
+        return {"error": f"Failed to search claims: {str(e)}"}
+
+
+@tool
+def find_similar_claims(claim_id: Optional[str] = None, description: Optional[str] = None, limit: int = 5) -> Dict[str, Any]:
+    """
+    Find claims semantically similar to an existing claim or to a free-text description
+    (e.g. "claims similar to c5", "anything like a flooded basement").
+    
+    Args:
+        claim_id: Claim to find look-alikes for
+        description: Free-text description to match when no claim_id is given
+        limit: Maximum number of similar claims (max 25)
+    
+    Returns:
+        Similar claims with similarity scores, plus the policies closest to the same text
+    """
+    try:
+        store = _get_store()
+        if not claim_id and not description:
+            return {"error": "Provide a claim_id or a description"}
+        limit = min(max(1, int(limit)), 25)
+        index = get_semantic_index(store)
+        
+        if claim_id:
+            claim_data = _unwrap_item(cached_get(store, claims_namespace, claim_id))
+            if not claim_data:
+                logger.warning(f"Claim {claim_id} not found for similarity search")
+                return {"error": f"Claim {claim_id} not found"}
+            query = index.claims.get_vector(claim_id)
+            if query is None:
+                query = index.embed(f"{claim_data.get('claim_type') or ''}. {claim_data.get('description') or ''}")
+        else:
+            query = index.embed(description)
         
-        store.put(namespace=claims_namespace, key=claim_id, value=claim_data)
-        logger.info(f"Claim {claim_id} status updated to {new_status}")
+        similar = []
+        for similar_id, score in index.claims.search(query, k=limit, exclude=[claim_id] if claim_id else []):
+            similar_data = _unwrap_item(cached_get(store, claims_namespace, similar_id))
+            if similar_data:
+                similar.append({"claim_id": similar_id, "similarity": round(score, 3), **similar_data})
+        related_policies = [
+            {"policy_id": policy_id, "similarity": round(score, 3),
+             **(_unwrap_item(cached_get(store, policies_namespace, policy_id)) or {})}
+            for policy_id, score in index.policies.search(query, k=3)
+        ]
         
+        logger.info(f"Found {len(similar)} claims similar to {claim_id or repr(description)}")
         return {
-            "success": True,
-            "claim_id": claim_id,
-            "new_status": new_status,
-            "message": f"Claim {claim_id} status updated to {new_status}",
-            "claim": claim_data
+            "reference": claim_id or description,
+            "similar_claims": similar,
+            "related_policies": related_policies
         }
     except Exception as e:
-        logger.error(f"Failed to update claim status: {str(e)}")
-        return {"error": f"Failed to update claim status: {str(e)}"}
+        logger.error(f"Failed to find similar claims: {str(e)}")
+        return {"error": f"Failed to find similar claims: {str(e)}"}
+
+
+# ===========================
+# DATE-RANGE TOOLS
+# ===========================
+
+@tool
+def get_claims_in_date_range(start_date: str, end_date: str, status: Optional[str] = None,
+                             bucket: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    Claims filed between two dates (inclusive), e.g. "claims filed last quarter".
+    With a bucket, also returns a time series of claim counts and amounts per period.
+    
+    Args:
+        start_date: First day of the range (YYYY-MM-DD)
+        end_date: Last day of the range (YYYY-MM-DD)
+        status: Optional claim status to filter by
+        bucket: Optional time-series grouping: day, month, quarter or year
+        limit: Maximum number of claims to list (max 200), oldest first
+    
+    Returns:
+        Matching claims, their total count and amount, and the optional time series
+    """
+    try:
+        store = _get_store()
+        start, end = to_ordinal(start_date), to_ordinal(end_date)
+        if start is None or end is None:
+            return {"error": "Dates must be in YYYY-MM-DD format"}
+        if start > end:
+            return {"error": f"start_date {start_date} is after end_date {end_date}"}
+        if bucket:
+            period_label(start, bucket)  # validates the bucket name
+        limit = min(max(1, int(limit)), 200)
+        
+        claims, series = [], {}
+        total_count, total_amount = 0, 0.0
+        for claim_id, ordinal in get_date_indexes(store).claims_by_date.range(start, end):
+            claim_data = _unwrap_item(cached_get(store, claims_namespace, claim_id))
+            if not claim_data or (status and claim_data.get("status") != status):
+                continue
+            amount = float(claim_data.get("amount") or 0)
+            total_count += 1
+            total_amount += amount
+            if len(claims) < limit:
+                claims.append({"claim_id": claim_id, "filed_date": from_ordinal(ordinal), **claim_data})
+            if bucket:
+                period = series.setdefault(period_label(ordinal, bucket), {"count": 0, "total_amount": 0.0})
+                period["count"] += 1
+                period["total_amount"] += amount
+        
+        logger.info(f"Found {total_count} claims filed between {start_date} and {end_date}")
+        result = {
+            "start_date": from_ordinal(start),
+            "end_date": from_ordinal(end),
+            "count": total_count,
+            "total_amount": round(total_amount, 2),
+            "has_more": total_count > len(claims),
+            "claims": claims
+        }
+        if bucket:
+            result["time_series"] = [
+                {"period": label, "count": values["count"], "total_amount": round(values["total_amount"], 2)}
+                for label, values in series.items()
+            ]
+        return result
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error(f"Failed to get claims in date range: {str(e)}")
+        return {"error": f"Failed to get claims in date range: {str(e)}"}
+
+
+@tool
+def get_expiring_policies(days: int = 30, from_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Active policies whose end date falls within the next N days, soonest first.
+    
+    Args:
+        days: Length of the window in days (max 3650)
+        from_date: Optional start of the window (YYYY-MM-DD); defaults to today
+    
+    Returns:
+        Expiring policies with their end date and days remaining
+    """
+    try:
+        store = _get_store()
+        days = min(max(0, int(days)), 3650)
+        start = to_ordinal(from_date or _get_current_system_date())
+        if start is None:
+            return {"error": "from_date must be in YYYY-MM-DD format"}
+        
+        policies = []
+        for policy_id, ordinal in get_date_indexes(store).policies_by_end_date.range(start, start + days):
+            policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
+            if not policy_data or policy_data.get("status") != "Active":
+                continue
+            policies.append({"policy_id": policy_id, "days_remaining": ordinal - start, **policy_data})
+        
+        logger.info(f"Found {len(policies)} policies expiring within {days} days of {from_ordinal(start)}")
+        return {
+            "from_date": from_ordinal(start),
+            "to_date": from_ordinal(start + days),
+            "policies": policies,
+            "count": len(policies)
+        }
+    except Exception as e:
+        logger.error(f"Failed to get expiring policies: {str(e)}")
+        return {"error": f"Failed to get expiring policies: {str(e)}"}
 
 
 # ===========================
@@ -446,16 +702,16 @@ def calculate_remaining_coverage(customer_id: str) -> Dict[str, Any]:
         Remaining coverage amount and claims deducted
     """
     try:
-        store = get_store()
+        store = _get_store()
         
         # Get customer and policy
-        user_data = _unwrap_item(store.get(namespace=user_namespace, key=customer_id))
+        user_data = _unwrap_item(cached_get(store, user_namespace, customer_id))
         if not user_data:
             logger.warning(f"Customer {customer_id} not found for coverage calculation")
             return {"error": f"Customer {customer_id} not found"}
         
         policy_id = user_data.get("policy_id")
-        policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
+        policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
         
         if not policy_data:
             logger.warning(f"Policy {policy_id} not found for coverage calculation")
@@ -464,7 +720,7 @@ def calculate_remaining_coverage(customer_id: str) -> Dict[str, Any]:
         total_coverage = policy_data.get("coverage_amount", 0)
         
         # Get all approved/closed claims for this customer
-        all_claims = store.search(claims_namespace)
+        all_claims = cached_search(store, claims_namespace, {"user_id": customer_id})
         approved_claims = [
             claim for claim in all_claims
             if _unwrap_item(claim).get("user_id") == customer_id 
@@ -500,8 +756,8 @@ def get_premium_breakdown(policy_id: str) -> Dict[str, Any]:
         Detailed premium breakdown
     """
     try:
-        store = get_store()
-        policy_data = _unwrap_item(store.get(namespace=policies_namespace, key=policy_id))
+        store = _get_store()
+        policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
         
         if not policy_data:
             logger.warning(f"Policy {policy_id} not found for premium breakdown")
@@ -531,6 +787,163 @@ def get_premium_breakdown(policy_id: str) -> Dict[str, Any]:
         return {"error": f"Failed to retrieve premium breakdown: {str(e)}"}
 
 
+@tool
+def quote_policy_renewal(policy_id: str, as_of_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Quote the renewal premium of a policy (e.g. "quote renewal for p5") from the rate tables,
+    adjusted for the customer's age, tenure and recent paid claims.
+    
+    Args:
+        policy_id: The unique policy ID
+        as_of_date: Optional quote date (YYYY-MM-DD); defaults to today
+    
+    Returns:
+        Renewal premium, deductible, the applied adjustments and the change from the current premium
+    """
+    try:
+        store = _get_store()
+        policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
+        if not policy_data:
+            logger.warning(f"Policy {policy_id} not found for renewal quote")
+            return {"error": f"Policy {policy_id} not found"}
+        
+        customer_id = policy_data.get("user_id")
+        customer_data = _unwrap_item(cached_get(store, user_namespace, customer_id)) or {}
+        policy_claims = [_unwrap_item(claim) for claim in cached_search(store, claims_namespace, {"policy_id": policy_id})]
+        quote = quote_policies({policy_id: policy_data}, {customer_id: customer_data}, policy_claims, as_of=as_of_date)
+        
+        current_premium = float(policy_data.get("premium") or 0)
+        renewal_premium = float(quote["annual_premium"][0])
+        logger.info(f"Quoted renewal for policy {policy_id}: {renewal_premium}")
+        return {
+            "policy_id": policy_id,
+            "customer_id": customer_id,
+            "policy_type": policy_data.get("policy_type"),
+            "coverage": policy_data.get("coverage_amount", 0),
+            "current_premium": round(current_premium, 2),
+            "renewal_premium": round(renewal_premium, 2),
+            "change_percent": round((renewal_premium / current_premium - 1) * 100, 1) if current_premium else None,
+            "deductible": float(quote["deductible"][0]),
+            "adjustments": {
+                "base_premium": round(float(quote["base_premium"][0]), 2),
+                "age_factor": float(quote["age_factor"][0]),
+                "tenure_discount_percent": round(float(quote["tenure_discount"][0]) * 100, 1),
+                "claims_surcharge_percent": round(float(quote["claims_surcharge"][0]) * 100, 1)
+            }
+        }
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error(f"Failed to quote policy renewal: {str(e)}")
+        return {"error": f"Failed to quote policy renewal: {str(e)}"}
+
+
+@tool
+def calculate_claim_payout(claim_id: Optional[str] = None, policy_id: Optional[str] = None,
+                           amount: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Calculate what insurance pays for a claim and what the customer owes: applies the policy deductible,
+    the coverage remaining after earlier Approved/Closed claims on the policy, and the policy status.
+    Pass claim_id for an existing claim, or policy_id and amount for a hypothetical claim filed today.
+    
+    Args:
+        claim_id: Existing claim to adjudicate
+        policy_id: Policy of a hypothetical claim (used when no claim_id is given)
+        amount: Amount of the hypothetical claim
+    
+    Returns:
+        Payout, customer responsibility, deductible applied, remaining coverage and the decision
+    """
+    try:
+        store = _get_store()
+        if claim_id:
+            claim_data = _unwrap_item(cached_get(store, claims_namespace, claim_id))
+            if not claim_data:
+                logger.warning(f"Claim {claim_id} not found for payout calculation")
+                return {"error": f"Claim {claim_id} not found"}
+            policy_id = claim_data.get("policy_id")
+        elif policy_id and amount is not None:
+            claim_id = "hypothetical"
+            claim_data = {"policy_id": policy_id, "amount": float(amount), "status": "Processing",
+                          "claim_date": _get_current_system_date()}
+        else:
+            return {"error": "Provide a claim_id, or a policy_id and an amount"}
+        
+        policy_data = _unwrap_item(cached_get(store, policies_namespace, policy_id))
+        if not policy_data:
+            logger.warning(f"Policy {policy_id} not found for payout calculation")
+            return {"error": f"Policy {policy_id} not found"}
+        
+        # Earlier claims on the same policy determine the remaining coverage
+        policy_claims = {
+            claim.key: _unwrap_item(claim)
+            for claim in cached_search(store, claims_namespace, {"policy_id": policy_id}) if claim.key != claim_id
+        }
+        policy_claims[claim_id] = claim_data
+        result = adjudicate_claims(policy_claims, {policy_id: policy_data})
+        row = len(policy_claims) - 1
+        
+        logger.info(f"Calculated payout for claim {claim_id} on policy {policy_id}: {result['payout'][row]}")
+        return {
+            "claim_id": claim_id,
+            "policy_id": policy_id,
+            "policy_status": policy_data.get("status"),
+            "claim_status": claim_data.get("status"),
+            "claim_amount": float(claim_data.get("amount") or 0),
+            "deductible_applied": float(result["deductible_applied"][row]),
+            "remaining_coverage_before_claim": float(result["remaining_coverage"][row]),
+            "insurance_pays": float(result["payout"][row]),
+            "customer_responsibility": float(result["customer_responsibility"][row]),
+            "decision": DECISIONS[result["decision"][row]]
+        }
+    except Exception as e:
+        logger.error(f"Failed to calculate claim payout: {str(e)}")
+        return {"error": f"Failed to calculate claim payout: {str(e)}"}
+
+
+# ===========================
+# PROVIDER SEARCH TOOLS
+# ===========================
+
+@tool
+def find_nearby_providers(customer_id: str, provider_type: str = "repair_shop", radius_meters: float = 5000.0) -> Dict[str, Any]:
+    """
+    Find repair shops, clinics and other providers near the customer's address.
+    
+    Args:
+        customer_id: The unique customer ID
+        provider_type: One of repair_shop, auto_body, clinic, hospital, doctor, pharmacy, dentist, contractor
+        radius_meters: Search radius in meters (default 5000)
+    
+    Returns:
+        Nearby providers with name, address, phone and rating
+    """
+    try:
+        store = _get_store()
+        user_data = _unwrap_item(cached_get(store, user_namespace, customer_id))
+        
+        if not user_data:
+            logger.warning(f"Customer {customer_id} not found for provider search")
+            return {"error": f"Customer {customer_id} not found"}
+        
+        if provider_type not in PROVIDER_TYPES:
+            return {"error": f"Invalid provider type. Valid options: {', '.join(PROVIDER_TYPES)}"}
+        
+        result = find_providers_near_address(user_data.get("address"), provider_type, radius_meters)
+        logger.info(f"Found {len(result['providers'])} {provider_type} providers near customer {customer_id}")
+        return {
+            "customer_id": customer_id,
+            "address": user_data.get("address"),
+            "provider_type": provider_type,
+            "radius_meters": radius_meters,
+            "providers": result["providers"],
+            "count": len(result["providers"])
+        }
+    except Exception as e:
+        logger.error(f"Failed to find nearby providers: {str(e)}")
+        return {"error": f"Failed to find nearby providers: {str(e)}"}
+
+
 # ===========================
 # SYSTEM & FILTER TOOLS
 # ===========================
@@ -547,17 +960,16 @@ def filter_claims_by_status(status: str) -> Dict[str, Any]:
         List of all claims with specified status
     """
     try:
-        store = get_store()
+        store = _get_store()
         
-        # Get all claims and filter by status
-        all_claims = store.search(claims_namespace)
+        # Filter by status in the store (sharded stores scatter the query to every shard)
+        matching_claims = search_all(store, claims_namespace, filter={"status": status})
         filtered_claims = [
             {
                 "claim_id": claim.key,
                 **_unwrap_item(claim)
             }
-            for claim in all_claims
-            if _unwrap_item(claim).get("status") == status
+            for claim in matching_claims
         ]
         
         logger.info(f"Found {len(filtered_claims)} claims with status {status}")
@@ -594,47 +1006,6 @@ def get_current_system_date() -> str:
     return current_date
 
 
-# ===========================
-# HELPER FUNCTIONS
-# ===========================
-
-def _calculate_annual_premium(policy: Dict[str, Any]) -> float:
-    """
-    Calculate annual premium based on policy type and coverage.
-    Premium calculation: coverage * rate based on type.
-    """
-    coverage = policy.get("coverage", 0)
-    policy_type = policy.get("type", "Standard")
-    
-    # Premium rates per $1000 of coverage
-    rates = {
-        "Health": 0.008,      # $8 per $1000
-        "Auto": 0.012,        # $12 per $1000
-        "Home": 0.006,        # $6 per $1000
-        "Standard": 0.010     # $10 per $1000
-    }
-    
-    rate = rates.get(policy_type, 0.010)
-    return coverage * rate
-
-
-def _calculate_deductible(policy: Dict[str, Any]) -> float:
-    """
-    Calculate deductible based on policy type.
-    Standard deductibles by type.
-    """
-    policy_type = policy.get("type", "Standard")
-    
-    deductibles = {
-        "Health": 1000,
-        "Auto": 500,
-        "Home": 2000,
-        "Standard": 750
-    }
-    
-    return deductibles.get(policy_type, 750)
-
-
 # ===========================
 # TOOL REGISTRY
 # ===========================
@@ -651,9 +1022,16 @@ def get_all_insurance_tools():
         get_claim_status,
         add_new_claim,
         update_claim_status,
+        search_claims,
+        find_similar_claims,
+        get_claims_in_date_range,
+        get_expiring_policies,
         calculate_remaining_coverage,
         get_premium_breakdown,
+        quote_policy_renewal,
+        calculate_claim_payout,
         filter_claims_by_status,
+        find_nearby_providers,
         get_current_system_date,
     ]
 
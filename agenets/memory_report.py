@@ -0,0 +1,469 @@
+"""
+Memory Accounting - Bytes held by store namespaces, indexes, caches and sessions.
+Sizes are measured by walking object graphs (deep sizeof). Large namespaces are
+sampled and scaled up. Conversation histories are measured from the serialized
+checkpoints of an InMemorySaver. Every report is also published as memory.*
+gauges (memory.namespace_bytes{namespace=claims}, memory.session_bytes, ...).
+
+The soak mode runs the offline agent (scripted model, no API calls) for a fixed
+duration, samples the report plus tracemalloc at intervals and flags components
+that keep growing after warm-up.
+
+Usage:
+    python agenets/memory_report.py report --turns 200 --sessions 20
+    python agenets/memory_report.py soak --duration 3600 --interval 60
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from inmemory_store import claims_namespace, policies_namespace, user_namespace
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+NAMESPACES = (user_namespace, policies_namespace, claims_namespace)
+
+# Items deep-sized per namespace before scaling up
+DEFAULT_SAMPLE_SIZE = 2000
+
+# Shared, immortal or code objects that do not belong to any one component
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+               types.MethodType, types.CodeType, types.FrameType)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Bytes of an object and everything it references, counting shared objects once.
+
+    Args:
+        obj: Root object
+        seen: IDs already counted (shared across calls to avoid double counting)
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(current, np.ndarray):
+            # getsizeof includes owned data; views keep their base alive
+            if current.base is not None:
+                stack.append(current.base)
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        if hasattr(current, "__dict__"):
+            stack.append(vars(current))
+        for slot in getattr(type(current), "__slots__", ()):
+            if hasattr(current, slot):
+                stack.append(getattr(current, slot))
+    return total
+
+
+def sampled_sizeof(items: List[Any], sample_size: int = DEFAULT_SAMPLE_SIZE,
+                   seen: Optional[set] = None) -> Tuple[int, bool]:
+    """
+    Deep size of a list of items, measured on an evenly spaced sample when it is large.
+
+    Returns:
+        (estimated bytes, whether the figure was sampled)
+    """
+    if len(items) <= sample_size:
+        return sum(deep_sizeof(item, seen) for item in items), False
+    stride = len(items) / sample_size
+    sample = [items[int(i * stride)] for i in range(sample_size)]
+    measured = sum(deep_sizeof(item, seen) for item in sample)
+    return int(measured * len(items) / sample_size), True
+
+
+def store_layers(store) -> List[Any]:
+    """The store and every store it wraps (ChangeCapturingStore, WriteBehindStore, ...), outermost first."""
+    layers = []
+    while store is not None and store not in layers:
+        layers.append(store)
+        store = getattr(store, "backend", None)
+    return layers
+
+
+def namespace_sizes(store, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Dict[str, Dict[str, Any]]:
+    """
+    Resident bytes per top-level namespace of an in-process InMemoryStore.
+
+    Stores whose data lives elsewhere (shard processes, memory-mapped snapshots)
+    report item counts with bytes set to None.
+    """
+    from inmemory_store import search_all
+
+    base = store_layers(store)[-1]
+    data = getattr(base, "_data", None)
+    report = {}
+    for namespace in NAMESPACES:
+        if data is not None:
+            items = [item for ns, entries in list(data.items()) if ns[:1] == namespace
+                     for item in list(entries.values())]
+            size, sampled = sampled_sizeof(items, sample_size)
+            report[namespace[0]] = {"items": len(items), "bytes": size, "sampled": sampled}
+        else:
+            report[namespace[0]] = {"items": len(search_all(store, namespace)), "bytes": None, "sampled": False}
+    return report
+
+
+def index_sizes(store) -> Dict[str, Dict[str, Any]]:
+    """Bytes of the per-store indexes, plus entries left behind by discarded stores."""
+    import claim_search  # noqa: F401  (registers index)
+    import date_index  # noqa: F401  (registers index)
+    import vector_index  # noqa: F401  (registers index)
+    from index_registry import registries
+
+    exclude = {id(layer) for layer in store_layers(store)}
+    report = {}
+    for registry in registries():
+        entries = registry.entries()
+        current = [index for owner, index in entries if any(owner is layer for layer in store_layers(store))]
+        report[registry.name] = {
+            "built": bool(current),
+            "bytes": sum(deep_sizeof(index, set(exclude)) for index in current),
+            "stale_entries": len(entries) - len(current),
+        }
+    return report
+
+
+def _lru_bytes(function, sample_args: tuple) -> Dict[str, Any]:
+    """Entries of an lru_cache and bytes estimated from one representative entry."""
+    entries = function.cache_info().currsize
+    if not entries:
+        return {"entries": 0, "bytes": 0}
+    # Key tuple, result and the cache's linked-list node (a 4-slot list)
+    per_entry = (deep_sizeof(sample_args) + deep_sizeof(function.__wrapped__(*sample_args))
+                 + sys.getsizeof([None] * 4))
+    return {"entries": entries, "bytes": entries * per_entry}
+
+
+def cache_sizes(store, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Bytes held by process-wide caches and buffers.
+
+    Args:
+        store: Active store; wrapper layers (change-log buffer, write-behind queue) are included
+        extra: Additional named objects to measure (e.g. the chat loop's ResponseCache)
+    """
+    import cassette
+    import places
+    import vector_index
+
+    layers = store_layers(store)
+    exclude = {id(layer) for layer in layers}
+    report = {}
+    for layer in layers[:-1]:
+        own_state = {name: value for name, value in vars(layer).items() if name != "backend"}
+        report[f"store.{type(layer).__name__}"] = {"bytes": deep_sizeof(own_state, set(exclude))}
+    if places._cache is not None:
+        report["places.provider_cache"] = {"bytes": deep_sizeof(places._cache)}
+    if cassette._cassettes:
+        report["cassettes"] = {"bytes": deep_sizeof(cassette._cassettes)}
+    report["vector_index.word_slots"] = _lru_bytes(vector_index._word_slots, ("claim", 256))
+    report["vector_index.feature_slots"] = _lru_bytes(vector_index._feature_slot, ("w:claim", 256))
+    report["metrics"] = {"bytes": deep_sizeof((metrics._counters, metrics._gauges, metrics._timings))}
+    for name, obj in (extra or {}).items():
+        report[name] = {"bytes": deep_sizeof(obj, set(exclude))}
+    return report
+
+
+def session_sizes(checkpointer, top: int = 10) -> Dict[str, Any]:
+    """
+    Bytes of each conversation's checkpointed history in an InMemorySaver.
+
+    Counts the serialized checkpoints, channel blobs and pending writes of every thread.
+    """
+    if checkpointer is None or not hasattr(checkpointer, "storage"):
+        return {"sessions": 0, "bytes": 0, "largest": []}
+    per_thread: Dict[str, Dict[str, int]] = {}
+    for thread_id, namespaces in list(checkpointer.storage.items()):
+        entry = per_thread.setdefault(thread_id, {"bytes": 0, "checkpoints": 0})
+        entry["bytes"] += deep_sizeof(namespaces)
+        entry["checkpoints"] += sum(len(checkpoints) for checkpoints in namespaces.values())
+    for store in (checkpointer.blobs, checkpointer.writes):
+        for key, value in list(store.items()):
+            entry = per_thread.setdefault(key[0], {"bytes": 0, "checkpoints": 0})
+            entry["bytes"] += deep_sizeof(key) + deep_sizeof(value)
+    largest = sorted(per_thread.items(), key=lambda kv: kv[1]["bytes"], reverse=True)[:top]
+    total = sum(entry["bytes"] for entry in per_thread.values())
+    return {
+        "sessions": len(per_thread),
+        "bytes": total,
+        "avg_bytes": round(total / len(per_thread)) if per_thread else 0,
+        "largest": [{"thread_id": thread_id, **entry} for thread_id, entry in largest],
+    }
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_report(store, checkpointer=None, extra: Optional[Dict[str, Any]] = None,
+                  sample_size: int = DEFAULT_SAMPLE_SIZE, publish: bool = True,
+                  include_namespaces: bool = True) -> Dict[str, Any]:
+    """
+    Account the process's memory by component.
+
+    Args:
+        store: Active store (wrapper layers are unwrapped)
+        checkpointer: InMemorySaver holding conversation histories, if any
+        extra: Additional named caches to measure
+        sample_size: Items deep-sized per namespace before scaling up
+        publish: Also set memory.* gauges in the metrics registry
+        include_namespaces: Measure the store's namespaces (off in processes that only hold a store client)
+
+    Returns:
+        Namespaces, indexes, caches, sessions, accounted total and process RSS
+    """
+    start = time.perf_counter()
+    report: Dict[str, Any] = {
+        "namespaces": namespace_sizes(store, sample_size) if include_namespaces else {},
+        "indexes": index_sizes(store),
+        "caches": cache_sizes(store, extra),
+        "sessions": session_sizes(checkpointer),
+    }
+    report["accounted_bytes"] = (sum(entry["bytes"] or 0 for entry in report["namespaces"].values())
+                                 + sum(entry["bytes"] for entry in report["indexes"].values())
+                                 + sum(entry["bytes"] for entry in report["caches"].values())
+                                 + report["sessions"]["bytes"])
+    report["rss_bytes"] = _rss_bytes()
+    if tracemalloc.is_tracing():
+        report["traced_bytes"], report["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+    report["report_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if publish:
+        publish_report(report)
+    return report
+
+
+def publish_report(report: Dict[str, Any]) -> None:
+    """Expose a report as memory.* gauges."""
+    for name, entry in report["namespaces"].items():
+        if entry["bytes"] is not None:
+            metrics.set_gauge("memory.namespace_bytes", entry["bytes"], namespace=name)
+        metrics.set_gauge("memory.namespace_items", entry["items"], namespace=name)
+    for name, entry in report["indexes"].items():
+        metrics.set_gauge("memory.index_bytes", entry["bytes"], index=name)
+    for name, entry in report["caches"].items():
+        metrics.set_gauge("memory.cache_bytes", entry["bytes"], cache=name)
+    metrics.set_gauge("memory.session_bytes", report["sessions"]["bytes"])
+    metrics.set_gauge("memory.sessions", report["sessions"]["sessions"])
+    metrics.set_gauge("memory.accounted_bytes", report["accounted_bytes"])
+    if report["rss_bytes"] is not None:
+        metrics.set_gauge("memory.rss_bytes", report["rss_bytes"])
+
+
+def flatten(report: Dict[str, Any]) -> Dict[str, float]:
+    """One series per component ('namespace.claims', 'sessions', 'rss', ...) for growth tracking."""
+    series = {f"namespace.{name}": entry["bytes"] or 0 for name, entry in report["namespaces"].items()}
+    series.update({f"index.{name}": entry["bytes"] for name, entry in report["indexes"].items()})
+    series.update({f"cache.{name}": entry["bytes"] for name, entry in report["caches"].items()})
+    series["sessions"] = report["sessions"]["bytes"]
+    series["accounted"] = report["accounted_bytes"]
+    if report["rss_bytes"] is not None:
+        series["rss"] = report["rss_bytes"]
+    if "traced_bytes" in report:
+        series["traced"] = report["traced_bytes"]
+    return series
+
+
+def detect_growth(samples: List[Tuple[float, Dict[str, float]]], warmup_fraction: float = 0.2,
+                  min_growth: float = 0.1, min_bytes: int = 1 << 20) -> Dict[str, Dict[str, Any]]:
+    """
+    Flag series that keep growing after warm-up.
+
+    A series is flagged when each quarter of the post-warm-up samples averages
+    higher than the one before, and the last quarter is at least min_growth
+    (fractional) and min_bytes above the first.
+
+    Args:
+        samples: (elapsed seconds, flattened report) pairs in time order
+    """
+    steady = samples[int(len(samples) * warmup_fraction):]
+    if len(steady) < 8:
+        return {}
+    flagged = {}
+    for name in steady[-1][1]:
+        times = np.array([elapsed for elapsed, _ in steady], dtype=np.float64)
+        values = np.array([series.get(name, 0) for _, series in steady], dtype=np.float64)
+        quarter_means = [chunk.mean() for chunk in np.array_split(values, 4)]
+        rising = all(later > earlier for earlier, later in zip(quarter_means, quarter_means[1:]))
+        growth = quarter_means[-1] - quarter_means[0]
+        if not rising or growth < min_bytes or growth < min_growth * max(quarter_means[0], 1.0):
+            continue
+        slope = np.polyfit(times, values, 1)[0] if times[-1] > times[0] else 0.0
+        flagged[name] = {
+            "start_bytes": int(values[0]),
+            "end_bytes": int(values[-1]),
+            "bytes_per_hour": int(slope * 3600),
+        }
+    return flagged
+
+
+SOAK_QUESTIONS = [
+    "status of claim c{claim}",
+    "policy p{policy} details",
+    "premium for p{policy}",
+    "contact info for u{user}",
+    "Show me all the claims for customer u{user} and explain how much coverage remains",
+    "Compare policy p{policy} and p{other} and tell me which has the lower deductible",
+]
+
+
+def _soak_question(rng: random.Random) -> str:
+    template = rng.choice(SOAK_QUESTIONS)
+    return template.format(claim=rng.randint(1, 10), policy=rng.randint(1, 12),
+                           other=rng.randint(1, 12), user=rng.randint(1, 8))
+
+
+def _offline_agent():
+    """Bootstrapped in-memory store and an agent on the scripted model with an InMemorySaver."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from fake_llm import ScriptedChatModel
+    from inmemory_store import bootstrap_memory_store
+    from insurance_tools import set_default_store
+    from simple_agent import build_agent
+
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    set_default_store(store)
+    checkpointer = InMemorySaver()
+    return store, checkpointer, build_agent(model=ScriptedChatModel(), store=store, checkpointer=checkpointer)
+
+
+def _run_turn(agent, session_id: str, question: str, rng: random.Random, exercise_tools: bool) -> None:
+    from langchain_core.messages import HumanMessage
+    import insurance_tools
+
+    agent.invoke({"messages": [HumanMessage(content=question)]},
+                 config={"configurable": {"thread_id": session_id}})
+    if exercise_tools:
+        # Touch the lazily built indexes and caches the scripted model does not reach
+        insurance_tools.search_claims.invoke({"query": rng.choice(["water damage", "collision", "theft", "hail"])})
+        insurance_tools.get_claims_in_date_range.invoke({"start_date": "2024-01-01", "end_date": "2025-12-31"})
+
+
+def run_soak(duration_s: float, interval_s: float, turns_per_session: int = 10,
+             live_sessions: int = 50, exercise_tools: bool = True, seed: int = 7,
+             top_sites: int = 10) -> Dict[str, Any]:
+    """
+    Drive the offline agent for duration_s and report components that grow without bound.
+
+    Sessions rotate like real traffic: each runs turns_per_session turns, and
+    live_sessions are interleaved at a time.
+
+    Returns:
+        Turn count, first/last report, flagged series and the top tracemalloc growth sites
+    """
+    rng = random.Random(seed)
+    store, checkpointer, agent = _offline_agent()
+    tracemalloc.start()
+    samples: List[Tuple[float, Dict[str, float]]] = []
+    first_report, baseline_snapshot = None, None
+    turns, next_session = 0, live_sessions
+    active = {f"soak_{i}": 0 for i in range(live_sessions)}
+    start = time.perf_counter()
+    next_sample = start
+    while True:
+        now = time.perf_counter()
+        if now >= next_sample:
+            report = memory_report(store, checkpointer)
+            samples.append((now - start, flatten(report)))
+            first_report = first_report or report
+            if baseline_snapshot is None and now - start >= duration_s * 0.2:
+                baseline_snapshot = tracemalloc.take_snapshot()
+            logger.info(f"Soak {now - start:.0f}s: {turns} turns, {report['sessions']['sessions']} sessions, "
+                        f"accounted {report['accounted_bytes'] / 1e6:.1f} MB, "
+                        f"rss {(report['rss_bytes'] or 0) / 1e6:.1f} MB")
+            next_sample += interval_s
+            if now - start >= duration_s:
+                break
+        session_id = rng.choice(list(active))
+        _run_turn(agent, session_id, _soak_question(rng), rng, exercise_tools)
+        turns += 1
+        active[session_id] += 1
+        if active[session_id] >= turns_per_session:
+            # A retired conversation's history is dropped, as the server's session expiry would
+            checkpointer.delete_thread(session_id)
+            del active[session_id]
+            active[f"soak_{next_session}"] = 0
+            next_session += 1
+
+    sites = []
+    if baseline_snapshot is not None:
+        diff = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")
+        sites = [{"site": str(stat.traceback), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+                 for stat in diff[:top_sites] if stat.size_diff > 0]
+    tracemalloc.stop()
+    return {
+        "duration_s": round(time.perf_counter() - start, 1),
+        "turns": turns,
+        "sessions_started": next_session,
+        "samples": len(samples),
+        "first": first_report,
+        "last": report,
+        "unbounded_growth": detect_growth(samples),
+        "top_growth_sites": sites,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory accounting for the offline agent")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="Run some offline turns, then account memory by component")
+    report_parser.add_argument("--turns", type=int, default=200)
+    report_parser.add_argument("--sessions", type=int, default=20)
+    report_parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    soak_parser = subparsers.add_parser("soak", help="Run the offline agent for a long time and flag unbounded growth")
+    soak_parser.add_argument("--duration", type=float, default=3600.0, help="Seconds to run")
+    soak_parser.add_argument("--interval", type=float, default=60.0, help="Seconds between memory samples")
+    soak_parser.add_argument("--turns-per-session", type=int, default=10)
+    soak_parser.add_argument("--live-sessions", type=int, default=50)
+    soak_parser.add_argument("--no-tools", action="store_true", help="Do not exercise search/date-range tools")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        rng = random.Random(7)
+        store, checkpointer, agent = _offline_agent()
+        for turn in range(args.turns):
+            _run_turn(agent, f"session_{turn % args.sessions}", _soak_question(rng), rng, exercise_tools=True)
+        result = memory_report(store, checkpointer, sample_size=args.sample_size)
+        print(json.dumps(result, indent=2))
+        return
+
+    result = run_soak(args.duration, args.interval, args.turns_per_session, args.live_sessions,
+                      exercise_tools=not args.no_tools)
+    print(json.dumps(result, indent=2))
+    if result["unbounded_growth"]:
+        logger.warning(f"Unbounded growth in: {', '.join(result['unbounded_growth'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
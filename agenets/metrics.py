@@ -0,0 +1,104 @@
+"""
+Lightweight in-process metrics registry.
+Counters, gauges and timing summaries keyed by metric name plus optional labels.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Number of most recent samples kept per timing series for percentiles
+_RESERVOIR_SIZE = 2048
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, Any]] = {}
+
+
+def _series_key(name: str, labels: Dict[str, Any]) -> str:
+    """Build a flat series key such as 'llm.calls{tier=small}'."""
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def incr(name: str, value: float = 1.0, **labels) -> None:
+    """Increment a counter."""
+    key = _series_key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Set a gauge to an absolute value."""
+    key = _series_key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one sample (e.g. a latency in milliseconds) for a timing series."""
+    key = _series_key(name, labels)
+    with _lock:
+        series = _timings.get(key)
+        if series is None:
+            series = {"count": 0, "sum": 0.0, "min": value, "max": value,
+                      "samples": deque(maxlen=_RESERVOIR_SIZE)}
+            _timings[key] = series
+        series["count"] += 1
+        series["sum"] += value
+        series["min"] = min(series["min"], value)
+        series["max"] = max(series["max"], value)
+        series["samples"].append(value)
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Context manager recording the wall time of its body in milliseconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return a JSON-serializable copy of all metrics."""
+    with _lock:
+        timings = {}
+        for key, series in _timings.items():
+            ordered = sorted(series["samples"])
+            timings[key] = {
+                "count": series["count"],
+                "sum": round(series["sum"], 3),
+                "avg": round(series["sum"] / series["count"], 3) if series["count"] else 0.0,
+                "min": round(series["min"], 3),
+                "max": round(series["max"], 3),
+                "p50": round(_percentile(ordered, 0.50), 3),
+                "p95": round(_percentile(ordered, 0.95), 3),
+                "p99": round(_percentile(ordered, 0.99), 3),
+            }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
+
+
+def reset() -> None:
+    """Clear all metrics (used between benchmark runs)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
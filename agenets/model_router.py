@@ -0,0 +1,236 @@
+"""
+Model Router - Picks a model tier per agent step.
+Single-tool lookups go to a small/fast model; multi-step reasoning escalates
+to the large model. Routing decisions, latency and cost are logged per tier.
+"""
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+import metrics
+from resilience import CircuitBreaker, RateLimiter, ResiliencePolicy, ResilientModel, record_call
+from tool_selection import ToolSelector, tool_selection_enabled
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+
+_ID_PATTERN = re.compile(r"\b[upc]\d+\b", re.IGNORECASE)
+
+# Phrases that usually need planning, writes or arithmetic across records
+_MULTI_STEP_CUES = (
+    "and then", "compare", "why", "explain", "calculate", "remaining",
+    "file a claim", "add a claim", "new claim", "update", "change", "should",
+    "if ", "across", "all customers", "every", "which of",
+)
+
+# Longest question (in words) still considered a simple lookup
+_MAX_SIMPLE_WORDS = 18
+
+
+@dataclass
+class ModelTier:
+    """A routable model tier and its price (USD per 1K tokens)."""
+    name: str
+    factory: Callable[[], Any]
+    input_cost_per_1k: float = 0.0
+    output_cost_per_1k: float = 0.0
+    resilience: Optional[ResiliencePolicy] = None
+
+
+def classify_question(question: str) -> str:
+    """
+    Classify a user question as a simple lookup or a multi-step request.
+
+    Args:
+        question: The latest user message text
+
+    Returns:
+        SMALL_TIER for single-entity lookups, LARGE_TIER otherwise
+    """
+    lowered = question.lower()
+    entity_ids = {m.lower() for m in _ID_PATTERN.findall(question)}
+    if len(entity_ids) != 1:
+        return LARGE_TIER
+    if len(lowered.split()) > _MAX_SIMPLE_WORDS:
+        return LARGE_TIER
+    if any(cue in lowered for cue in _MULTI_STEP_CUES):
+        return LARGE_TIER
+    return SMALL_TIER
+
+
+def _current_turn(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Return the messages from the latest human message onwards."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index:]
+    return messages
+
+
+class _TierUsageCallback(BaseCallbackHandler):
+    """Records latency, token usage and cost of each call to one tier."""
+
+    def __init__(self, tier: ModelTier):
+        self.tier = tier
+        self._started: Dict[Any, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        latency_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        cost = (input_tokens * self.tier.input_cost_per_1k
+                + output_tokens * self.tier.output_cost_per_1k) / 1000
+
+        def record():
+            metrics.incr("llm.calls", tier=self.tier.name)
+            metrics.incr("llm.input_tokens", input_tokens, tier=self.tier.name)
+            metrics.incr("llm.output_tokens", output_tokens, tier=self.tier.name)
+            metrics.incr("llm.cost_usd", cost, tier=self.tier.name)
+            metrics.observe("llm.latency_ms", latency_ms, tier=self.tier.name)
+            logger.info(f"LLM call on tier {self.tier.name}: {latency_ms:.0f} ms, "
+                        f"{input_tokens}+{output_tokens} tokens, ${cost:.5f}")
+
+        # A hedged call counts once, with the winning attempt's usage
+        record_call(record)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+        metrics.incr("llm.errors", tier=self.tier.name)
+
+
+class ModelRouter:
+    """
+    Dynamic model selector for create_react_agent.
+
+    Called with (state, runtime) before every model step and returns the tier's
+    model with the agent tools bound. Tier models are built lazily on first use.
+    With a tool_selector, only the tools it picks for the turn are bound.
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], tools: List[Any],
+                 classifier: Callable[[str], str] = classify_question,
+                 default_tier: str = LARGE_TIER,
+                 tool_selector: Optional[Callable[[List[BaseMessage]], List[Any]]] = None):
+        if default_tier not in tiers:
+            raise ValueError(f"Default tier {default_tier} is not configured")
+        self.tiers = tiers
+        self.tools = tools
+        self.classifier = classifier
+        self.default_tier = default_tier
+        self.tool_selector = tool_selector
+        self._bound_models: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+    def choose_tier(self, messages: List[BaseMessage]) -> str:
+        """Choose the tier for the next model step of the current turn."""
+        turn = _current_turn(messages)
+        if not turn or not isinstance(turn[0], HumanMessage):
+            return self.default_tier
+        question = turn[0].content if isinstance(turn[0].content, str) else str(turn[0].content)
+        tier = self.classifier(question)
+        if tier not in self.tiers:
+            return self.default_tier
+
+        # A lookup needs at most one round of tool calls; more means multi-step reasoning
+        tool_rounds = sum(1 for m in turn if isinstance(m, AIMessage) and m.tool_calls)
+        if tier != LARGE_TIER and tool_rounds > 1 and LARGE_TIER in self.tiers:
+            logger.info(f"Escalating to {LARGE_TIER} tier after {tool_rounds} tool rounds")
+            metrics.incr("router.escalations")
+            return LARGE_TIER
+        return tier
+
+    def get_model(self, tier_name: str, tools: Optional[List[Any]] = None):
+        """Return a tier's model bound to tools (all agent tools by default), building it on first use."""
+        tools = self.tools if tools is None else tools
+        key = (tier_name, tuple(tool.name for tool in tools))
+        model = self._bound_models.get(key)
+        if model is None:
+            tier = self.tiers[tier_name]
+            model = tier.factory().bind_tools(tools).with_config(
+                callbacks=[_TierUsageCallback(tier)],
+                tags=[f"tier:{tier_name}"],
+            )
+            if tier.resilience is not None:
+                model = ResilientModel(model, tier.resilience, name=tier_name)
+            self._bound_models[key] = model
+        return model
+
+    def __call__(self, state, runtime=None):
+        messages = state["messages"] if isinstance(state, dict) else state.messages
+        tier_name = self.choose_tier(messages)
+        metrics.incr("router.decisions", tier=tier_name)
+        logger.info(f"Routing model step to tier {tier_name}")
+        tools = self.tool_selector(messages) if self.tool_selector is not None else None
+        return self.get_model(tier_name, tools)
+
+
+def build_default_router(tools: List[Any]) -> ModelRouter:
+    """
+    Build the production router from environment settings.
+
+    SMALL_MODEL / LARGE_MODEL choose the OpenAI models per tier; set
+    MODEL_ROUTING=off to send every step to the large model. OPENAI_RPM and
+    OPENAI_TPM cap requests/tokens per minute per tier, LLM_HEDGE_AFTER_S
+    enables hedged requests. LLM_CASSETTE=path records every response to a
+    cassette; with LLM_CASSETTE_MODE=replay responses come from the cassette
+    instead (LLM_REPLAY_LATENCY_SCALE=1 keeps the recorded latencies).
+    TOOL_SELECTION=off binds every tool on every call instead of a per-turn subset.
+    """
+    from langchain_openai import ChatOpenAI
+    from http_client import get_async_http_client, get_http_client
+    from cassette import RecordingChatModel, ReplayChatModel, get_cassette
+
+    small_model = os.environ.get("SMALL_MODEL", "gpt-4o-mini")
+    large_model = os.environ.get("LARGE_MODEL", "gpt-4o")
+    hedge_after = float(os.environ["LLM_HEDGE_AFTER_S"]) if os.environ.get("LLM_HEDGE_AFTER_S") else None
+
+    def policy(tier_name: str) -> ResiliencePolicy:
+        return ResiliencePolicy(
+            limiter=RateLimiter(float(os.environ.get("OPENAI_RPM", 500)),
+                                float(os.environ.get("OPENAI_TPM", 200000))),
+            breaker=CircuitBreaker(name=tier_name),
+            hedge_after_s=hedge_after,
+        )
+
+    cassette_path = os.environ.get("LLM_CASSETTE")
+    replaying = bool(cassette_path) and os.environ.get("LLM_CASSETTE_MODE", "record").lower() == "replay"
+
+    def chat_model(model_name: str):
+        if replaying:
+            return ReplayChatModel(cassette=get_cassette(cassette_path), model_name=model_name,
+                                   latency_scale=float(os.environ.get("LLM_REPLAY_LATENCY_SCALE", 0)))
+        # Retries are owned by the resilience layer, not the OpenAI SDK;
+        # connections come from the process-wide pooled HTTP clients
+        model = ChatOpenAI(model=model_name, max_retries=0,
+                           http_client=get_http_client(), http_async_client=get_async_http_client())
+        if cassette_path:
+            return RecordingChatModel(inner=model, cassette=get_cassette(cassette_path), model_name=model_name)
+        return model
+
+    # Replayed responses need no rate limiting, hedging or circuit breaking
+    def tier_policy(tier_name: str) -> Optional[ResiliencePolicy]:
+        return None if replaying else policy(tier_name)
+
+    tiers = {
+        SMALL_TIER: ModelTier(SMALL_TIER, lambda: chat_model(small_model), 0.00015, 0.0006, tier_policy(SMALL_TIER)),
+        LARGE_TIER: ModelTier(LARGE_TIER, lambda: chat_model(large_model), 0.0025, 0.01, tier_policy(LARGE_TIER)),
+    }
+    selector = ToolSelector(tools) if tool_selection_enabled() else None
+    if os.environ.get("MODEL_ROUTING", "on").lower() == "off":
+        return ModelRouter(tiers, tools, classifier=lambda question: LARGE_TIER, tool_selector=selector)
+    return ModelRouter(tiers, tools, tool_selector=selector)
@@ -0,0 +1,289 @@
+"""
+Places - Nearby provider search (repair shops, clinics, ...) for customers.
+Geocodes an address, calls the Google Places searchNearby endpoint and keeps a
+geohash-bucketed cache of results so repeat queries for the same area never
+leave the process. The cache can be snapshotted to disk for offline runs.
+
+Environment:
+    GOOGLE_API_KEY        API key for Geocoding and Places
+    PLACES_API_URL        searchNearby endpoint (point at a local stand-in for tests)
+    GOOGLE_GEOCODE_URL    Geocoding endpoint
+    PLACES_CACHE_PATH     JSON snapshot of the cache, loaded on first use and saved after updates
+    PLACES_OFFLINE        "1" to serve only from the cache/snapshot
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from http_client import get_http_client
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PLACES_URL = "https://places.googleapis.com/v1/places:searchNearby"
+DEFAULT_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+FIELD_MASK = ("places.displayName,places.formattedAddress,places.rating,"
+              "places.businessStatus,places.location,places.nationalPhoneNumber")
+
+# Friendly provider names accepted by the tool -> Places API place types
+PROVIDER_TYPES = {
+    "repair_shop": ["car_repair"],
+    "auto_body": ["car_repair"],
+    "clinic": ["doctor", "hospital"],
+    "hospital": ["hospital"],
+    "doctor": ["doctor"],
+    "pharmacy": ["pharmacy"],
+    "dentist": ["dentist"],
+    "contractor": ["general_contractor"],
+}
+
+# Geohash precision 6 buckets are roughly 1.2 km x 0.6 km
+GEOHASH_PRECISION = 6
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a geohash string."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            target[0] = mid
+        else:
+            target[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+class ProviderCache:
+    """Thread-safe cache of geocodes and nearby-search results with a JSON snapshot."""
+
+    def __init__(self, snapshot_path: Optional[str] = None, ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.snapshot_path = snapshot_path
+        self.ttl_seconds = ttl_seconds
+        self._geocodes: Dict[str, List[float]] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # One thread writes the snapshot at a time; updates made meanwhile set _dirty for its next pass
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    @staticmethod
+    def result_key(latitude: float, longitude: float, provider_type: str, radius_meters: float) -> str:
+        return f"{geohash_encode(latitude, longitude)}:{provider_type}:{int(radius_meters)}"
+
+    def get_geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            coords = self._geocodes.get(address.strip().lower())
+        return tuple(coords) if coords else None
+
+    def put_geocode(self, address: str, latitude: float, longitude: float) -> None:
+        with self._lock:
+            self._geocodes[address.strip().lower()] = [latitude, longitude]
+
+    def get_results(self, key: str, allow_stale: bool = False) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._results.get(key)
+        if entry is None:
+            return None
+        if not allow_stale and time.time() - entry["fetched_at"] > self.ttl_seconds:
+            return None
+        return entry["places"]
+
+    def put_results(self, key: str, places: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._results[key] = {"places": places, "fetched_at": time.time()}
+
+    def load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self._geocodes.update(data.get("geocodes", {}))
+            self._results.update(data.get("results", {}))
+        logger.info(f"Loaded places snapshot from {path}: {len(self._results)} result buckets")
+
+    def _snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"geocodes": dict(self._geocodes), "results": dict(self._results)}
+
+    @staticmethod
+    def _write(path: str, data: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the cache to a snapshot file now."""
+        path = path or self.snapshot_path
+        if path:
+            self._write(path, self._snapshot())
+
+    def persist(self) -> None:
+        """
+        Save to the snapshot path after an update. Concurrent updates are coalesced:
+        while one thread writes, the others only mark the cache dirty for its next pass.
+        """
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            self._dirty = True
+        while self._save_lock.acquire(blocking=False):
+            try:
+                while True:
+                    with self._lock:
+                        if not self._dirty:
+                            break
+                        self._dirty = False
+                    try:
+                        self.save()
+                    except OSError as e:
+                        # The results are still served from memory; the next update retries the write
+                        with self._lock:
+                            self._dirty = True
+                        logger.warning(f"Could not save places snapshot to {self.snapshot_path}: {str(e)}")
+                        return
+            finally:
+                self._save_lock.release()
+            # An update marked after the last check but before the release still needs a writer
+            with self._lock:
+                if not self._dirty:
+                    return
+
+
+_cache: Optional[ProviderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_provider_cache() -> ProviderCache:
+    """Return the process-wide provider cache, loading the snapshot on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProviderCache(os.environ.get("PLACES_CACHE_PATH"))
+    return _cache
+
+
+def _offline() -> bool:
+    return os.environ.get("PLACES_OFFLINE", "0") == "1"
+
+
+def geocode_address(address: str) -> Tuple[float, float]:
+    """
+    Resolve an address to (latitude, longitude), using the cache when possible.
+
+    Raises:
+        LookupError: If the address cannot be geocoded
+    """
+    cache = get_provider_cache()
+    coords = cache.get_geocode(address)
+    if coords:
+        return coords
+    if _offline():
+        raise LookupError(f"No cached geocode for '{address}' in offline mode")
+
+    metrics.incr("places.api_calls", endpoint="geocode")
+    response = get_http_client().get(
+        os.environ.get("GOOGLE_GEOCODE_URL", DEFAULT_GEOCODE_URL),
+        params={"address": address, "key": os.environ.get("GOOGLE_API_KEY", "")},
+    )
+    response.raise_for_status()
+    results = response.json().get("results", [])
+    if not results:
+        raise LookupError(f"Could not geocode address '{address}'")
+    location = results[0]["geometry"]["location"]
+    cache.put_geocode(address, location["lat"], location["lng"])
+    cache.persist()
+    return location["lat"], location["lng"]
+
+
+def _simplify_place(place: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": place.get("displayName", {}).get("text", "N/A"),
+        "address": place.get("formattedAddress"),
+        "phone": place.get("nationalPhoneNumber"),
+        "rating": place.get("rating"),
+        "business_status": place.get("businessStatus"),
+        "location": place.get("location"),
+    }
+
+
+def search_nearby(latitude: float, longitude: float, provider_type: str,
+                  radius_meters: float = 5000.0, max_results: int = 10) -> List[Dict[str, Any]]:
+    """
+    Find providers of a type around a coordinate (same request shape as test_google_api.py).
+
+    Returns:
+        List of simplified place dictionaries
+    """
+    if provider_type not in PROVIDER_TYPES:
+        raise ValueError(f"Unknown provider type '{provider_type}'. Valid options: {', '.join(PROVIDER_TYPES)}")
+
+    cache = get_provider_cache()
+    key = ProviderCache.result_key(latitude, longitude, provider_type, radius_meters)
+    places = cache.get_results(key, allow_stale=_offline())
+    if places is not None:
+        metrics.incr("places.cache_hits")
+        return places[:max_results]
+    if _offline():
+        raise LookupError(f"No cached providers for area {key} in offline mode")
+
+    metrics.incr("places.cache_misses")
+    metrics.incr("places.api_calls", endpoint="searchNearby")
+    payload = {
+        "includedTypes": PROVIDER_TYPES[provider_type],
+        "maxResultCount": 20,
+        "locationRestriction": {
+            "circle": {
+                "center": {"latitude": latitude, "longitude": longitude},
+                "radius": radius_meters,
+            }
+        },
+    }
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": os.environ.get("GOOGLE_API_KEY", ""),
+        "X-Goog-FieldMask": FIELD_MASK,
+    }
+    response = get_http_client().post(os.environ.get("PLACES_API_URL", DEFAULT_PLACES_URL),
+                                      json=payload, headers=headers)
+    response.raise_for_status()
+    places = [_simplify_place(p) for p in response.json().get("places", [])]
+    cache.put_results(key, places)
+    cache.persist()
+    return places[:max_results]
+
+
+def find_providers_near_address(address: str, provider_type: str,
+                                radius_meters: float = 5000.0, max_results: int = 10) -> Dict[str, Any]:
+    """Geocode an address and return nearby providers of the given type."""
+    latitude, longitude = geocode_address(address)
+    places = search_nearby(latitude, longitude, provider_type, radius_meters, max_results)
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "geohash": geohash_encode(latitude, longitude),
+        "providers": places,
+    }
@@ -0,0 +1,212 @@
+"""
+Speculative Prefetch - Start the store reads a question implies before the model asks for them.
+Runs as the agent's pre-model hook: on the first model call of a turn, the IDs
+mentioned in the user's message ("u2", "p8", "c5") are extracted and the records
+the tools will almost certainly read (the customer, their policies and claims,
+the policy, the claim) are fetched on a thread pool while the model call is in
+flight. The tools read through cached_get()/cached_search(), so their calls
+pick up the prefetched results instead of going back to the store.
+
+Entries belong to one conversation turn: a new turn of the same thread replaces
+them, writes drop the namespace they touch, and anything older than
+PREFETCH_TTL_S (default 15 s) is ignored.
+
+Environment:
+    PREFETCH            Set to "0" to disable prefetching
+    PREFETCH_TTL_S      Seconds a prefetched result may be used
+    PREFETCH_THREADS    Concurrent prefetch reads per process (default 8)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_config, get_store
+
+import metrics
+from inmemory_store import claims_namespace, policies_namespace, search_all, user_namespace
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+ENABLED = os.environ.get("PREFETCH", "1") != "0"
+TTL_S = float(os.environ.get("PREFETCH_TTL_S", 15))
+THREADS = int(os.environ.get("PREFETCH_THREADS", 8))
+# Longest a tool waits for an in-flight prefetch before reading the store itself
+WAIT_S = 5.0
+
+_ID_PATTERN = re.compile(r"\b([upc])(\d+)\b", re.IGNORECASE)
+_NAMESPACES = {"u": user_namespace, "p": policies_namespace, "c": claims_namespace}
+
+_MISS = object()
+
+
+def extract_entities(text: str) -> Dict[tuple, List[str]]:
+    """Customer, policy and claim IDs mentioned in a message, by namespace (in order, deduplicated)."""
+    entities: Dict[tuple, List[str]] = {namespace: [] for namespace in _NAMESPACES.values()}
+    for prefix, number in _ID_PATTERN.findall(text):
+        ids = entities[_NAMESPACES[prefix.lower()]]
+        entity_id = f"{prefix.lower()}{number}"
+        if entity_id not in ids:
+            ids.append(entity_id)
+    return entities
+
+
+def _read_key(kind: str, namespace: tuple, arg: Any) -> Tuple[str, tuple, str]:
+    return kind, namespace, arg if isinstance(arg, str) else json.dumps(arg, sort_keys=True)
+
+
+class PrefetchCache:
+    """
+    In-flight and completed store reads per conversation thread.
+
+    Args:
+        ttl_s: Seconds a prefetched result may be used
+        threads: Concurrent prefetch reads
+    """
+
+    def __init__(self, ttl_s: float = TTL_S, threads: int = THREADS):
+        self.ttl_s = ttl_s
+        self.threads = threads
+        self._lock = threading.Lock()
+        # thread_id -> (store, started_at, {read key: future})
+        self._turns: Dict[str, Tuple[Any, float, Dict[tuple, Future]]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        # Created on first use so forked workers do not inherit a parent's pool threads
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="prefetch")
+        return self._executor.submit(fn, *args)
+
+    def begin_turn(self, thread_id: str, store) -> Dict[tuple, Future]:
+        """Replace the thread's entries with an empty set for a new turn."""
+        reads: Dict[tuple, Future] = {}
+        with self._lock:
+            self._turns[thread_id] = (store, time.monotonic(), reads)
+            # Drop turns nobody will read any more
+            expired = [tid for tid, (_, started, _) in self._turns.items()
+                       if time.monotonic() - started > self.ttl_s]
+            for tid in expired:
+                del self._turns[tid]
+        return reads
+
+    def start(self, reads: Dict[tuple, Future], key: tuple, fn: Callable, *args) -> Future:
+        """Start a read unless the turn already has it."""
+        with self._lock:
+            future = reads.get(key)
+            if future is None:
+                future = reads[key] = self._submit(fn, *args)
+                metrics.incr("prefetch.started", namespace=key[1][0])
+        return future
+
+    def take(self, store, key: tuple) -> Any:
+        """Result of a prefetched read for the current thread, or _MISS."""
+        try:
+            thread_id = get_config().get("configurable", {}).get("thread_id")
+        except RuntimeError:
+            return _MISS
+        with self._lock:
+            turn = self._turns.get(thread_id)
+            if turn is None:
+                return _MISS
+            owner, started, reads = turn
+            future = reads.get(key)
+        if future is None or owner is not store or time.monotonic() - started > self.ttl_s:
+            return _MISS
+        wait_start = time.perf_counter()
+        try:
+            result = future.result(timeout=WAIT_S)
+        except FutureTimeoutError:
+            metrics.incr("prefetch.timeouts", namespace=key[1][0])
+            return _MISS
+        except Exception as e:
+            logger.warning(f"Prefetch of {key} failed, reading directly: {str(e)}")
+            return _MISS
+        metrics.observe("prefetch.wait_ms", (time.perf_counter() - wait_start) * 1000)
+        metrics.incr("prefetch.hits", namespace=key[1][0])
+        return result
+
+    def invalidate(self, namespace: tuple) -> None:
+        """Forget every prefetched read of a namespace (called after writes to it)."""
+        with self._lock:
+            for _, _, reads in self._turns.values():
+                for key in [key for key in reads if key[1] == namespace]:
+                    del reads[key]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_cache = PrefetchCache()
+
+
+def cached_get(store, namespace: tuple, key: str):
+    """store.get() that uses this turn's prefetched result when there is one."""
+    result = _cache.take(store, _read_key("get", namespace, key))
+    return store.get(namespace, key) if result is _MISS else result
+
+
+def cached_search(store, namespace: tuple, filter: Dict[str, Any]) -> List:
+    """search_all() with an equality filter that uses this turn's prefetched result when there is one."""
+    result = _cache.take(store, _read_key("search", namespace, filter))
+    return search_all(store, namespace, filter=filter) if result is _MISS else result
+
+
+def invalidate_prefetch(namespace: tuple) -> None:
+    """Drop prefetched reads of a namespace after a write to it."""
+    _cache.invalidate(namespace)
+
+
+def start_prefetch(store, thread_id: str, text: str) -> int:
+    """
+    Start the reads implied by the IDs in a user message for a thread's new turn.
+
+    Returns:
+        Number of reads started
+    """
+    entities = extract_entities(text)
+    reads = _cache.begin_turn(thread_id, store)
+    for customer_id in entities[user_namespace]:
+        _cache.start(reads, _read_key("get", user_namespace, customer_id),
+                     store.get, user_namespace, customer_id)
+        # Policies and claims point at their customer, so both are read by user_id
+        owned = {"user_id": customer_id}
+        for namespace in (policies_namespace, claims_namespace):
+            _cache.start(reads, _read_key("search", namespace, owned),
+                         lambda namespace=namespace: search_all(store, namespace, filter=owned))
+    for namespace in (policies_namespace, claims_namespace):
+        for entity_id in entities[namespace]:
+            _cache.start(reads, _read_key("get", namespace, entity_id), store.get, namespace, entity_id)
+    return len(reads)
+
+
+def prefetch_entities(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    """Pre-model hook: on a turn's first model call, prefetch the records its question mentions."""
+    messages = state["messages"]
+    if not ENABLED or not messages or not isinstance(messages[-1], HumanMessage):
+        return {}
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if thread_id is None:
+        return {}
+    try:
+        store = get_store()
+    except RuntimeError:
+        return {}
+    if store is None:
+        return {}
+    content = messages[-1].content
+    start_prefetch(store, thread_id, content if isinstance(content, str) else str(content))
+    return {}
@@ -0,0 +1,253 @@
+"""
+Request Profiling - On-demand CPU profiles of single agent requests.
+A request runs under cProfile (deterministic, per-call timings; writes a .prof
+file for pstats/snakeviz) or under a statistical stack sampler (writes a
+.folded file of collapsed stacks for flamegraph.pl or speedscope). Profiling is
+switched on per request (the chat /profile command, the server's X-Profile
+header) or for a sampled fraction of requests (PROFILE_SAMPLE_RATE). When off,
+the only cost per request is one random() comparison.
+
+Only the threads doing the request's work are profiled: the calling thread,
+threads started during the request that run in its context (tool and graph
+executors copy the context), and pooled threads running functions wrapped with
+follow_request(). Concurrent requests of other sessions stay out of the profile.
+
+Environment:
+    PROFILE_DIR          Output directory (default ./profiles)
+    PROFILE_SAMPLE_RATE  Fraction of requests profiled automatically (default 0)
+    PROFILE_MODE         Mode for sampled requests: cprofile or sampling (default sampling)
+"""
+
+import cProfile
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+import metrics
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+MODES = ("cprofile", "sampling")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0) or 0)
+SAMPLED_MODE = os.environ.get("PROFILE_MODE", "sampling")
+
+# Leaf frames of threads that are parked, not working (skipped by the sampler)
+_IDLE_LEAVES = frozenset({"wait", "select", "poll", "get", "_worker", "_wait_for_tstate_lock", "accept", "recv", "recv_into"})
+_IDLE_FILES = frozenset({"threading.py", "queue.py", "selectors.py", "socket.py", "connection.py", "thread.py"})
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Profiled request whose work the current context belongs to
+_current: ContextVar[Optional["_RequestThreads"]] = ContextVar("profiled_request", default=None)
+_active_lock = threading.Lock()
+_active_requests = 0
+
+
+def choose_mode(requested: Optional[str] = None) -> Optional[str]:
+    """
+    Profiling mode for a request: the explicitly requested one, a sampled default, or None.
+
+    Args:
+        requested: "cprofile", "sampling", or any truthy value ("1", "true") for the default mode
+    """
+    if requested:
+        requested = str(requested).lower()
+        if requested in MODES:
+            return requested
+        if requested in ("0", "false", "off", "no"):
+            return None
+        return SAMPLED_MODE
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return SAMPLED_MODE
+    return None
+
+
+class _RequestThreads:
+    """Threads working for one profiled request, with a cProfile profiler per thread in cprofile mode."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.thread_ids: Set[int] = set()
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def enroll(self) -> Optional[cProfile.Profile]:
+        """Attribute the calling thread to the request (and start profiling it in cprofile mode)."""
+        with self._lock:
+            self.thread_ids.add(threading.get_ident())
+        if self.mode != "cprofile":
+            return None
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+        return profiler
+
+    def leave(self, profiler: Optional[cProfile.Profile]) -> None:
+        if profiler is not None:
+            profiler.disable()
+        with self._lock:
+            self.thread_ids.discard(threading.get_ident())
+
+
+def _enroll_hook(frame, event, arg) -> None:
+    """Profile hook of threads started during a profiled request: enrolls the ones running its work."""
+    if not _active_requests:
+        sys.setprofile(None)
+        return
+    request = _current.get()
+    if request is not None:
+        sys.setprofile(None)
+        request.enroll()  # for the thread's lifetime; executor threads end with the request
+
+
+def follow_request(fn: Callable) -> Callable:
+    """
+    Wrap a function submitted to a long-lived pool so the thread running it counts
+    toward the profiled request that submitted it.
+
+    The pool must copy the submitter's context (ContextThreadPoolExecutor does).
+    """
+    @wraps(fn)
+    def run(*args, **kwargs):
+        request = _current.get()
+        if request is None:
+            return fn(*args, **kwargs)
+        profiler = request.enroll()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            request.leave(profiler)
+    return run
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of other threads at a fixed interval.
+
+    Args:
+        interval_s: Time between samples
+        thread_ids: Live set of thread ids to sample; None samples every thread
+    """
+
+    def __init__(self, interval_s: float = 0.002, thread_ids: Optional[Set[int]] = None):
+        self.interval_s = interval_s
+        self.thread_ids = thread_ids
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.counts
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            wanted = None if self.thread_ids is None else frozenset(self.thread_ids)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (wanted is not None and thread_id not in wanted):
+                    continue
+                code = frame.f_code
+                if code.co_name in _IDLE_LEAVES and os.path.basename(code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path: str) -> None:
+        """Collapsed-stack lines ("frame;frame;frame count") as read by flamegraph.pl and speedscope."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def _tracking(mode: str) -> Iterator[_RequestThreads]:
+    """Track the threads of the request run in the with-block, starting with the calling thread."""
+    global _active_requests
+    request = _RequestThreads(mode)
+    with _active_lock:
+        _active_requests += 1
+        threading.setprofile(_enroll_hook)
+    request.thread_ids.add(threading.get_ident())
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+        with _active_lock:
+            _active_requests -= 1
+            if not _active_requests:
+                threading.setprofile(None)
+
+
+@contextmanager
+def profile_request(request_id: str, mode: Optional[str]) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Profile the body of a with-block when mode is set.
+
+    Covers the calling thread and the threads that pick up the request's work
+    (see the module docstring); other threads of the process are left out.
+
+    Yields a dict whose "path" holds the written profile once the block exits
+    (None when profiling is off).
+    """
+    result: Dict[str, Optional[str]] = {"path": None}
+    if mode is None:
+        yield result
+        return
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}'. Valid options: {', '.join(MODES)}")
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{_SAFE_ID.sub('_', request_id)}-{int(time.time() * 1000)}")
+    start = time.perf_counter()
+    with _tracking(mode) as request:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield result
+            finally:
+                profiler.disable()
+                stats = pstats.Stats(profiler)
+                for thread_profiler in list(request.profilers):
+                    stats.add(thread_profiler)
+                result["path"] = base + ".prof"
+                stats.dump_stats(result["path"])
+        else:
+            sampler = StackSampler(thread_ids=request.thread_ids).start()
+            try:
+                yield result
+            finally:
+                sampler.stop()
+                result["path"] = base + ".folded"
+                sampler.write_folded(result["path"])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics.incr("profiler.requests", mode=mode)
+    logger.info(f"Profiled request {request_id} ({mode}, {elapsed_ms:.0f} ms) -> {result['path']}")
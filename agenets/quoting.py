@@ -0,0 +1,221 @@
+"""
+Quoting Engine - Vectorized renewal premiums for whole books of policies.
+Policies are priced as NumPy columns: a base rate per $1,000 of coverage by
+policy type, adjusted by the customer's age band (from date_of_birth), a loyalty
+discount for tenure (from join_date) and a surcharge for recent paid claims.
+The same code prices one policy for the agent tool or millions in a batch run.
+
+Usage:
+    python agenets/quoting.py                                  # re-quote the sample store
+    python agenets/quoting.py --synthetic 2000000 --out quotes.npz
+"""
+
+import argparse
+import json
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+import metrics
+from date_index import to_ordinal
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+POLICY_TYPES = ("Health", "Auto", "Home", "Life", "Travel", "Standard")
+_TYPE_CODES = {name: code for code, name in enumerate(POLICY_TYPES)}
+_STANDARD = _TYPE_CODES["Standard"]
+
+# Annual premium per $1,000 of coverage
+BASE_RATES = np.array([0.70, 0.40, 1.30, 0.08, 1.70, 1.00])
+DEDUCTIBLES = np.array([1000.0, 500.0, 2000.0, 0.0, 100.0, 750.0])
+MINIMUM_PREMIUM = 25.0
+
+# Age bands start at these ages: <25, 25-34, 35-44, 45-54, 55-64, 65+
+AGE_BAND_STARTS = np.array([25, 35, 45, 55, 65])
+AGE_FACTORS = np.array([
+    [0.85, 0.95, 1.00, 1.20, 1.45, 1.80],  # Health
+    [1.60, 1.10, 1.00, 0.95, 1.00, 1.15],  # Auto
+    [1.10, 1.00, 1.00, 1.00, 1.00, 1.05],  # Home
+    [0.60, 0.80, 1.00, 1.60, 2.60, 4.00],  # Life
+    [1.00, 1.00, 1.00, 1.10, 1.25, 1.60],  # Travel
+    [1.00, 1.00, 1.00, 1.00, 1.00, 1.00],  # Standard
+])
+
+TENURE_DISCOUNT_PER_YEAR = 0.01
+MAX_TENURE_DISCOUNT = 0.10
+CLAIM_SURCHARGE = 0.10           # per paid claim in the lookback window
+LOSS_RATIO_SURCHARGE = 0.50      # times paid amount / coverage
+MAX_CLAIMS_SURCHARGE = 0.50
+CLAIMS_LOOKBACK_DAYS = 3 * 365
+PAID_STATUSES = ("Approved", "Closed")
+
+
+def type_codes(policy_types: Iterable[Optional[str]]) -> np.ndarray:
+    """Map policy type names to rate-table rows (unknown types price as Standard)."""
+    return np.fromiter((_TYPE_CODES.get(t, _STANDARD) for t in policy_types), dtype=np.int8)
+
+
+def quote_arrays(policy_type: np.ndarray, coverage: np.ndarray, age_years: np.ndarray,
+                 tenure_years: np.ndarray, paid_claims: np.ndarray, paid_amount: np.ndarray,
+                 deductible: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Price policies given as parallel arrays.
+
+    Args:
+        policy_type: Rate-table rows from type_codes()
+        coverage: Coverage amounts
+        age_years: Customer ages in years (NaN when unknown; no age adjustment)
+        tenure_years: Years since the customer joined (NaN when unknown)
+        paid_claims: Approved/closed claims in the lookback window
+        paid_amount: Total amount of those claims
+        deductible: Each policy's own deductible (NaN, or None for all, uses the policy type's default)
+
+    Returns:
+        Column name -> array: base_premium, age_factor, tenure_discount, claims_surcharge,
+        annual_premium and deductible
+    """
+    coverage = np.asarray(coverage, dtype=np.float64)
+    base = coverage / 1000.0 * BASE_RATES[policy_type]
+
+    age_years = np.asarray(age_years, dtype=np.float64)
+    known_age = ~np.isnan(age_years)
+    bands = np.searchsorted(AGE_BAND_STARTS, np.where(known_age, age_years, 0), side="right")
+    age_factor = np.where(known_age, AGE_FACTORS[policy_type, bands], 1.0)
+
+    tenure = np.nan_to_num(np.asarray(tenure_years, dtype=np.float64), nan=0.0)
+    tenure_discount = np.minimum(np.floor(np.maximum(tenure, 0)) * TENURE_DISCOUNT_PER_YEAR, MAX_TENURE_DISCOUNT)
+
+    loss_ratio = np.divide(paid_amount, coverage, out=np.zeros_like(coverage), where=coverage > 0)
+    claims_surcharge = np.minimum(CLAIM_SURCHARGE * np.asarray(paid_claims) + LOSS_RATIO_SURCHARGE * loss_ratio,
+                                  MAX_CLAIMS_SURCHARGE)
+
+    deductibles = DEDUCTIBLES[policy_type]
+    if deductible is not None:
+        deductible = np.asarray(deductible, dtype=np.float64)
+        deductibles = np.where(np.isnan(deductible), deductibles, deductible)
+
+    annual = np.maximum(base * age_factor * (1 - tenure_discount) * (1 + claims_surcharge), MINIMUM_PREMIUM)
+    return {
+        "base_premium": base,
+        "age_factor": age_factor,
+        "tenure_discount": tenure_discount,
+        "claims_surcharge": claims_surcharge,
+        "annual_premium": np.round(annual, 2),
+        "deductible": deductibles,
+    }
+
+
+def _years_between(start_ordinals: np.ndarray, as_of: int) -> np.ndarray:
+    years = (as_of - start_ordinals) / 365.25
+    return np.where(start_ordinals > 0, years, np.nan)
+
+
+def quote_policies(policies: Dict[str, Dict[str, Any]], customers: Dict[str, Dict[str, Any]],
+                   claims: Iterable[Dict[str, Any]], as_of: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Price store records: gathers the rating inputs into columns, then calls quote_arrays.
+
+    Args:
+        policies: policy_id -> policy record (policy_type, coverage_amount, deductible, user_id, ...)
+        customers: user_id -> customer record (date_of_birth, join_date)
+        claims: Claim records; only paid claims on these policies within the lookback count
+        as_of: Quote date (YYYY-MM-DD); defaults to today
+
+    Returns:
+        The quote_arrays columns, one row per policy in the order of `policies`
+    """
+    as_of_ordinal = to_ordinal(as_of) if as_of else date.today().toordinal()
+    if as_of_ordinal is None:
+        raise ValueError("as_of must be in YYYY-MM-DD format")
+    rows = {policy_id: row for row, policy_id in enumerate(policies)}
+    records = list(policies.values())
+    owners = [customers.get(policy.get("user_id")) or {} for policy in records]
+
+    paid_claims = np.zeros(len(policies))
+    paid_amount = np.zeros(len(policies))
+    claim_rows, claim_amounts = [], []
+    for claim in claims:
+        row = rows.get(claim.get("policy_id"))
+        if row is None or claim.get("status") not in PAID_STATUSES:
+            continue
+        filed = to_ordinal(claim.get("claim_date") or claim.get("created_date"))
+        if filed is None or not 0 <= as_of_ordinal - filed <= CLAIMS_LOOKBACK_DAYS:
+            continue
+        claim_rows.append(row)
+        claim_amounts.append(float(claim.get("amount") or 0))
+    if claim_rows:
+        paid_claims = np.bincount(claim_rows, minlength=len(policies)).astype(np.float64)
+        paid_amount = np.bincount(claim_rows, weights=claim_amounts, minlength=len(policies))
+
+    return quote_arrays(
+        type_codes(policy.get("policy_type") for policy in records),
+        np.fromiter((float(policy.get("coverage_amount") or 0) for policy in records), dtype=np.float64),
+        _years_between(np.fromiter((to_ordinal(o.get("date_of_birth")) or 0 for o in owners), dtype=np.int64),
+                       as_of_ordinal),
+        _years_between(np.fromiter((to_ordinal(o.get("join_date")) or 0 for o in owners), dtype=np.int64),
+                       as_of_ordinal),
+        paid_claims,
+        paid_amount,
+        np.fromiter((np.nan if policy.get("deductible") is None else float(policy["deductible"]) for policy in records),
+                    dtype=np.float64, count=len(records)),
+    )
+
+
+def synthetic_book(count: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Random rating inputs for batch benchmarks."""
+    rng = np.random.default_rng(seed)
+    return {
+        "policy_type": rng.integers(0, len(POLICY_TYPES), count).astype(np.int8),
+        "coverage": rng.choice([50_000, 100_000, 250_000, 500_000, 750_000, 1_000_000], count).astype(np.float64),
+        "age_years": rng.uniform(18, 85, count),
+        "tenure_years": rng.uniform(0, 20, count),
+        "paid_claims": rng.poisson(0.3, count).astype(np.float64),
+        "paid_amount": rng.exponential(4000, count) * (rng.random(count) < 0.25),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-quote a book of policies")
+    parser.add_argument("--synthetic", type=int, default=0, help="Price N random policies instead of the store")
+    parser.add_argument("--as-of", default=None, help="Quote date (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--out", default=None, help="Write all quote columns to this .npz file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        book = synthetic_book(args.synthetic)
+        policy_ids = None
+        start = time.perf_counter()
+        quotes = quote_arrays(**book)
+    else:
+        from langgraph.store.memory import InMemoryStore
+        from inmemory_store import bootstrap_memory_store, claims_namespace, policies_namespace, search_all, user_namespace
+        store = InMemoryStore()
+        bootstrap_memory_store(store)
+        policies = {item.key: item.value for item in search_all(store, policies_namespace)
+                    if item.value.get("status") == "Active"}
+        customers = {item.key: item.value for item in search_all(store, user_namespace)}
+        claims = [item.value for item in search_all(store, claims_namespace)]
+        policy_ids = list(policies)
+        start = time.perf_counter()
+        quotes = quote_policies(policies, customers, claims, as_of=args.as_of)
+    elapsed = time.perf_counter() - start
+    metrics.observe("quoting.batch_ms", elapsed * 1000)
+
+    if args.out:
+        np.savez(args.out, **quotes)
+    summary = {
+        "policies": len(quotes["annual_premium"]),
+        "seconds": round(elapsed, 3),
+        "policies_per_second": round(len(quotes["annual_premium"]) / elapsed) if elapsed else None,
+        "total_annual_premium": round(float(quotes["annual_premium"].sum()), 2),
+    }
+    if policy_ids is not None:
+        summary["quotes"] = {pid: float(premium) for pid, premium in zip(policy_ids, quotes["annual_premium"])}
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Resilience - Client-side protection around LLM calls.
+Token-bucket limits on requests and tokens per minute, jittered exponential
+retries, hedged requests for tail latency and a circuit breaker.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+import metrics
+from profiling import follow_request
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Shared pool for hedged attempts; sized for a handful of in-flight calls per worker
+_hedge_executor = ContextThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+# Records (cassette entries, usage and cost metrics) of the hedged attempt running in this context
+_attempt_records: ContextVar[Optional[List[Callable[[], None]]]] = ContextVar("attempt_records", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker rejects a call without trying it."""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return True for rate limits, timeouts, connection errors and 5xx responses."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in {"APIConnectionError", "APITimeoutError", "TimeoutError",
+                                    "ConnectError", "ReadTimeout", "RemoteProtocolError"}
+
+
+def record_call(record: Callable[[], None]) -> None:
+    """
+    Record a finished model call (cassette entry, usage metrics). Inside a hedged
+    attempt the record is kept until the attempt wins and dropped if it loses, so a
+    hedged call is recorded once.
+    """
+    records = _attempt_records.get()
+    if records is None:
+        record()
+    else:
+        records.append(record)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough prompt size in tokens (about 4 characters per token)."""
+    if isinstance(value, dict):
+        value = value.get("messages", value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_tokens(item) for item in value)
+    content = getattr(value, "content", value)
+    return max(1, len(str(content)) // 4)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens, returning how long the caller must wait before proceeding."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until `amount` tokens are available; returns the time waited in seconds."""
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """Combined requests-per-minute and tokens-per-minute limiter."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens: int = 0) -> float:
+        waited = self.requests.acquire(1)
+        if self.tokens and tokens:
+            waited += self.tokens.acquire(tokens)
+        if waited:
+            metrics.observe("llm.ratelimit_wait_ms", waited * 1000)
+        return waited
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `reset_timeout_s`, then lets a single probe call through.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0, name: str = "llm"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.name = name
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout_s:
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.HALF_OPEN:
+                # Only one probe at a time
+                return False
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self._failures} failures")
+                    metrics.incr("llm.circuit_opened", circuit=self.name)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """Shared limiter, breaker and retry/hedge settings for one model tier."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = 4, base_delay_s: float = 0.5, max_delay_s: float = 20.0,
+                 hedge_after_s: Optional[float] = None, expected_output_tokens: int = 500):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.hedge_after_s = hedge_after_s
+        self.expected_output_tokens = expected_output_tokens
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+
+class ResilientModel(Runnable):
+    """Runnable wrapper that applies a ResiliencePolicy around a chat model."""
+
+    def __init__(self, inner: Runnable, policy: ResiliencePolicy, name: str = "llm"):
+        self.inner = inner
+        self.policy = policy
+        self.name = name
+
+    def _attempt(self, input, config, **kwargs) -> Tuple[Any, List[Callable[[], None]]]:
+        records: List[Callable[[], None]] = []
+        token = _attempt_records.set(records)
+        try:
+            return self.inner.invoke(input, config, **kwargs), records
+        finally:
+            _attempt_records.reset(token)
+
+    def _hedged_invoke(self, input, config, tokens: int, **kwargs):
+        """Start a backup attempt if the first one is slower than hedge_after_s; only the winner is recorded."""
+        primary = _hedge_executor.submit(follow_request(self._attempt), input, config, **kwargs)
+        done, _ = wait([primary], timeout=self.policy.hedge_after_s)
+        if not done and self.policy.limiter:
+            # The backup is a second request and counts against the limits
+            self.policy.limiter.acquire(tokens)
+            done, _ = wait([primary], timeout=0)
+        if done:
+            result, records = primary.result()
+        else:
+            metrics.incr("llm.hedges", tier=self.name)
+            backup = _hedge_executor.submit(follow_request(self._attempt), input, config, **kwargs)
+            pending = {primary, backup}
+            error = None
+            winner = None
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        winner = future
+                        break
+                    error = future.exception()
+            if winner is None:
+                raise error
+            result, records = winner.result()
+        for record in records:
+            record()
+        return result
+
+    def invoke(self, input, config=None, **kwargs):
+        policy = self.policy
+        if policy.breaker and not policy.breaker.allow():
+            metrics.incr("llm.circuit_rejected", tier=self.name)
+            raise CircuitOpenError(f"LLM circuit for tier {self.name} is open; try again shortly")
+
+        attempt = 0
+        tokens = estimate_tokens(input) + policy.expected_output_tokens
+        while True:
+            if policy.limiter:
+                policy.limiter.acquire(tokens)
+            try:
+                if policy.hedge_after_s:
+                    result = self._hedged_invoke(input, config, tokens, **kwargs)
+                else:
+                    result = self.inner.invoke(input, config, **kwargs)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # The service answered (e.g. a 400), so it is reachable
+                    if policy.breaker:
+                        policy.breaker.record_success()
+                    raise
+                if attempt >= policy.max_retries:
+                    if policy.breaker:
+                        policy.breaker.record_failure()
+                    raise
+                delay = policy.backoff(attempt)
+                attempt += 1
+                metrics.incr("llm.retries", tier=self.name)
+                logger.warning(f"LLM call on tier {self.name} failed ({e}); retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            if policy.breaker:
+                policy.breaker.record_success()
+            return result
+
+
+class ResponseCache:
+    """
+    Small LRU of recent answers keyed by normalized question, used as a degraded-mode fallback.
+
+    Answers that depend on who is asking are stored under a scope (e.g. the
+    logged-in customer ID) and only returned for the same scope.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.lower().split()).rstrip("?.! ")
+
+    def get(self, question: str, scope: Optional[str] = None) -> Optional[str]:
+        key = (scope, self._normalize(question))
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is not None:
+                self._entries.move_to_end(key)
+            return answer
+
+    def put(self, question: str, answer: str, scope: Optional[str] = None) -> None:
+        key = (scope, self._normalize(question))
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
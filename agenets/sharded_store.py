@@ -0,0 +1,476 @@
+"""
+Sharded Store - Consistent-hash partitioning of the insurance namespaces.
+Records are placed by customer ID: a user record by its key, policies and
+claims by their user_id, so one customer's data (and every transaction the
+tools run) stays on a single shard. Point reads of policies/claims find their
+shard through small locator records hashed by the record key; queries over a
+whole namespace scatter to all shards in parallel and merge the results.
+
+ShardCluster starts N local shard processes for testing; add_shard() grows the
+ring and moves only the records whose owner changed.
+
+Usage:
+    python agenets/sharded_store.py --shards 4 --add-shard
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, ListNamespacesOp, PutOp, SearchOp
+from langgraph.store.memory import InMemoryStore
+
+import metrics
+from inmemory_store import claims_namespace, commit_transaction, policies_namespace, search_all
+from worker_pool import SharedStoreClient, _StoreManager, _StoreServer
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Namespaces placed by the customer that owns the record, and the field holding the customer ID
+CUSTOMER_FIELDS = {policies_namespace: "user_id", claims_namespace: "user_id"}
+# Locator records (placed by record key) point to the customer of a policy/claim
+LOCATOR_PREFIX = "_route"
+# Routing keys of policies/claims cached per client, and resumable scan positions
+MAX_ROUTES = 50000
+MAX_CURSORS = 256
+
+
+class CrossShardTransactionError(RuntimeError):
+    """Raised when a transaction touches records of customers on different shards."""
+
+
+def _hash(value: str) -> int:
+    # Stable across processes (unlike hash())
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Hash ring with virtual nodes; adding a shard moves ~1/N of the keys.
+
+    Args:
+        shards: Shard names
+        vnodes: Ring points per shard (more points, more even load)
+    """
+
+    def __init__(self, shards: Iterable[str], vnodes: int = 128):
+        self.shards = list(shards)
+        self.vnodes = vnodes
+        points = sorted((_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, routing_key: str) -> str:
+        """The shard owning a routing key (first ring point clockwise of its hash)."""
+        if not self._points:
+            raise ValueError("Hash ring has no shards")
+        position = bisect_right(self._points, _hash(routing_key)) % len(self._points)
+        return self._owners[position]
+
+    def with_shard(self, shard: str) -> "ConsistentHashRing":
+        return ConsistentHashRing(self.shards + [shard], self.vnodes)
+
+
+def _locator_namespace(namespace: tuple) -> tuple:
+    return (LOCATOR_PREFIX,) + tuple(namespace)
+
+
+def routing_key(namespace: tuple, key: str, value: Optional[Dict[str, Any]]) -> str:
+    """Customer ID a record is placed by (the key itself for users, locators and other namespaces)."""
+    field = CUSTOMER_FIELDS.get(tuple(namespace))
+    if field is not None and value and value.get(field):
+        return str(value[field])
+    return key
+
+
+class ShardedStore(BaseStore):
+    """
+    BaseStore that partitions records across shard stores with consistent hashing.
+
+    Args:
+        shards: Shard name -> store (InMemoryStore, SharedStoreClient, ...)
+        vnodes: Ring points per shard
+    """
+
+    def __init__(self, shards: Dict[str, BaseStore], vnodes: int = 128):
+        self.shards = dict(shards)
+        self.ring = ConsistentHashRing(self.shards, vnodes)
+        # (namespace, key) -> routing key of policies/claims recently used by this client (LRU)
+        self._routes: "OrderedDict[Tuple[tuple, str], str]" = OrderedDict()
+        # (namespace prefix, filter, offset) -> (shard index, offset in that shard) where a scan's next page starts
+        self._cursors: "OrderedDict[Tuple[tuple, str, int], Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ThreadPoolExecutor:
+        # Scatter-gather runs one request per shard; point batches add a few more
+        return ThreadPoolExecutor(max_workers=max(4, 2 * len(self.shards)), thread_name_prefix="shard")
+
+    # ----- routing -----
+
+    def _route(self, namespace: tuple, key: str) -> Optional[str]:
+        """Routing key of an existing record, or None if the record does not exist."""
+        namespace = tuple(namespace)
+        if namespace not in CUSTOMER_FIELDS:
+            return key
+        with self._lock:
+            cached = self._routes.get((namespace, key))
+            if cached is not None:
+                self._routes.move_to_end((namespace, key))
+                return cached
+        locator_namespace = _locator_namespace(namespace)
+        locator = self.shards[self.ring.shard_for(key)].get(locator_namespace, key)
+        if locator is None:
+            metrics.incr("sharded_store.locator_misses")
+            return None
+        self._remember_route(namespace, key, locator.value["routing_key"])
+        return locator.value["routing_key"]
+
+    def _remember_route(self, namespace: tuple, key: str, route: Optional[str]) -> None:
+        with self._lock:
+            if route is None:
+                self._routes.pop((namespace, key), None)
+                return
+            self._routes[(namespace, key)] = route
+            self._routes.move_to_end((namespace, key))
+            while len(self._routes) > MAX_ROUTES:
+                self._routes.popitem(last=False)
+
+    def _locator_put(self, namespace: tuple, key: str, route: Optional[str]) -> Optional[PutOp]:
+        """Locator write that records (or, with route None, removes) where a policy/claim lives."""
+        namespace = tuple(namespace)
+        if namespace not in CUSTOMER_FIELDS:
+            return None
+        self._remember_route(namespace, key, route)
+        return PutOp(_locator_namespace(namespace), key, {"routing_key": route} if route is not None else None)
+
+    def shard_of(self, namespace: tuple, key: str) -> Optional[str]:
+        """Name of the shard holding a record (None if it does not exist)."""
+        route = self._route(namespace, key)
+        return self.ring.shard_for(route) if route is not None else None
+
+    # ----- operations -----
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        results: List[Any] = [None] * len(ops)
+        # Point operations are grouped per shard and sent as one batch each, in parallel
+        per_shard: Dict[str, List[Tuple[int, Any]]] = defaultdict(list)
+        for index, op in enumerate(ops):
+            if isinstance(op, GetOp):
+                route = self._route(op.namespace, op.key)
+                if route is not None:
+                    per_shard[self.ring.shard_for(route)].append((index, op))
+            elif isinstance(op, PutOp):
+                for shard, shard_op in self._place_put(op):
+                    per_shard[shard].append((index if shard_op is op else -1, shard_op))
+            elif isinstance(op, SearchOp):
+                results[index] = self._search(op)
+            elif isinstance(op, ListNamespacesOp):
+                results[index] = self._list_namespaces(op)
+            else:
+                raise ValueError(f"Unsupported store operation: {type(op).__name__}")
+
+        def run(shard: str, entries: List[Tuple[int, Any]]):
+            return entries, self.shards[shard].batch([op for _, op in entries])
+
+        for entries, shard_results in self._pool.map(lambda item: run(*item), list(per_shard.items())):
+            for (index, _), result in zip(entries, shard_results):
+                if index >= 0:
+                    results[index] = result
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, list(ops))
+
+    def _place_put(self, op: PutOp) -> List[Tuple[str, PutOp]]:
+        """Shard writes for one put: the record on its owner's shard plus its locator."""
+        namespace = tuple(op.namespace)
+        previous = self._route(namespace, op.key) if namespace in CUSTOMER_FIELDS else None
+        writes: List[Tuple[str, PutOp]] = []
+        if op.value is None:
+            if previous is not None or namespace not in CUSTOMER_FIELDS:
+                writes.append((self.ring.shard_for(previous or op.key), op))
+            locator = self._locator_put(namespace, op.key, None)
+        else:
+            route = routing_key(namespace, op.key, op.value)
+            writes.append((self.ring.shard_for(route), op))
+            if previous is not None and self.ring.shard_for(previous) != self.ring.shard_for(route):
+                # The record changed customer: remove the copy on the old owner's shard
+                writes.append((self.ring.shard_for(previous), PutOp(namespace, op.key, None)))
+            locator = self._locator_put(namespace, op.key, route) if route != previous else None
+        if locator is not None:
+            writes.append((self.ring.shard_for(op.key), locator))
+        return writes
+
+    def _scatter(self, op: Any) -> List[Any]:
+        start = time.perf_counter()
+        results = list(self._pool.map(lambda shard: shard.batch([op])[0], self.shards.values()))
+        metrics.observe("sharded_store.scatter_ms", (time.perf_counter() - start) * 1000)
+        return results
+
+    def _search(self, op: SearchOp) -> List[Any]:
+        if op.query or tuple(op.namespace_prefix[:1]) in ((), (LOCATOR_PREFIX,)):
+            return self._ranked_search(op)
+        # Unranked results are the shards' matches concatenated in shard order. The next page of a scan
+        # resumes where this one ended, so paging through a namespace reads every record once.
+        scan = (tuple(op.namespace_prefix), json.dumps(op.filter, sort_keys=True, default=str))
+        with self._lock:
+            cursor = self._cursors.get(scan + (op.offset,))
+        if cursor is not None:
+            page, cursor = self._walk(op, *cursor)
+        else:
+            if op.offset:
+                metrics.incr("sharded_store.cursor_misses")
+            page, cursor = self._scatter_page(op)
+        if len(page) == op.limit:
+            with self._lock:
+                self._cursors[scan + (op.offset + op.limit,)] = cursor
+                self._cursors.move_to_end(scan + (op.offset + op.limit,))
+                while len(self._cursors) > MAX_CURSORS:
+                    self._cursors.popitem(last=False)
+        return page
+
+    def _walk(self, op: SearchOp, shard_index: int, shard_offset: int) -> Tuple[List[Any], Tuple[int, int]]:
+        """One page read from the given shard position onwards; returns it and the position after it."""
+        names = list(self.shards)
+        page: List[Any] = []
+        while shard_index < len(names) and len(page) < op.limit:
+            wanted = op.limit - len(page)
+            items = self.shards[names[shard_index]].batch(
+                [SearchOp(op.namespace_prefix, op.filter, wanted, shard_offset, None, op.refresh_ttl)])[0]
+            page.extend(items)
+            if len(items) < wanted:
+                shard_index, shard_offset = shard_index + 1, 0
+            else:
+                shard_offset += len(items)
+        return page, (shard_index, shard_offset)
+
+    def _scatter_page(self, op: SearchOp) -> Tuple[List[Any], Tuple[int, int]]:
+        """A page cut from every shard's first offset+limit matches, and the shard position after it."""
+        shard_op = SearchOp(op.namespace_prefix, op.filter, op.limit + op.offset, 0, None, op.refresh_ttl)
+        page: List[Any] = []
+        skip = op.offset
+        cursor = (len(self.shards), 0)
+        # A shard's truncated list is only reached once it covers the whole page, so pages line up across calls
+        for shard_index, items in enumerate(self._scatter(shard_op)):
+            if skip >= len(items):
+                skip -= len(items)
+                continue
+            taken = items[skip:skip + op.limit - len(page)]
+            page.extend(taken)
+            cursor = (shard_index, skip + len(taken))
+            skip = 0
+            if len(page) == op.limit:
+                break
+        return page, cursor
+
+    def _ranked_search(self, op: SearchOp) -> List[Any]:
+        # Every shard returns its first offset+limit matches; the merged page is cut afterwards
+        shard_op = SearchOp(op.namespace_prefix, op.filter, op.limit + op.offset, 0, op.query, op.refresh_ttl)
+        merged = [item for items in self._scatter(shard_op) for item in items
+                  if item.namespace[:1] != (LOCATOR_PREFIX,)]
+        if op.query:
+            # Top offset+limit of every shard contains the global top offset+limit
+            merged.sort(key=lambda item: -(item.score or 0))
+        return merged[op.offset:op.offset + op.limit]
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> List[tuple]:
+        shard_op = ListNamespacesOp(op.match_conditions, op.max_depth, limit=op.limit + op.offset, offset=0)
+        namespaces = {ns for result in self._scatter(shard_op) for ns in result if ns[:1] != (LOCATOR_PREFIX,)}
+        return sorted(namespaces)[op.offset:op.offset + op.limit]
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        """
+        Commit a transaction on the shard that owns all of its records.
+
+        Returns:
+            The committed version of every written record
+
+        Raises:
+            CrossShardTransactionError: If the records live on different shards
+            ConflictError: If a record read by the transaction has changed
+        """
+        shards = set()
+        for namespace, key in read_versions:
+            shard = self.shard_of(namespace, key)
+            if shard is not None:
+                shards.add(shard)
+        locators = []
+        for (namespace, key), value in writes.items():
+            route = routing_key(namespace, key, value)
+            shards.add(self.ring.shard_for(route))
+            if tuple(namespace) in CUSTOMER_FIELDS and self._route(namespace, key) != route:
+                locators.append((self.ring.shard_for(key), self._locator_put(namespace, key, route)))
+        if len(shards) > 1:
+            raise CrossShardTransactionError(f"Transaction spans shards {sorted(shards)}")
+        if not shards:
+            return {}
+        # Locators go first: a commit that then fails leaves a pointer to a missing record, never a lost record
+        for shard, locator in locators:
+            self.shards[shard].batch([locator])
+        return commit_transaction(self.shards[shards.pop()], read_versions, writes)
+
+    # ----- rebalancing -----
+
+    def add_shard(self, name: str, store: BaseStore) -> Dict[str, int]:
+        """
+        Add a shard and move the records it now owns. Pause writes while rebalancing.
+
+        Returns:
+            Number of moved records per source shard
+        """
+        if name in self.shards:
+            raise ValueError(f"Shard {name} already exists")
+        new_ring = self.ring.with_shard(name)
+        moves: Dict[str, List[Any]] = {}
+        for source, shard_store in self.shards.items():
+            moving = []
+            for namespace in shard_store.list_namespaces(limit=10_000):
+                for item in search_all(shard_store, namespace):
+                    if namespace[:1] == (LOCATOR_PREFIX,):
+                        route = item.key
+                    else:
+                        route = routing_key(namespace, item.key, item.value)
+                    if new_ring.shard_for(route) == name:
+                        moving.append(item)
+            moves[source] = moving
+
+        # Copy, switch the ring, then delete: readers always find every record on some shard they route to
+        store.batch([PutOp(item.namespace, item.key, item.value) for items in moves.values() for item in items])
+        self.shards[name] = store
+        self.ring = new_ring
+        with self._lock:
+            # Scan positions refer to the old shard contents
+            self._cursors.clear()
+        previous_pool, self._pool = self._pool, self._new_pool()
+        previous_pool.shutdown(wait=False)
+        for source, items in moves.items():
+            if items:
+                self.shards[source].batch([PutOp(item.namespace, item.key, None) for item in items])
+        moved = {source: len(items) for source, items in moves.items()}
+        logger.info(f"Added shard {name}: moved {sum(moved.values())} records {moved}")
+        return moved
+
+    def shard_sizes(self, namespaces: Iterable[tuple]) -> Dict[str, int]:
+        """Record count per shard over the given namespaces (excluding locators)."""
+        return {name: sum(len(search_all(shard, ns)) for ns in namespaces)
+                for name, shard in self.shards.items()}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+# ===========================
+# LOCAL SHARD PROCESSES
+# ===========================
+
+def _shard_main(name: str, authkey: bytes, ready) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server_object = _StoreServer(InMemoryStore())
+    _StoreManager.register("store_server", callable=lambda: server_object)
+    server = _StoreManager(authkey=authkey).get_server()
+    ready.put((name, server.address))
+    server.serve_forever()
+
+
+class ShardCluster:
+    """
+    N local processes, each serving one InMemoryStore shard over a manager socket.
+
+    Args:
+        shards: Number of shard processes to start
+    """
+
+    def __init__(self, shards: int):
+        self._context = multiprocessing.get_context("fork")
+        self._authkey = os.urandom(16)
+        self._processes: Dict[str, Any] = {}
+        self.addresses: Dict[str, Any] = {}
+        for index in range(shards):
+            self.start_shard(f"shard-{index}")
+
+    def start_shard(self, name: str) -> SharedStoreClient:
+        """Start one more shard process and return a client for it."""
+        ready = self._context.Queue()
+        process = self._context.Process(target=_shard_main, name=name, daemon=True,
+                                        args=(name, self._authkey, ready))
+        process.start()
+        _, address = ready.get(timeout=30)
+        self._processes[name] = process
+        self.addresses[name] = address
+        return SharedStoreClient(address, self._authkey)
+
+    def clients(self) -> Dict[str, SharedStoreClient]:
+        """A fresh client per shard (each client holds its own connection)."""
+        return {name: SharedStoreClient(address, self._authkey) for name, address in self.addresses.items()}
+
+    def close(self) -> None:
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+        logger.info(f"Stopped {len(self._processes)} shard processes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the sample data into local shard processes")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--add-shard", action="store_true", help="Then add one shard and rebalance")
+    parser.add_argument("--claims", type=int, default=0,
+                        help="Also load this many synthetic claims and check that paged scans return each once")
+    args = parser.parse_args()
+
+    from inmemory_store import bootstrap_memory_store, user_namespace
+    namespaces = (user_namespace, policies_namespace, claims_namespace)
+    with ShardCluster(args.shards) as cluster:
+        store = ShardedStore(cluster.clients())
+        bootstrap_memory_store(store)
+        store.batch([PutOp(claims_namespace, f"sc{i}", {"user_id": f"u{i % 50}", "status": "Processing"})
+                     for i in range(args.claims)])
+        report = {"shards": store.shard_sizes(namespaces)}
+        if args.add_shard:
+            name = f"shard-{args.shards}"
+            report["moved"] = store.add_shard(name, cluster.start_shard(name))
+            report["after_rebalance"] = store.shard_sizes(namespaces)
+        # Small pages so a scan spans many pages across every shard
+        claims, offset = [], 0
+        start = time.perf_counter()
+        while True:
+            page = store.search(claims_namespace, limit=500, offset=offset)
+            claims.extend(page)
+            if len(page) < 500:
+                break
+            offset += 500
+        unique = {item.key for item in claims}
+        report["claims_total"] = len(claims)
+        report["claims_unique"] = len(unique)
+        report["paged_scan_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(json.dumps(report, indent=2))
+        store.close()
+    expected = len(unique | {f"sc{i}" for i in range(args.claims)})
+    if len(claims) != len(unique) or len(unique) != expected:
+        print(f"Paged scan returned {len(claims)} claims, {len(unique)} unique, expected {expected}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
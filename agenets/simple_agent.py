@@ -1,14 +1,19 @@
 import os
 from dotenv import load_dotenv
-from langgraph.prebuilt import create_react_agent 
-from langchain_core.messages import AnyMessage
-from langchain_openai import  ChatOpenAI 
 from langgraph.store.memory import InMemoryStore
 from langgraph.config import get_store 
-from langgraph.prebuilt.chat_agent_executor import AgentState
 # Import tools from separate module
 from inmemory_store import bootstrap_memory_store 
-from insurance_tools import TOOLS
+from insurance_tools import TOOLS, set_default_store
+from model_router import build_default_router
+from write_behind_store import WriteBehindError, WriteBehindStore
+from change_log import ChangeCapturingStore, ChangeLog
+from snapshot import SnapshotFormatError, SnapshotStore, write_snapshot
+from sharded_store import ShardCluster, ShardedStore
+from http_client import close_http_clients
+from cassette import close_cassettes
+import insurance_agent
+from index_registry import build_indexes
 from utils import get_logger
 
 # Load environment variables from .env file
@@ -22,29 +27,7 @@ api_key = os.environ.get("OPENAI_API_KEY")
 logger = get_logger(__name__)
 logger.info("Starting Simple Agent setup...")
 
-llm = ChatOpenAI(model="gpt-4o")
-
-INSURANCE_SSTEM_PROMPT = """
-You are an insurance assistant that helps customers manage their policies and claims.
-You have access to the following tools to help customers with their insurance needs:
-- Get customer information and contact details
-- Retrieve all policies for a customer
-- Get detailed policy information including coverage amounts, deductibles, and premiums
-- Check if claims exist in the system
-- View all claims for a specific customer
-- Get current status of any claim (Processing, Approved, Closed, Under Investigation, Denied)
-- Add new claims (with validation that customer has active policy)
-- Update claim status
-- Calculate coverage remaining after potential claims
-- Get premium breakdown (annual, monthly, quarterly payments)
-- Filter claims by status across all customers
-- Get current system date
-Always be helpful and professional when assisting customers with their insurance matters.
-Before creating new claims, verify the customer has an active policy that covers the claim type.
-Provide clear explanations of policy coverage, deductibles, and claim processes.
-When discussing claim amounts, always explain the customer's responsibility (deductible) and what insurance will cover.
-The customer you are helping is:
-"""
+llm = build_default_router(TOOLS)
 
 langgraph_server = False
 active_store = None
@@ -56,17 +39,86 @@ except Exception as e:
     logger.warning(f"Could not connect to LangGraph server store: {e}")
     active_store = InMemoryStore()
 
-bootstrap_memory_store(active_store)
+# Warm start from a memory-mapped snapshot instead of re-running the bootstrap (STORE_SNAPSHOT=path)
+snapshot_path = os.environ.get("STORE_SNAPSHOT")
+snapshot_loaded = False
+if not langgraph_server and snapshot_path and os.path.exists(snapshot_path):
+    try:
+        active_store = SnapshotStore(snapshot_path)
+        snapshot_loaded = True
+    except SnapshotFormatError as e:
+        logger.warning(f"Ignoring store snapshot, bootstrapping instead: {e}")
+
+# Partition the data across N local shard processes by customer ID (STORE_SHARDS=N)
+shard_cluster = None
+shard_count = int(os.environ.get("STORE_SHARDS", "0") or 0)
+if not langgraph_server and not snapshot_loaded and shard_count > 0:
+    shard_cluster = ShardCluster(shard_count)
+    active_store = ShardedStore(shard_cluster.clients())
+    logger.info(f"Store sharded across {shard_count} local shard processes.")
+
+# Change-data-capture stream of claims/policies writes (CHANGE_LOG_DIR keeps replayable segments on disk)
+change_log = ChangeLog(os.environ.get("CHANGE_LOG_DIR"))
+
+if not langgraph_server:
+    # Capture wraps the durable store, so an event is only published once its write is committed
+    captured_store = ChangeCapturingStore(active_store, change_log)
+    # A new log starts with the seed data (or a marker for the snapshot it was loaded from), so replay
+    # from offset 0 rebuilds the claims and policies; a log resumed from disk already holds them
+    if change_log.next_offset == 0:
+        if snapshot_loaded:
+            change_log.mark_snapshot(snapshot_path)
+        else:
+            bootstrap_memory_store(captured_store)
+    elif not snapshot_loaded:
+        bootstrap_memory_store(active_store)
+    active_store = captured_store
+    # Batch claim writes into grouped commits (WRITE_BEHIND=1)
+    if os.environ.get("WRITE_BEHIND", "0") == "1":
+        active_store = WriteBehindStore(active_store)
+        logger.info("Write-behind batching enabled for store writes.")
+elif not snapshot_loaded:
+    bootstrap_memory_store(active_store)
+
+if not snapshot_loaded and snapshot_path and not langgraph_server:
+    write_snapshot(active_store, snapshot_path)
+set_default_store(active_store)
+# Claim search, embeddings and date indexes are built at load time, not on the first query
+build_indexes(active_store)
+
+
+def shutdown():
+    """Flush pending store writes, close the change log, stop shard processes, close HTTP clients and recorded cassettes; call before the process exits."""
+    store = active_store
+    while store is not None:
+        if isinstance(store, WriteBehindStore):
+            try:
+                store.close()
+            except WriteBehindError as e:
+                logger.error(f"Store writes were lost on shutdown: {str(e)}")
+        store = getattr(store, "backend", None)
+    change_log.close()
+    if shard_cluster is not None:
+        shard_cluster.close()
+    close_http_clients()
+    close_cassettes()
 
 logger.info("building prompted agent...")
 
-def prompt(state: AgentState,) -> list[AnyMessage]:
-    system_msg = f"{INSURANCE_SSTEM_PROMPT}. If you are asked about your name ,respond with 'InsureBot'."
-    return [{"role": "system", "content": system_msg}] + state["messages"]
+def build_agent(model=None, store=None, checkpointer=None):
+    """
+    Build the insurance ReAct agent.
+
+    Args:
+        model: Chat model or dynamic model router (defaults to the tiered router)
+        store: Store to attach (defaults to the bootstrapped active store)
+        checkpointer: Optional checkpointer that keeps conversation state per thread_id
+    """
+    return insurance_agent.build_agent(
+        model=model if model is not None else llm,
+        store=store if store is not None else (active_store if not langgraph_server else None),
+        checkpointer=checkpointer,
+    )
+
 logger.info("creating react agent...")
-agent = create_react_agent(
-    model=llm,
-    tools=[ *TOOLS],
-    store=active_store if not langgraph_server else None,
-    prompt=prompt,
-)
\ No newline at end of file
+agent = build_agent()
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""
+Store Snapshot - Binary, memory-mappable snapshot of the insurance namespaces.
+dump writes users/policies/claims and their claim search, vector and date
+indexes to one file; SnapshotStore maps it read-only and decodes records only
+when they are read, and the indexes load from the mapped arrays instead of
+being rebuilt, so worker processes start quickly and share the same page cache.
+
+File layout (little-endian):
+    header      magic "AGSNAP\\0\\0", format version, flags, directory offset/length
+    data        key and JSON value bytes of every record
+    entries     per namespace, fixed-width entries sorted by key (binary searchable,
+                and a scan can seek straight to the n-th record)
+    arrays      per index, 8-byte aligned NumPy arrays (posting lists, vectors, cells, dates)
+    directory   JSON description of the namespaces and of every index's arrays
+
+Usage:
+    python agenets/snapshot.py dump --out store.snap
+    python agenets/snapshot.py info --path store.snap
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, Item, ListNamespacesOp, PutOp, SearchItem, SearchOp
+from langgraph.store.base import MatchCondition
+from langgraph.store.memory import InMemoryStore
+import numpy as np
+
+import metrics
+from index_registry import registries
+from inmemory_store import claims_namespace, policies_namespace, search_all, user_namespace
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"AGSNAP\x00\x00"
+FORMAT_VERSION = 2
+SNAPSHOT_NAMESPACES = (user_namespace, policies_namespace, claims_namespace)
+
+_HEADER = struct.Struct("<8sIIQQ")
+# key offset, key length, value offset, value length, created_at, updated_at
+_ENTRY = struct.Struct("<QIQIdd")
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a file is not a snapshot or was written by an incompatible version."""
+
+
+def write_snapshot(store: BaseStore, path: str, namespaces: Iterable[tuple] = SNAPSHOT_NAMESPACES,
+                   indexes: bool = True) -> Dict[str, Any]:
+    """
+    Write the given namespaces of a store (and its derived indexes) to a snapshot file.
+
+    Args:
+        store: Any BaseStore (InMemoryStore, SnapshotStore, wrapped stores, ...)
+        path: Destination file; written to a temporary file and renamed into place
+        namespaces: Namespaces to include
+        indexes: Also save every registered index that can be saved as arrays (built for the store if needed)
+
+    Returns:
+        The snapshot directory (record counts, entry table and index array offsets)
+    """
+    started = time.perf_counter()
+    data = bytearray(_HEADER.size)
+    directory: Dict[str, Any] = {"created_at": time.time(), "namespaces": [], "indexes": {}}
+
+    entry_tables = []
+    for namespace in namespaces:
+        items = sorted(search_all(store, namespace), key=lambda item: item.key.encode())
+        entries = []
+        for item in items:
+            key_bytes = item.key.encode()
+            value_bytes = json.dumps(item.value, separators=(",", ":"), default=str).encode()
+            key_offset = len(data)
+            data += key_bytes
+            value_offset = len(data)
+            data += value_bytes
+            entries.append(_ENTRY.pack(key_offset, len(key_bytes), value_offset, len(value_bytes),
+                                       item.created_at.timestamp(), item.updated_at.timestamp()))
+        entry_tables.append((namespace, entries))
+
+    for namespace, entries in entry_tables:
+        # Align entry tables so fixed-width reads never straddle odd offsets
+        data += b"\x00" * (-len(data) % 8)
+        directory["namespaces"].append({"namespace": list(namespace), "count": len(entries),
+                                        "index_offset": len(data)})
+        data += b"".join(entries)
+
+    if indexes:
+        import claim_search, date_index, vector_index  # noqa: F401  (registers the indexes)
+        for registry in registries():
+            if registry.dump is None:
+                continue
+            try:
+                arrays, meta = registry.dump(registry.get(store))
+            except ValueError as e:
+                logger.warning(f"Not saving the {registry.name} index in the snapshot: {str(e)}")
+                continue
+            section: Dict[str, Any] = {"meta": meta, "arrays": {}}
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                data += b"\x00" * (-len(data) % 8)
+                section["arrays"][name] = {"offset": len(data), "dtype": array.dtype.str, "shape": list(array.shape)}
+                data += array.tobytes()
+            directory["indexes"][registry.name] = section
+
+    directory_bytes = json.dumps(directory).encode()
+    directory_offset = len(data)
+    data += directory_bytes
+    data[:_HEADER.size] = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, directory_offset, len(directory_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    metrics.observe("store.snapshot.write_ms", (time.perf_counter() - started) * 1000)
+    logger.info(f"Wrote store snapshot {path}: {len(data)} bytes, "
+                f"{sum(ns['count'] for ns in directory['namespaces'])} records")
+    return directory
+
+
+# Search filter and namespace predicates, with the semantics of LangGraph's InMemoryStore
+
+def _apply_operator(value: Any, operator: str, expected: Any) -> bool:
+    if operator == "$eq":
+        return value == expected
+    if operator == "$ne":
+        return value != expected
+    if operator == "$gt":
+        return float(value) > float(expected)
+    if operator == "$gte":
+        return float(value) >= float(expected)
+    if operator == "$lt":
+        return float(value) < float(expected)
+    if operator == "$lte":
+        return float(value) <= float(expected)
+    raise ValueError(f"Unsupported operator: {operator}")
+
+
+def _value_matches(value: Any, expected: Any) -> bool:
+    """Whether a record field matches a filter value (nested dicts, lists and $-operators)."""
+    if isinstance(expected, dict):
+        if any(key.startswith("$") for key in expected):
+            return all(_apply_operator(value, operator, operand) for operator, operand in expected.items())
+        return isinstance(value, dict) and all(_value_matches(value.get(k), v) for k, v in expected.items())
+    if isinstance(expected, (list, tuple)):
+        return (isinstance(value, (list, tuple)) and len(value) == len(expected)
+                and all(_value_matches(v, e) for v, e in zip(value, expected)))
+    return value == expected
+
+
+def _namespace_matches(condition: MatchCondition, namespace: tuple) -> bool:
+    """Whether a namespace matches a prefix/suffix condition ("*" matches any element)."""
+    path = tuple(condition.path)
+    if len(namespace) < len(path):
+        return False
+    if condition.match_type == "prefix":
+        pairs = zip(namespace, path)
+    elif condition.match_type == "suffix":
+        pairs = zip(reversed(namespace), reversed(path))
+    else:
+        raise ValueError(f"Unsupported match type: {condition.match_type}")
+    return all(p == "*" or n == p for n, p in pairs)
+
+
+def _timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class _MappedNamespace:
+    """Sorted, fixed-width key index of one namespace inside the mapped file."""
+
+    def __init__(self, buffer: mmap.mmap, namespace: tuple, count: int, index_offset: int):
+        self.buffer = buffer
+        self.namespace = namespace
+        self.count = count
+        self.index_offset = index_offset
+
+    def _entry(self, position: int) -> Tuple[int, int, int, int, float, float]:
+        return _ENTRY.unpack_from(self.buffer, self.index_offset + position * _ENTRY.size)
+
+    def key_at(self, position: int) -> str:
+        key_offset, key_length = self._entry(position)[:2]
+        return self.buffer[key_offset:key_offset + key_length].decode()
+
+    def find(self, key: str) -> Optional[int]:
+        """Binary search the sorted entries for a key."""
+        target = key.encode()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length = self._entry(middle)[:2]
+            candidate = self.buffer[key_offset:key_offset + key_length]
+            if candidate < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            key_offset, key_length = self._entry(low)[:2]
+            if self.buffer[key_offset:key_offset + key_length] == target:
+                return low
+        return None
+
+    def item_at(self, position: int) -> Item:
+        key_offset, key_length, value_offset, value_length, created_at, updated_at = self._entry(position)
+        return Item(
+            value=json.loads(self.buffer[value_offset:value_offset + value_length]),
+            key=self.buffer[key_offset:key_offset + key_length].decode(),
+            namespace=self.namespace,
+            created_at=_timestamp(created_at),
+            updated_at=_timestamp(updated_at),
+        )
+
+
+class SnapshotStore(BaseStore):
+    """
+    Read-mostly store backed by a memory-mapped snapshot.
+
+    Snapshot records are decoded lazily on read. Writes go to an in-process
+    InMemoryStore overlay (deletes are tombstones), so the mapped pages stay
+    read-only and shared between processes.
+
+    Args:
+        path: Snapshot file written by write_snapshot()
+    """
+
+    def __init__(self, path: str):
+        started = time.perf_counter()
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < _HEADER.size:
+            raise SnapshotFormatError(f"{path} is too small to be a store snapshot")
+        magic, version, _, directory_offset, directory_length = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotFormatError(f"{path} is not a store snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+
+        self.directory = json.loads(self._buffer[directory_offset:directory_offset + directory_length])
+        self._namespaces: Dict[tuple, _MappedNamespace] = {
+            tuple(ns["namespace"]): _MappedNamespace(self._buffer, tuple(ns["namespace"]), ns["count"],
+                                                     ns["index_offset"])
+            for ns in self.directory["namespaces"]
+        }
+        self._overlay = InMemoryStore()
+        self._overlay_keys = set()
+        self._tombstones = set()
+        self._lock = threading.Lock()
+        metrics.observe("store.snapshot.open_ms", (time.perf_counter() - started) * 1000)
+        logger.info(f"Mapped store snapshot {path} "
+                    f"({sum(ns.count for ns in self._namespaces.values())} records)")
+
+    def saved_index(self, name: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+        """
+        Arrays and metadata of an index saved in the snapshot, for IndexRegistry to load
+        instead of rebuilding. The arrays are read-only views of the mapped file.
+
+        Returns:
+            None if the index was not saved, or records were written since the snapshot was mapped
+        """
+        section = self.directory.get("indexes", {}).get(name)
+        with self._lock:
+            changed = bool(self._overlay_keys or self._tombstones)
+        if section is None or changed:
+            return None
+        arrays = {
+            key: np.frombuffer(self._buffer, dtype=np.dtype(spec["dtype"]), count=math.prod(spec["shape"]),
+                               offset=spec["offset"]).reshape(spec["shape"])
+            for key, spec in section["arrays"].items()
+        }
+        return arrays, section["meta"]
+
+    # ---- operations -------------------------------------------------------
+
+    def _get(self, op: GetOp) -> Optional[Item]:
+        namespace = tuple(op.namespace)
+        with self._lock:
+            if (namespace, op.key) in self._tombstones:
+                return None
+            overwritten = (namespace, op.key) in self._overlay_keys
+        if overwritten:
+            return self._overlay.get(namespace, op.key)
+        mapped = self._namespaces.get(namespace)
+        if mapped is None:
+            return None
+        position = mapped.find(op.key)
+        return mapped.item_at(position) if position is not None else None
+
+    def _put(self, op: PutOp) -> None:
+        namespace = tuple(op.namespace)
+        with self._lock:
+            if op.value is None:
+                self._tombstones.add((namespace, op.key))
+                self._overlay_keys.discard((namespace, op.key))
+            else:
+                self._tombstones.discard((namespace, op.key))
+                self._overlay_keys.add((namespace, op.key))
+        if op.value is None:
+            self._overlay.delete(namespace, op.key)
+        else:
+            self._overlay.put(namespace, op.key, op.value, index=False)
+
+    def _search(self, op: SearchOp) -> List[SearchItem]:
+        prefix = tuple(op.namespace_prefix)
+        with self._lock:
+            hidden = self._tombstones | self._overlay_keys
+        overlay_items = search_all(self._overlay, prefix) if hidden else []
+
+        def matches(item: Item) -> bool:
+            return not op.filter or all(_value_matches(item.value.get(key), expected)
+                                        for key, expected in op.filter.items())
+
+        results: List[SearchItem] = []
+        if op.limit <= 0:
+            return results
+        skip = op.offset
+        for namespace, mapped in self._namespaces.items():
+            if namespace[:len(prefix)] != prefix:
+                continue
+            positions = range(mapped.count)
+            if not op.filter:
+                # Every visible record matches, so a page seeks straight to its first record
+                # through the entry table instead of decoding the records before it
+                hidden_positions = sorted(position for position in (mapped.find(key) for ns, key in hidden
+                                                                    if ns == namespace)
+                                          if position is not None)
+                if skip >= mapped.count - len(hidden_positions):
+                    skip -= mapped.count - len(hidden_positions)
+                    continue
+                start = skip
+                for position in hidden_positions:
+                    if position > start:
+                        break
+                    start += 1
+                skip = 0
+                positions = range(start, mapped.count)
+            for position in positions:
+                if (namespace, mapped.key_at(position)) in hidden:
+                    continue
+                item = mapped.item_at(position)
+                if not matches(item):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                results.append(SearchItem(namespace=item.namespace, key=item.key, value=item.value,
+                                          created_at=item.created_at, updated_at=item.updated_at))
+                if len(results) >= op.limit:
+                    return results
+        for item in overlay_items:
+            if not matches(item):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            results.append(item)
+            if len(results) >= op.limit:
+                break
+        return results
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> List[tuple]:
+        namespaces = set(self._namespaces) | set(self._overlay.list_namespaces(limit=100000))
+        if op.match_conditions:
+            namespaces = {ns for ns in namespaces
+                          if all(_namespace_matches(condition, ns) for condition in op.match_conditions)}
+        if op.max_depth is not None:
+            namespaces = {ns[:op.max_depth] for ns in namespaces}
+        return sorted(namespaces)[op.offset:op.offset + op.limit]
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        results: List[Any] = []
+        for op in ops:
+            if isinstance(op, GetOp):
+                results.append(self._get(op))
+            elif isinstance(op, PutOp):
+                self._put(op)
+                results.append(None)
+            elif isinstance(op, SearchOp):
+                results.append(self._search(op))
+            elif isinstance(op, ListNamespacesOp):
+                results.append(self._list_namespaces(op))
+            else:
+                raise ValueError(f"Unsupported store operation: {type(op).__name__}")
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return self.batch(ops)
+
+    def close(self) -> None:
+        try:
+            self._buffer.close()
+        except BufferError:
+            # Indexes loaded from the snapshot still view the mapping; it is unmapped once they are freed
+            logger.debug(f"Store snapshot {self.path} is still referenced by loaded indexes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump or inspect store snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    dump_parser = subparsers.add_parser("dump", help="Bootstrap the sample data and write a snapshot")
+    dump_parser.add_argument("--out", required=True)
+    info_parser = subparsers.add_parser("info", help="Print a snapshot's directory")
+    info_parser.add_argument("--path", required=True)
+    args = parser.parse_args()
+
+    if args.command == "dump":
+        from inmemory_store import bootstrap_memory_store
+        store = InMemoryStore()
+        bootstrap_memory_store(store)
+        directory = write_snapshot(store, args.out)
+    else:
+        snapshot = SnapshotStore(args.path)
+        directory = snapshot.directory
+    print(json.dumps(directory, indent=2))
+
+
+if __name__ == "__main__":
+    main()
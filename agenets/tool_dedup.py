@@ -0,0 +1,101 @@
+"""
+Tool Call Deduplication - Answers repeated tool calls within one agent run.
+Runs as the agent's post-model hook: when the model requests a read tool with
+exactly the same arguments as an earlier call in the current turn that
+completed successfully, and no write tool ran in between, the call is answered
+with a short back-reference to the earlier result instead of executing the tool
+and repeating its payload. Repeats within one step, or of calls that failed,
+still execute.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+import metrics
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Tools that change the store; any call to one invalidates earlier results
+WRITE_TOOLS = frozenset({"add_new_claim", "update_claim_status"})
+# Tools whose result may differ between identical calls
+UNCACHEABLE_TOOLS = frozenset({"get_current_system_date"})
+
+
+def _call_key(tool_call: Dict[str, Any]) -> Tuple[str, str]:
+    return tool_call["name"], json.dumps(tool_call.get("args", {}), sort_keys=True, default=str)
+
+
+def _is_error(message: ToolMessage) -> bool:
+    if getattr(message, "status", "success") == "error":
+        return True
+    content = message.content if isinstance(message.content, str) else ""
+    return content.lstrip().startswith('{"error"')
+
+
+def _current_turn(messages: List[BaseMessage]) -> List[BaseMessage]:
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i + 1:]
+    return messages
+
+
+def find_duplicates(messages: List[BaseMessage]) -> List[ToolMessage]:
+    """
+    Back-reference ToolMessages for the repeated calls of the latest AI message.
+
+    Args:
+        messages: Conversation messages, ending with the model's newest AIMessage
+
+    Returns:
+        ToolMessages answering the duplicate calls (empty when nothing repeats)
+    """
+    if not messages or not isinstance(messages[-1], AIMessage) or not messages[-1].tool_calls:
+        return []
+    latest = messages[-1]
+    if any(call["name"] in WRITE_TOOLS for call in latest.tool_calls):
+        # Reads in the same step may run before or after the write
+        return []
+
+    # Earlier successful results of the turn, forgotten whenever a write happened
+    earlier: Dict[Tuple[str, str], str] = {}
+    calls_by_id: Dict[str, Dict[str, Any]] = {}
+    for message in _current_turn(messages[:-1]):
+        if isinstance(message, AIMessage):
+            if any(call["name"] in WRITE_TOOLS for call in message.tool_calls):
+                # The step's reads may have run before its write, so none of them count
+                earlier.clear()
+                continue
+            for call in message.tool_calls:
+                calls_by_id[call["id"]] = call
+        elif isinstance(message, ToolMessage):
+            call = calls_by_id.get(message.tool_call_id)
+            if call is not None and call["name"] not in UNCACHEABLE_TOOLS and not _is_error(message):
+                earlier.setdefault(_call_key(call), message.tool_call_id)
+
+    duplicates = []
+    for call in latest.tool_calls:
+        if call["name"] in UNCACHEABLE_TOOLS:
+            continue
+        # Only completed calls: a repeat in the same step would point at a result that may never succeed
+        original_id: Optional[str] = earlier.get(_call_key(call))
+        if original_id is None:
+            continue
+        duplicates.append(ToolMessage(
+            content=(f"Duplicate call: {call['name']} with these arguments was already answered "
+                     f"(tool_call_id {original_id}); use that result."),
+            tool_call_id=call["id"],
+            name=call["name"],
+        ))
+        metrics.incr("tool_dedup.hits", tool=call["name"])
+    if duplicates:
+        logger.info(f"Answered {len(duplicates)} repeated tool call(s) with back-references")
+    return duplicates
+
+
+def dedup_tool_calls(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Post-model hook: answer repeated tool calls so only new calls reach the tools node."""
+    duplicates = find_duplicates(state["messages"])
+    return {"messages": duplicates} if duplicates else {}
@@ -0,0 +1,175 @@
+"""
+Tool Selection - Bind only the tools a turn is likely to need.
+Every tool's JSON schema and docstring is sent with every model call. The
+selector picks a subset per turn in two ways: intent rules (mentioned IDs and
+cue words mapped to tool groups) and embedding similarity between the question
+and each tool's description. The model router then binds only that subset.
+
+Tools already called in the turn always stay bound. The full set is used when
+nothing matches confidently, and again after several tool rounds, so a
+mis-selection costs one extra round instead of a failed answer.
+
+Environment:
+    TOOL_SELECTION   Set to "off" to always bind every tool
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import metrics
+from vector_index import HashingEmbeddings
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+_ID_PATTERN = re.compile(r"\b([upc])\d+\b", re.IGNORECASE)
+
+def tool_selection_enabled() -> bool:
+    """Whether turns bind a selected tool subset (TOOL_SELECTION, case-insensitive "off" disables it)."""
+    return os.environ.get("TOOL_SELECTION", "on").lower() != "off"
+
+
+# Tools bound on every step regardless of intent (tiny schemas)
+ALWAYS_BOUND = ("get_current_system_date",)
+
+# Intent -> (cue substrings, tools)
+INTENTS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "customer": (
+        ("contact", "email", "phone", "address", "profile", "customer", "born", "birth", "my details", "who am"),
+        ("get_customer_information", "get_customer_infoname", "get_customer_policies"),
+    ),
+    "policy": (
+        ("policy", "policies", "coverage", "covered", "deductible", "premium", "plan"),
+        ("get_policy_details", "get_customer_policies", "get_premium_breakdown"),
+    ),
+    "pricing": (
+        ("premium", "monthly", "quarterly", "renew", "quote", "price", "cost", "pay "),
+        ("get_premium_breakdown", "quote_policy_renewal"),
+    ),
+    "claims": (
+        ("claim", "status", "filed"),
+        ("get_claim_status", "get_customer_claims", "check_claims_exist"),
+    ),
+    "claim_search": (
+        ("search", "similar", "like ", "damage", "water", "fire", "theft", "collision", "accident", "mention"),
+        ("search_claims", "find_similar_claims"),
+    ),
+    "dates": (
+        ("between", "since", "date", "month", "year", "week", "expir", "upcoming", "recent", "last ", "trend"),
+        ("get_claims_in_date_range", "get_expiring_policies"),
+    ),
+    "writes": (
+        ("file a", "file ", "new claim", "submit", "add a", "report a", "update", "change", "approve", "deny", "close"),
+        ("add_new_claim", "update_claim_status", "get_customer_policies"),
+    ),
+    "payout": (
+        ("remaining", "left", "how much", "payout", "pay out", "reimburs", "owe", "responsib"),
+        ("calculate_remaining_coverage", "calculate_claim_payout", "get_customer_claims"),
+    ),
+    "portfolio": (
+        ("all claims", "every", "across", "pending", "denied", "approved", "processing", "investigation"),
+        ("filter_claims_by_status",),
+    ),
+    "providers": (
+        ("repair", "shop", "clinic", "hospital", "doctor", "mechanic", "near", "provider", "garage"),
+        ("find_nearby_providers", "get_customer_information"),
+    ),
+}
+
+# Tools implied by the kind of ID a question mentions
+ID_TOOLS = {
+    "u": ("get_customer_information", "get_customer_policies", "get_customer_claims"),
+    "p": ("get_policy_details",),
+    "c": ("get_claim_status",),
+}
+
+
+def schema_tokens(tools: Sequence[Any]) -> int:
+    """Approximate prompt tokens of the tools' JSON schemas (about 4 characters per token)."""
+    return sum(len(json.dumps(convert_to_openai_tool(tool))) for tool in tools) // 4
+
+
+class ToolSelector:
+    """
+    Per-turn tool subset selection by intent rules plus description similarity.
+
+    Args:
+        tools: The agent's full tool list
+        top_k: Tools added by description similarity
+        min_similarity: Cosine similarity a tool needs to be added by similarity alone
+        max_subset_rounds: Tool rounds in a turn after which every tool is bound
+    """
+
+    def __init__(self, tools: Sequence[Any], top_k: int = 2, min_similarity: float = 0.2,
+                 max_subset_rounds: int = 2):
+        self.tools = list(tools)
+        self.top_k = top_k
+        self.min_similarity = min_similarity
+        self.max_subset_rounds = max_subset_rounds
+        self._by_name = {tool.name: tool for tool in self.tools}
+        self._embeddings = HashingEmbeddings()
+        descriptions = [f"{tool.name.replace('_', ' ')}. {tool.description}" for tool in self.tools]
+        self._tool_vectors = self._embeddings.embed_batch(descriptions)
+
+    def select_names(self, question: str) -> Optional[List[str]]:
+        """
+        Tool names for a question, or None when nothing matches confidently (use every tool).
+
+        Args:
+            question: Text of the turn's user message
+        """
+        lowered = question.lower()
+        names: List[str] = []
+        for prefix in {match.lower() for match in _ID_PATTERN.findall(question)}:
+            names.extend(ID_TOOLS[prefix])
+        for cues, tools in INTENTS.values():
+            if any(cue in lowered for cue in cues):
+                names.extend(tools)
+
+        similarities = self._tool_vectors @ self._embeddings.embed_batch([question])[0]
+        ranked = np.argsort(-similarities)[:self.top_k]
+        similar = [self.tools[i].name for i in ranked if similarities[i] >= self.min_similarity]
+        if not names and not similar:
+            return None
+        names.extend(similar)
+        names.extend(ALWAYS_BOUND)
+        return [name for name in dict.fromkeys(names) if name in self._by_name]
+
+    def select(self, messages: List[BaseMessage]) -> Tuple[List[Any], str]:
+        """
+        Tools to bind for the next model step of the current turn.
+
+        Returns:
+            (tools, reason) where reason is "subset", "no_match", "rounds" or "no_question"
+        """
+        start = len(messages) - 1
+        while start >= 0 and not isinstance(messages[start], HumanMessage):
+            start -= 1
+        if start < 0:
+            return self.tools, "no_question"
+        turn = messages[start:]
+        tool_rounds = [m for m in turn if isinstance(m, AIMessage) and m.tool_calls]
+        if len(tool_rounds) >= self.max_subset_rounds:
+            return self.tools, "rounds"
+        content = turn[0].content
+        names = self.select_names(content if isinstance(content, str) else str(content))
+        if names is None:
+            return self.tools, "no_match"
+        # Tools the model already used this turn stay available
+        for message in tool_rounds:
+            names.extend(call["name"] for call in message.tool_calls if call["name"] not in names)
+        return [self._by_name[name] for name in names if name in self._by_name], "subset"
+
+    def __call__(self, messages: List[BaseMessage]) -> List[Any]:
+        tools, reason = self.select(messages)
+        metrics.incr("tool_selection.decisions", reason=reason)
+        metrics.observe("tool_selection.bound_tools", len(tools))
+        if reason != "subset":
+            logger.info(f"Binding all {len(tools)} tools ({reason})")
+        return tools
@@ -0,0 +1,452 @@
+"""
+Vector Index - Local semantic retrieval over claims and policies.
+Texts are embedded on the CPU with a feature-hashing embedder (word, word-pair
+and character-trigram features; no model download) and searched with an IVF
+index: k-means cells over NumPy vectors, probing only the closest cells per
+query. Any LangChain Embeddings implementation can be swapped in.
+"""
+
+import math
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from index_registry import IndexArrays, IndexRegistry, pack_strings, text_signature, unpack_strings
+from inmemory_store import claims_namespace, policies_namespace, search_all
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+EMBED_BATCH_SIZE = 1024
+
+
+@lru_cache(maxsize=200000)
+def _feature_slot(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable (cross-process) hashed column and sign for a feature."""
+    digest = zlib.crc32(feature.encode())
+    return digest % dim, 1.0 if (digest >> 31) & 1 else -1.0
+
+
+@lru_cache(maxsize=100000)
+def _word_slots(word: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Hashed columns and signed weights of a word and its character trigrams."""
+    col, sign = _feature_slot(f"w:{word}", dim)
+    cols, values = [col], [sign]
+    padded = f"<{word}>"
+    # Character trigrams make "damaged" and "damage" close
+    for j in range(len(padded) - 2):
+        col, sign = _feature_slot(f"t:{padded[j:j + 3]}", dim)
+        cols.append(col)
+        values.append(0.25 * sign)
+    return tuple(cols), tuple(values)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic CPU embeddings via signed feature hashing.
+
+    Args:
+        dim: Embedding dimension
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into an L2-normalized float32 matrix (one row per text)."""
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            words = _WORD_PATTERN.findall(text.lower())
+            for i, word in enumerate(words):
+                word_cols, word_values = _word_slots(word, self.dim)
+                rows.extend([row] * len(word_cols))
+                cols.extend(word_cols)
+                values.extend(word_values)
+                if i:
+                    col, sign = _feature_slot(f"b:{words[i - 1]}_{word}", self.dim)
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(0.5 * sign)
+        flat = np.array(rows, dtype=np.int64) * self.dim + np.array(cols, dtype=np.int64)
+        matrix = np.bincount(flat, weights=values, minlength=len(texts) * self.dim)
+        matrix = matrix.astype(np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_batch(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0].tolist()
+
+
+def embed_texts(embeddings: Embeddings, texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Embed texts in batches into a normalized float32 matrix."""
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        if isinstance(embeddings, HashingEmbeddings):
+            batches.append(embeddings.embed_batch(chunk))
+        else:
+            matrix = np.asarray(embeddings.embed_documents(chunk), dtype=np.float32)
+            batches.append(matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12))
+    if not batches:
+        return np.zeros((0, getattr(embeddings, "dim", 0)), dtype=np.float32)
+    return np.vstack(batches)
+
+
+def brute_force_search(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k rows by cosine similarity (vectors and query normalized)."""
+    scores = vectors @ query
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over normalized vectors.
+
+    Vectors are assigned to the nearest of ~sqrt(N) k-means centroids; a query
+    scores only the vectors in its `n_probe` closest cells. The index searches
+    exactly until `min_train_size` vectors exist, and re-trains when it has grown 4x.
+    Rows of replaced or removed vectors are reclaimed once they exceed
+    `compact_fraction` of all rows (by re-clustering when trained).
+
+    Args:
+        dim: Vector dimension
+        n_probe: Cells searched per query (recall/latency trade-off)
+        min_train_size: Vectors needed before clustering
+        compact_fraction: Share of dead rows that triggers reclaiming them
+    """
+
+    def __init__(self, dim: int, n_probe: int = 8, min_train_size: int = 2000, compact_fraction: float = 0.3):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.compact_fraction = compact_fraction
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(1024, dtype=bool)
+        self._centroids: Optional[np.ndarray] = None
+        # Rows per cell; a loaded index keeps a cell's rows as a snapshot view (list None) until it changes
+        self._cells: List[Optional[List[int]]] = []
+        self._cell_arrays: List[Optional[np.ndarray]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> None:
+        """Add (or replace) vectors; rows of `vectors` must be L2-normalized."""
+        with self._lock:
+            needed = self._size + len(ids)
+            if needed > len(self._vectors):
+                capacity = max(needed, 2 * len(self._vectors))
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+                alive = np.zeros(capacity, dtype=bool)
+                alive[:self._size] = self._alive[:self._size]
+                self._alive = alive
+            start = self._size
+            self._vectors[start:needed] = vectors
+            self._alive[start:needed] = True
+            for offset, item_id in enumerate(ids):
+                previous = self._rows.get(item_id)
+                if previous is not None:
+                    self._alive[previous] = False
+                self._rows[item_id] = start + offset
+                self._ids.append(item_id)
+            self._size = needed
+
+            if self._centroids is not None:
+                self._assign(np.arange(start, needed))
+            if len(self._rows) >= self.min_train_size and len(self._rows) >= 4 * max(self._trained_size, 1):
+                self.train()
+            else:
+                self._maybe_reclaim()
+
+    def _maybe_reclaim(self) -> None:
+        """Reclaim dead rows once they make up compact_fraction of the rows (caller holds the lock)."""
+        if self._size - len(self._rows) <= self.compact_fraction * self._size:
+            return
+        if self._centroids is not None:
+            self.train()
+        else:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Move the live vectors to the front and drop the dead rows (caller holds the lock)."""
+        live = np.flatnonzero(self._alive[:self._size])
+        capacity = max(1024, 2 * len(live))
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:len(live)] = self._vectors[live]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(live)] = True
+        metrics.incr("vector_index.compactions")
+        logger.info(f"Compacted vector index: {self._size} -> {len(live)} rows")
+        self._vectors, self._alive = vectors, alive
+        self._ids = [self._ids[row] for row in live.tolist()]
+        self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+        self._size = len(live)
+
+    def train(self, iterations: int = 8, sample_size: int = 50000, seed: int = 0) -> None:
+        """Reclaim dead rows, cluster the live vectors with spherical k-means and rebuild the cells."""
+        with self._lock:
+            if self._size > len(self._rows):
+                self._compact()
+            live = np.arange(self._size)
+            if len(live) == 0:
+                return
+            start = time.perf_counter()
+            n_cells = max(1, int(math.sqrt(len(live))))
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[rng.choice(live, size=min(sample_size, len(live)), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=min(n_cells, len(sample)), replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                # Per-cell sums via one sort + reduceat; empty cells keep their previous centroid
+                order = np.argsort(assignment, kind="stable")
+                sorted_cells = assignment[order]
+                starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+                sums = np.add.reduceat(sample[order], starts, axis=0)
+                centroids[sorted_cells[starts]] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+            self._centroids = centroids
+            self._cells = [[] for _ in range(len(centroids))]
+            self._cell_arrays = [None] * len(centroids)
+            self._assign(live)
+            self._trained_size = len(live)
+            metrics.observe("vector_index.train_ms", (time.perf_counter() - start) * 1000)
+            logger.info(f"Trained IVF index: {len(live)} vectors in {len(centroids)} cells "
+                        f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    def _assign(self, rows: np.ndarray) -> None:
+        for begin in range(0, len(rows), 8192):
+            chunk = rows[begin:begin + 8192]
+            nearest = np.argmax(self._vectors[chunk] @ self._centroids.T, axis=1)
+            for row, cell in zip(chunk.tolist(), nearest.tolist()):
+                if self._cells[cell] is None:
+                    self._cells[cell] = self._cell_arrays[cell].tolist()
+                self._cells[cell].append(row)
+                self._cell_arrays[cell] = None
+
+    def _cell_rows(self, cell: int) -> np.ndarray:
+        rows = self._cell_arrays[cell]
+        if rows is None:
+            rows = self._cell_arrays[cell] = np.array(self._cells[cell], dtype=np.int64)
+        return rows
+
+    def search(self, query: np.ndarray, k: int = 10, n_probe: Optional[int] = None,
+               exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Return up to k (id, cosine similarity) pairs, most similar first."""
+        start = time.perf_counter()
+        excluded = set(exclude)
+        with self._lock:
+            if self._centroids is None:
+                candidates = np.arange(self._size)
+            else:
+                probes = min(n_probe or self.n_probe, len(self._centroids))
+                centroid_scores = self._centroids @ query
+                cells = np.argpartition(-centroid_scores, probes - 1)[:probes]
+                candidates = np.concatenate([self._cell_rows(cell) for cell in cells])
+            candidates = candidates[self._alive[candidates]]
+            if len(candidates) == 0:
+                return []
+            wanted = k + len(excluded)
+            top = brute_force_search(self._vectors[candidates], query, wanted)
+            vectors = self._vectors
+            hits = []
+            for position in top:
+                row = int(candidates[position])
+                item_id = self._ids[row]
+                if item_id in excluded:
+                    continue
+                hits.append((item_id, float(vectors[row] @ query)))
+                if len(hits) == k:
+                    break
+        metrics.observe("vector_index.query_ms", (time.perf_counter() - start) * 1000)
+        return hits
+
+    def remove(self, item_id: str) -> None:
+        """Drop a vector from the results."""
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._maybe_reclaim()
+
+    def get_vector(self, item_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(item_id)
+            return None if row is None else self._vectors[row].copy()
+
+    def to_arrays(self) -> IndexArrays:
+        """The live vectors, their IDs and the cells for a snapshot."""
+        with self._lock:
+            if self._size > len(self._rows):
+                if self._centroids is not None:
+                    self.train()
+                else:
+                    self._compact()
+            arrays = {"vectors": self._vectors[:self._size].copy(), "ids": pack_strings(self._ids)}
+            meta = {"dim": self.dim, "n_probe": self.n_probe, "min_train_size": self.min_train_size,
+                    "compact_fraction": self.compact_fraction, "size": self._size,
+                    "trained_size": self._trained_size, "cells": 0}
+            if self._centroids is not None:
+                cells = [self._cell_rows(cell) for cell in range(len(self._centroids))]
+                offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(rows) for rows in cells])
+                arrays.update(centroids=self._centroids.copy(), cell_offsets=offsets, cell_rows=np.concatenate(cells))
+                meta["cells"] = len(cells)
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "IVFIndex":
+        """An index over the arrays of to_arrays(); vectors and cells may stay read-only views of a mapped file."""
+        index = cls(meta["dim"], meta["n_probe"], meta["min_train_size"], meta["compact_fraction"])
+        size = meta["size"]
+        # Full to capacity, so the first add() copies the vectors into a writable array
+        index._vectors = arrays["vectors"].reshape(size, meta["dim"])
+        index._size = size
+        index._alive = np.ones(size, dtype=bool)
+        index._ids = unpack_strings(arrays["ids"], size)
+        index._rows = {item_id: row for row, item_id in enumerate(index._ids)}
+        index._trained_size = meta["trained_size"]
+        if meta["cells"]:
+            index._centroids = np.array(arrays["centroids"]).reshape(meta["cells"], meta["dim"])
+            offsets = arrays["cell_offsets"].tolist()
+            index._cells = [None] * meta["cells"]
+            index._cell_arrays = [arrays["cell_rows"][offsets[cell]:offsets[cell + 1]]
+                                  for cell in range(meta["cells"])]
+        return index
+
+
+def claim_text(claim: Dict[str, Any]) -> str:
+    return f"{claim.get('claim_type') or ''}. {claim.get('description') or ''}"
+
+
+def policy_text(policy: Dict[str, Any]) -> str:
+    return (f"{policy.get('policy_type', '')} insurance policy. Coverage {policy.get('coverage_amount', '')}, "
+            f"deductible {policy.get('deductible', '')}, premium {policy.get('premium', '')}. "
+            f"Status {policy.get('status', '')}.")
+
+
+class SemanticIndex:
+    """
+    Claim and policy vector indexes for one store (empty without a store).
+    A record is only re-embedded when its embedded text changes (not on e.g. a claim status update).
+    """
+
+    def __init__(self, store=None, embeddings: Optional[Embeddings] = None):
+        self.embeddings = embeddings or HashingEmbeddings()
+        dim = getattr(self.embeddings, "dim", None) or len(self.embeddings.embed_query("dimension probe"))
+        self.claims = IVFIndex(dim)
+        self.policies = IVFIndex(dim)
+        # id -> signature of the embedded text
+        self._claim_texts: Dict[str, int] = {}
+        self._policy_texts: Dict[str, int] = {}
+        if store is None:
+            return
+        start = time.perf_counter()
+        for index, hashes, namespace, to_text in ((self.claims, self._claim_texts, claims_namespace, claim_text),
+                                                  (self.policies, self._policy_texts, policies_namespace, policy_text)):
+            items = search_all(store, namespace)
+            if items:
+                texts = [to_text(item.value) for item in items]
+                index.add([item.key for item in items], embed_texts(self.embeddings, texts))
+                hashes.update((item.key, text_signature(text)) for item, text in zip(items, texts))
+        logger.info(f"Built semantic index: {len(self.claims)} claims, {len(self.policies)} policies in "
+                    f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def embed(self, text: str) -> np.ndarray:
+        return embed_texts(self.embeddings, [text])[0]
+
+    def _upsert(self, index: IVFIndex, hashes: Dict[str, int], key: str, text: str) -> None:
+        signature = text_signature(text)
+        if hashes.get(key) == signature:
+            return
+        index.add([key], embed_texts(self.embeddings, [text]))
+        hashes[key] = signature
+
+    def add_claim(self, claim_id: str, claim: Dict[str, Any]) -> None:
+        self._upsert(self.claims, self._claim_texts, claim_id, claim_text(claim))
+
+    def add_policy(self, policy_id: str, policy: Dict[str, Any]) -> None:
+        self._upsert(self.policies, self._policy_texts, policy_id, policy_text(policy))
+
+    def remove_claim(self, claim_id: str) -> None:
+        self.claims.remove(claim_id)
+        self._claim_texts.pop(claim_id, None)
+
+    def remove_policy(self, policy_id: str) -> None:
+        self.policies.remove(policy_id)
+        self._policy_texts.pop(policy_id, None)
+
+    def to_arrays(self) -> IndexArrays:
+        """
+        Both vector indexes and the text signatures for a snapshot.
+
+        Raises:
+            ValueError: If the embeddings are not HashingEmbeddings (other models cannot be restored from a file)
+        """
+        if not isinstance(self.embeddings, HashingEmbeddings):
+            raise ValueError(f"{type(self.embeddings).__name__} embeddings are not saved in snapshots")
+        arrays: Dict[str, np.ndarray] = {}
+        meta: Dict[str, Any] = {"dim": self.embeddings.dim}
+        for name, index, hashes in (("claims", self.claims, self._claim_texts),
+                                    ("policies", self.policies, self._policy_texts)):
+            index_arrays, meta[name] = index.to_arrays()
+            arrays.update({f"{name}.{key}": array for key, array in index_arrays.items()})
+            ids = unpack_strings(index_arrays["ids"], meta[name]["size"])
+            arrays[f"{name}.signatures"] = np.array([hashes.get(item_id, 0) for item_id in ids], dtype=np.uint64)
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "SemanticIndex":
+        index = cls(embeddings=HashingEmbeddings(meta["dim"]))
+        for name, hashes in (("claims", index._claim_texts), ("policies", index._policy_texts)):
+            prefix = f"{name}."
+            vectors = IVFIndex.from_arrays({key[len(prefix):]: array for key, array in arrays.items()
+                                            if key.startswith(prefix)}, meta[name])
+            setattr(index, name, vectors)
+            hashes.update(zip(vectors._ids, arrays[f"{name}.signatures"].tolist()))
+        return index
+
+
+def _apply_write(index: SemanticIndex, namespace: tuple, key: str, value: Optional[Dict[str, Any]]) -> None:
+    if namespace == claims_namespace:
+        if value is None:
+            index.remove_claim(key)
+        else:
+            index.add_claim(key, value)
+    elif namespace == policies_namespace:
+        if value is None:
+            index.remove_policy(key)
+        else:
+            index.add_policy(key, value)
+
+
+_registry = IndexRegistry("vector_index", SemanticIndex, _apply_write,
+                          dump=SemanticIndex.to_arrays, load=SemanticIndex.from_arrays)
+
+
+def get_semantic_index(store) -> SemanticIndex:
+    """Return the semantic index for a store, embedding its claims and policies on first use or at load time."""
+    return _registry.get(store)
+
+
+def embed_claim(store, claim_id: str, claim: Dict[str, Any]) -> None:
+    """Embed a claim this process just wrote into the store's index (if built; stores with a change log catch up from it)."""
+    _registry.update(store, claims_namespace, claim_id, claim)
@@ -0,0 +1,666 @@
+"""
+Worker Pool - Pre-fork agent workers that share one store.
+The parent process owns the store and serves it to the workers over a local
+manager socket; every worker runs its own agent (and checkpointer), so prompt
+building, tool-result serialization and tokenization spread across cores.
+When the store has a change log, workers read policies and claims from a
+memory-mapped snapshot of it (kept current from the log) instead of asking the
+parent for every read; writes always commit in the parent.
+Requests are routed by session ID, so a conversation always lands on the same
+worker and keeps its checkpointed history. Workers are forked by a zygote
+process (WorkerZygote); a program that starts it before running any threads
+(serve.py forks it before simple_agent wires the store) gives workers that
+inherit no lock held by a parent thread. A worker that dies is restarted and
+its in-flight requests fail right away.
+
+Forking requires a POSIX platform.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Connection, Listener, wait
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.messages import HumanMessage
+from langgraph.store.base import BaseStore, GetOp, PutOp, SearchOp
+
+import metrics
+from change_log import SNAPSHOT_OP, ChangeCapturingStore, changes_since
+from inmemory_store import VERSION_FIELD, ConflictError, commit_transaction
+from snapshot import SNAPSHOT_NAMESPACES, SnapshotStore, write_snapshot
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+# Control message asking a worker for its memory report
+_MEMORY_REPORT = "memory_report"
+
+
+class _StoreManager(BaseManager):
+    pass
+
+
+class _StoreServer:
+    """Object exposed to workers; runs store operations in the parent process."""
+
+    def __init__(self, store: BaseStore):
+        self.store = store
+
+    def batch(self, ops: List[Any]) -> List[Any]:
+        metrics.incr("workers.store_calls", method="batch")
+        return self.store.batch(ops)
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        metrics.incr("workers.store_calls", method="commit_versioned")
+        return commit_transaction(self.store, read_versions, writes)
+
+    def changes_since(self, from_offset: Optional[int]):
+        metrics.incr("workers.store_calls", method="changes_since")
+        return changes_since(self.store, from_offset)
+
+
+class SharedStoreClient(BaseStore):
+    """
+    BaseStore that forwards every operation to the store owned by the parent process.
+
+    Transactions commit through commit_versioned() so version checks and writes
+    happen atomically on the owning side.
+    """
+
+    def __init__(self, address, authkey: bytes):
+        if "store_server" not in _StoreManager._registry:
+            # Client side only needs the type ID (e.g. clients of separately started shard processes)
+            _StoreManager.register("store_server")
+        manager = _StoreManager(address=address, authkey=authkey)
+        manager.connect()
+        self._server = manager.store_server()
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        return self._server.batch(list(ops))
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, list(ops))
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        return self._server.commit_versioned(read_versions, writes)
+
+    def changes_since(self, from_offset: Optional[int] = None):
+        """Writes captured by the owning process's change log since an offset (see change_log.changes_since)."""
+        return self._server.changes_since(from_offset)
+
+
+class ReplicaStore(BaseStore):
+    """
+    Worker-side store that reads the given namespaces from a memory-mapped snapshot
+    of the parent's store and forwards every write (and every other read) to the parent.
+
+    The snapshot is brought up to date from the parent's change log by refresh(),
+    called at the start of each request and after a transaction conflict; the
+    worker's own writes apply locally as soon as they commit.
+
+    Args:
+        backend: Client of the parent's store
+        path: Snapshot of the parent's store
+        offset: Change log position the snapshot reflects
+        namespaces: Namespaces read from the snapshot (captured by the parent's change log)
+    """
+
+    def __init__(self, backend: "SharedStoreClient", path: str, offset: int, namespaces: Iterable[tuple]):
+        self.backend = backend
+        self.local = SnapshotStore(path)
+        self.namespaces = {tuple(ns) for ns in namespaces}
+        self._offset = offset
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Apply the parent's writes captured since the last refresh."""
+        with self._lock:
+            try:
+                next_offset, events = self.backend.changes_since(self._offset)
+            except ValueError as e:
+                logger.warning(f"Reading every namespace from the parent store: {str(e)}")
+                self.namespaces = set()
+                return
+            for event in events:
+                if event["op"] != SNAPSHOT_OP:
+                    self._apply(tuple(event["namespace"]), event["key"], event["value"])
+            if events:
+                metrics.incr("workers.replica_changes", len(events))
+            self._offset = next_offset
+
+    def _apply(self, namespace: tuple, key: str, value: Optional[Dict[str, Any]]) -> None:
+        if namespace in self.namespaces:
+            self.local.batch([PutOp(namespace, key, value)])
+
+    def _is_local(self, op: Any) -> bool:
+        if isinstance(op, GetOp):
+            return tuple(op.namespace) in self.namespaces
+        return isinstance(op, SearchOp) and not op.query and tuple(op.namespace_prefix) in self.namespaces
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        results: List[Any] = [None] * len(ops)
+        forwarded: List[Tuple[int, Any]] = []
+
+        def forward():
+            for (index, op), result in zip(forwarded, self.backend.batch([op for _, op in forwarded])):
+                results[index] = result
+                if isinstance(op, PutOp):
+                    self._apply(tuple(op.namespace), op.key, op.value)
+            forwarded.clear()
+
+        for index, op in enumerate(ops):
+            if self._is_local(op):
+                # Earlier writes in the batch go first, so the read sees them
+                if forwarded:
+                    forward()
+                results[index] = self.local.batch([op])[0]
+            else:
+                forwarded.append((index, op))
+        if forwarded:
+            forward()
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, list(ops))
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        try:
+            versions = self.backend.commit_versioned(read_versions, writes)
+        except ConflictError:
+            # The retry must read the records that won
+            self.refresh()
+            raise
+        for (namespace, key), value in writes.items():
+            self._apply(tuple(namespace), key, {**value, VERSION_FIELD: versions[(namespace, key)]})
+        return versions
+
+    def changes_since(self, from_offset: Optional[int] = None):
+        """The parent's captured writes; the current position is the one the local records reflect."""
+        if from_offset is None:
+            with self._lock:
+                return self._offset, []
+        return self.backend.changes_since(from_offset)
+
+    def saved_index(self, name: str):
+        """Indexes saved in the snapshot, while the local records still match it."""
+        return self.local.saved_index(name)
+
+
+def _captured_namespaces(store) -> Set[tuple]:
+    while store is not None:
+        if isinstance(store, ChangeCapturingStore):
+            return set(store.namespaces)
+        store = getattr(store, "backend", None)
+    return set()
+
+
+def default_agent_factory(store: BaseStore):
+    """Build the standard agent inside a worker, with its own model clients and checkpointer."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    from insurance_tools import TOOLS
+    from insurance_agent import build_agent
+    from model_router import build_default_router
+
+    # A fresh router so the worker's HTTP clients are created in the worker, not inherited
+    return build_agent(model=build_default_router(TOOLS), store=store, checkpointer=InMemorySaver())
+
+
+class _SessionLocks:
+    """Per-session locks, dropped as soon as no request holds or waits for them."""
+
+    def __init__(self):
+        # session -> [lock, requests holding or waiting]
+        self._locks: Dict[str, list] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, session_id: str):
+        with self._guard:
+            entry = self._locks.setdefault(session_id, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+def _degraded_answer(question: str, customer_id: Optional[str], response_cache,
+                     try_fast_path: Callable[[str], Optional[str]]) -> Dict[str, Any]:
+    """Answer without the LLM: the fast path, else a recent answer to the same question, else a retryable error."""
+    answer = try_fast_path(question)
+    if answer is not None:
+        return {"answer": answer, "route": "fast_path", "degraded": True}
+    cached = response_cache.get(question, scope=customer_id)
+    if cached is not None:
+        return {"answer": cached, "route": "cache", "degraded": True}
+    return {"error": "The assistant is handling a lot of requests right now. Simple lookups like "
+                     "'claim c2 status' still work; please try again shortly.", "retryable": True}
+
+
+def _zygote_main(channel: Connection) -> None:
+    """
+    Take the workers' arguments from a ("configure", args) command, fork a worker for
+    every ("start", index) command and report each worker's exit as (index, pid, exit code).
+    The zygote runs no threads, so its forks inherit no held locks.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    children: Dict[int, int] = {}
+    worker_args: tuple = ()
+    stop_deadline = None
+    while stop_deadline is None or (children and time.monotonic() < stop_deadline):
+        if stop_deadline is None and channel.poll(0.2):
+            try:
+                command, value = channel.recv()
+            except EOFError:
+                command, value = "stop", 0.0
+            if command == "stop":
+                stop_deadline = time.monotonic() + value
+            elif command == "configure":
+                worker_args = value
+            else:
+                pid = os.fork()
+                if pid == 0:
+                    channel.close()
+                    code = 0
+                    try:
+                        _worker_main(value, *worker_args)
+                    except BaseException as e:
+                        logger.error(f"Worker {value} crashed: {str(e)}")
+                        code = 1
+                    os._exit(code)
+                children[pid] = value
+        elif stop_deadline is not None:
+            time.sleep(0.05)
+        while children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = children.pop(pid)
+            if stop_deadline is None:
+                channel.send((index, pid, os.waitstatus_to_exitcode(status)))
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+
+
+def _worker_main(index: int, store_address, listener_address, authkey: bytes,
+                 agent_factory: Callable[[BaseStore], Any], threads: int, use_fast_path: bool,
+                 replica: Optional[tuple]) -> None:
+    # The parent handles Ctrl+C and shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from fast_path import try_fast_path
+    from index_registry import build_indexes
+    from insurance_tools import set_default_store
+    from memory_report import memory_report
+    from profiling import choose_mode, profile_request
+    from resilience import CircuitOpenError, ResponseCache, is_retryable_error
+
+    store = SharedStoreClient(store_address, authkey)
+    if replica is not None:
+        store = ReplicaStore(store, *replica)
+    set_default_store(store)
+    build_indexes(store)
+    worker_agent = agent_factory(store)
+    session_locks = _SessionLocks()
+    # Recent answers served while the LLM is unavailable (circuit open, rate limited, timing out)
+    response_cache = ResponseCache()
+    connection = Client(listener_address, authkey=authkey)
+    send_lock = threading.Lock()
+
+    def reply(request_id: int, response: Dict[str, Any]) -> None:
+        with send_lock:
+            connection.send((request_id, response))
+
+    def handle(request_id: int, session_id: str, question: str, profile: Optional[str],
+               customer_id: Optional[str]) -> None:
+        start = time.perf_counter()
+        response: Dict[str, Any] = {"worker": index, "session_id": session_id}
+        profiled: Dict[str, Optional[str]] = {"path": None}
+        try:
+            if isinstance(store, ReplicaStore):
+                # The request sees every write committed before it started
+                store.refresh()
+            # Turns of one conversation run in order against its checkpoint
+            with session_locks.hold(session_id), \
+                    profile_request(f"{session_id}-{request_id}", choose_mode(profile)) as profiled:
+                answer = try_fast_path(question) if use_fast_path else None
+                if answer is not None:
+                    response.update(answer=answer, route="fast_path")
+                else:
+                    result = worker_agent.invoke(
+                        {"messages": [HumanMessage(content=question)]},
+                        config={"configurable": {"thread_id": session_id, "customer_id": customer_id}},
+                    )
+                    messages = result.get("messages", [])
+                    answer = messages[-1].content if messages else ""
+                    response_cache.put(question, answer, scope=customer_id)
+                    response.update(answer=answer, route="agent")
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_retryable_error(e):
+                logger.warning(f"Worker {index}: LLM unavailable, serving degraded answer: {str(e)}")
+                response.update(_degraded_answer(question, customer_id, response_cache, try_fast_path))
+            else:
+                logger.error(f"Worker {index} failed on session {session_id}: {str(e)}")
+                response["error"] = str(e)
+        if profiled["path"]:
+            response["profile"] = profiled["path"]
+        response["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        reply(request_id, response)
+
+    def report_memory(request_id: int) -> None:
+        try:
+            # Namespaces live in the parent; the worker holds its indexes, caches and sessions
+            report = memory_report(store, getattr(worker_agent, "checkpointer", None),
+                                   extra={"session_locks": session_locks}, publish=False,
+                                   include_namespaces=False)
+        except Exception as e:
+            logger.error(f"Worker {index} failed to report memory: {str(e)}")
+            report = {"error": str(e)}
+        report.update(worker=index, pid=os.getpid())
+        reply(request_id, report)
+
+    connection.send((index, os.getpid()))
+    logger.info(f"Worker {index} ready (pid {os.getpid()})")
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"worker-{index}") as pool:
+        while True:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                break
+            if request is None:
+                break
+            if request[0] == _MEMORY_REPORT:
+                pool.submit(report_memory, request[1])
+            else:
+                pool.submit(handle, *request)
+
+
+class WorkerZygote:
+    """
+    Single-threaded process that forks the pool's workers and their replacements.
+    Start it before the program runs any threads (store flushers, shard clients,
+    HTTP servers): a fork copies only the forking thread, so a lock another thread
+    holds at that moment stays locked forever in the child.
+    """
+
+    def __init__(self):
+        self.channel: Optional[Connection] = None
+        self._process = None
+
+    def start(self) -> "WorkerZygote":
+        threads = threading.active_count()
+        if threads > 1:
+            logger.warning(f"Forking the worker zygote from a process running {threads} threads; "
+                           "locks they hold are inherited by every worker")
+        context = multiprocessing.get_context("fork")
+        self.channel, zygote_end = context.Pipe()
+        self._process = context.Process(target=_zygote_main, name="agent-worker-zygote", daemon=True,
+                                        args=(zygote_end,))
+        self._process.start()
+        zygote_end.close()
+        return self
+
+    def stop(self, timeout: float) -> None:
+        """Wait for the workers to exit (terminating any left after the timeout), then stop the zygote."""
+        try:
+            self.channel.send(("stop", timeout))
+        except OSError:
+            pass
+        self._process.join(timeout=timeout + 5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+class WorkerPool:
+    """
+    Pre-forked agent workers routed by session ID.
+
+    Args:
+        store: Store owned by this (parent) process and shared with all workers
+        workers: Number of worker processes (defaults to the CPU count)
+        agent_factory: Builds a worker's agent from its store
+        threads_per_worker: Concurrent requests per worker (LLM calls are I/O bound)
+        use_fast_path: Answer exact-form lookups without the agent
+        zygote: Started zygote to fork the workers from (default: one started by start())
+    """
+
+    def __init__(self, store: BaseStore, workers: Optional[int] = None,
+                 agent_factory: Callable[[BaseStore], Any] = default_agent_factory,
+                 threads_per_worker: int = 8, use_fast_path: bool = True,
+                 zygote: Optional[WorkerZygote] = None):
+        self.store = store
+        self.workers = workers or os.cpu_count() or 1
+        self.agent_factory = agent_factory
+        self.threads_per_worker = threads_per_worker
+        self.use_fast_path = use_fast_path
+        self._zygote = zygote
+        self._zygote_channel: Optional[Connection] = zygote.channel if zygote is not None else None
+        self._listener: Optional[Listener] = None
+        # worker index -> (connection, pid) of its running process
+        self._connections: Dict[int, Tuple[Connection, int]] = {}
+        # worker index -> requests waiting for the worker to (re)start
+        self._backlog: Dict[int, List[tuple]] = {}
+        # request ID -> (future, worker index)
+        self._pending: Dict[int, Tuple[Future, int]] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._server = None
+        self._authkey = None
+        self._snapshot_dir = None
+        self._threads = []
+        self._closing = threading.Event()
+
+    def _replica_args(self) -> Optional[tuple]:
+        """Snapshot, change log position and namespaces workers read locally (None: every read goes to the parent)."""
+        namespaces = _captured_namespaces(self.store) & set(SNAPSHOT_NAMESPACES)
+        feed = changes_since(self.store)
+        if feed is None or not namespaces:
+            return None
+        self._snapshot_dir = tempfile.mkdtemp(prefix="agent-workers-")
+        path = os.path.join(self._snapshot_dir, "store.snap")
+        # Position first: writes racing the snapshot are applied again by the workers, which is harmless
+        write_snapshot(self.store, path)
+        return path, feed[0], sorted(namespaces)
+
+    def start(self) -> "WorkerPool":
+        self._authkey = os.urandom(16)
+        server_object = _StoreServer(self.store)
+        _StoreManager.register("store_server", callable=lambda: server_object)
+        if self._zygote is None:
+            self._zygote = WorkerZygote().start()
+            self._zygote_channel = self._zygote.channel
+        self._server = _StoreManager(authkey=self._authkey).get_server()
+        self._listener = Listener(family="AF_UNIX", authkey=self._authkey)
+        worker_args = (self._server.address, self._listener.address, self._authkey, self.agent_factory,
+                       self.threads_per_worker, self.use_fast_path, self._replica_args())
+        self._zygote_channel.send(("configure", worker_args))
+        for index in range(self.workers):
+            self._zygote_channel.send(("start", index))
+
+        self._threads = [
+            threading.Thread(target=self._serve_store, name="store-server", daemon=True),
+            threading.Thread(target=self._accept_workers, name="worker-accept", daemon=True),
+            threading.Thread(target=self._collect_results, name="worker-results", daemon=True),
+            threading.Thread(target=self._watch_workers, name="worker-watchdog", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started {self.workers} agent workers sharing the parent store")
+        return self
+
+    def _serve_store(self) -> None:
+        try:
+            self._server.serve_forever()
+        except SystemExit:
+            # serve_forever exits once close() sets its stop event
+            pass
+
+    def worker_for(self, session_id: str) -> int:
+        """Stable session -> worker assignment."""
+        return zlib.crc32(session_id.encode()) % self.workers
+
+    def _send(self, index: int, message: tuple) -> None:
+        """Send a message to a worker, or keep it until the worker has started (caller holds _pending_lock)."""
+        connected = self._connections.get(index)
+        if connected is None:
+            self._backlog.setdefault(index, []).append(message)
+            return
+        try:
+            connected[0].send(message)
+        except OSError:
+            # The worker died; the watchdog fails its requests when the zygote reports the exit
+            pass
+
+    def submit(self, session_id: str, question: str, profile: Optional[str] = None,
+               customer_id: Optional[str] = None) -> Future:
+        """
+        Queue a question on the session's worker; the future resolves to the response dict.
+        With profile ("cprofile", "sampling" or "1"), the worker profiles the request and
+        returns the profile's path in the response. customer_id is the authenticated
+        customer whose context goes into the prompt.
+        """
+        request_id = next(self._request_ids)
+        future: Future = Future()
+        index = self.worker_for(session_id)
+        # Under the lock, so a worker being replaced either fails this request or the new worker gets it
+        with self._pending_lock:
+            self._pending[request_id] = (future, index)
+            self._send(index, (request_id, session_id, question, profile, customer_id))
+        return future
+
+    def ask(self, session_id: str, question: str, timeout: Optional[float] = None,
+            profile: Optional[str] = None, customer_id: Optional[str] = None) -> Dict[str, Any]:
+        """Submit a question and wait for the response."""
+        return self.submit(session_id, question, profile, customer_id).result(timeout=timeout)
+
+    def memory_reports(self, timeout: Optional[float] = 60.0) -> List[Dict[str, Any]]:
+        """Each worker's memory report (indexes, caches, sessions, RSS), in worker order."""
+        futures = []
+        with self._pending_lock:
+            for index in range(self.workers):
+                request_id = next(self._request_ids)
+                future: Future = Future()
+                self._pending[request_id] = (future, index)
+                self._send(index, (_MEMORY_REPORT, request_id))
+                futures.append(future)
+        reports = []
+        for index, future in enumerate(futures):
+            try:
+                reports.append(future.result(timeout=timeout))
+            except Exception as e:
+                reports.append({"worker": index, "error": str(e)})
+        return reports
+
+    def _accept_workers(self) -> None:
+        """Register each worker as it connects and hand it the requests that waited for it."""
+        while not self._closing.is_set():
+            try:
+                connection = self._listener.accept()
+                index, pid = connection.recv()
+            except (OSError, EOFError):
+                continue
+            with self._pending_lock:
+                self._connections[index] = (connection, pid)
+                for message in self._backlog.pop(index, []):
+                    self._send(index, message)
+
+    def _collect_results(self) -> None:
+        while not self._closing.is_set() or self._connections:
+            with self._pending_lock:
+                connections = [connection for connection, _ in self._connections.values()]
+            for connection in wait(connections, timeout=0.2) if connections else ():
+                try:
+                    request_id, response = connection.recv()
+                except (EOFError, OSError):
+                    # The worker exited; the watchdog restarts it when the zygote reports the exit
+                    with self._pending_lock:
+                        for index, (known, _) in list(self._connections.items()):
+                            if known is connection:
+                                del self._connections[index]
+                    continue
+                with self._pending_lock:
+                    entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    entry[0].set_result(response)
+            if not connections:
+                time.sleep(0.05)
+
+    def _watch_workers(self) -> None:
+        """Fail the requests of a worker that died and have the zygote fork a replacement in its slot."""
+        while not self._closing.is_set():
+            try:
+                if not self._zygote_channel.poll(0.5):
+                    continue
+                index, pid, code = self._zygote_channel.recv()
+            except (EOFError, OSError):
+                if not self._closing.is_set():
+                    logger.error("Worker zygote exited; workers that die are no longer restarted")
+                return
+            if self._closing.is_set():
+                return
+            logger.error(f"Worker {index} (pid {pid}) exited with code {code}; restarting it")
+            metrics.incr("workers.restarts")
+            with self._pending_lock:
+                connected = self._connections.get(index)
+                if connected is not None and connected[1] == pid:
+                    del self._connections[index]
+                # Requests still waiting in the backlog go to the replacement
+                waiting = {message[1] if message[0] == _MEMORY_REPORT else message[0]
+                           for message in self._backlog.get(index, [])}
+                lost = [request_id for request_id, (_, owner) in self._pending.items()
+                        if owner == index and request_id not in waiting]
+                failed = [self._pending.pop(request_id)[0] for request_id in lost]
+                self._zygote_channel.send(("start", index))
+            for future in failed:
+                future.set_exception(RuntimeError(f"Worker {index} died before the request completed"))
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the workers after their queued requests, then stop serving the store."""
+        self._closing.set()
+        with self._pending_lock:
+            for connection, _ in self._connections.values():
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+        if self._zygote is not None:
+            self._zygote.stop(timeout)
+        for thread in self._threads:
+            if thread.name in ("worker-results", "worker-watchdog"):
+                thread.join(timeout=5)
+        if self._listener is not None:
+            self._listener.close()
+        if self._server is not None:
+            self._server.stop_event.set()
+        with self._pending_lock:
+            for future, _ in self._pending.values():
+                future.set_exception(RuntimeError("Worker pool closed before the request completed"))
+            self._pending.clear()
+        if self._snapshot_dir is not None:
+            shutil.rmtree(self._snapshot_dir, ignore_errors=True)
+        logger.info("Agent workers stopped")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
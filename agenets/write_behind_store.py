@@ -0,0 +1,204 @@
+"""
+Write-Behind Store - Coalesces puts into grouped commits on a background thread.
+Wraps any LangGraph BaseStore. Writes become visible to readers immediately
+(read-your-writes through an in-memory overlay) and reach the backend in
+batches bounded by size and time; a bounded queue applies backpressure.
+Writes whose commit keeps failing are retried with later batches, and flush()
+and close() raise until they are committed.
+"""
+
+import asyncio
+import atexit
+import itertools
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langgraph.store.base import BaseStore, GetOp, Item, PutOp
+
+import metrics
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+_COMMIT_ATTEMPTS = 5
+
+
+class WriteBehindError(RuntimeError):
+    """Raised by flush()/close() when queued writes could not be committed to the backend."""
+
+
+class WriteBehindStore(BaseStore):
+    """
+    BaseStore wrapper that batches writes to a (durable) backend store.
+
+    Args:
+        backend: Store that receives grouped commits via backend.batch()
+        max_batch: Commit as soon as this many writes are queued
+        max_delay_s: Commit queued writes at least this often
+        max_queue: Bound on queued writes; put() blocks when full (backpressure)
+    """
+
+    def __init__(self, backend: BaseStore, max_batch: int = 256, max_delay_s: float = 0.01,
+                 max_queue: int = 10000):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self._queue: "queue.Queue[Tuple[int, PutOp]]" = queue.Queue(maxsize=max_queue)
+        # (namespace, key) -> (sequence, Item or None for a pending delete)
+        self._overlay: Dict[Tuple[tuple, str], Tuple[int, Optional[Item]]] = {}
+        self._overlay_lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        # Sequences are assigned and queued under one lock, so the queue is in sequence order
+        self._enqueue_lock = threading.Lock()
+        self._last_sequence = 0
+        # Last sequence the flusher has handled, and writes whose commit failed (latest per key, retried)
+        self._handled = threading.Condition()
+        self._handled_sequence = 0
+        self._failed: Dict[Tuple[tuple, str], Tuple[int, PutOp]] = {}
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ---- reads and writes -------------------------------------------------
+
+    def _read_overlay(self, op: GetOp):
+        with self._overlay_lock:
+            entry = self._overlay.get((tuple(op.namespace), op.key))
+        return entry
+
+    def _enqueue(self, op: PutOp) -> None:
+        if self._closed:
+            raise RuntimeError("WriteBehindStore is closed")
+        now = datetime.now(timezone.utc)
+        key = (tuple(op.namespace), op.key)
+        with self._enqueue_lock:
+            seq = next(self._sequence)
+            with self._overlay_lock:
+                previous = self._overlay.get(key)
+                created_at = previous[1].created_at if previous and previous[1] is not None else now
+                item = None if op.value is None else Item(value=op.value, key=op.key, namespace=op.namespace,
+                                                          created_at=created_at, updated_at=now)
+                self._overlay[key] = (seq, item)
+            try:
+                self._queue.put_nowait((seq, op))
+            except queue.Full:
+                metrics.incr("store.write_behind.backpressure_waits")
+                self._queue.put((seq, op))
+            self._last_sequence = seq
+        metrics.set_gauge("store.write_behind.queue_depth", self._queue.qsize())
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        results: List[Any] = []
+        for op in ops:
+            if isinstance(op, PutOp):
+                self._enqueue(op)
+                results.append(None)
+            elif isinstance(op, GetOp):
+                entry = self._read_overlay(op)
+                results.append(entry[1] if entry is not None else self.backend.batch([op])[0])
+            else:
+                # Searches and namespace listings see all earlier writes
+                self.flush()
+                results.append(self.backend.batch([op])[0])
+        return results
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch, list(ops))
+
+    # ---- background commits -----------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._closed:
+                    return
+                if self._failed:
+                    self._commit([])
+                continue
+            pending = [first]
+            deadline = time.monotonic() + self.max_delay_s
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(pending)
+
+    def _commit(self, pending: List[Tuple[int, PutOp]]) -> None:
+        # Coalesce: only the latest write per key reaches the backend; earlier failed writes go first
+        latest: Dict[Tuple[tuple, str], Tuple[int, PutOp]] = dict(self._failed)
+        for seq, op in pending:
+            latest[(tuple(op.namespace), op.key)] = (seq, op)
+
+        for attempt in range(_COMMIT_ATTEMPTS):
+            try:
+                with metrics.timed("store.write_behind.commit_ms"):
+                    self.backend.batch([op for _, op in latest.values()])
+                break
+            except Exception as e:
+                logger.error(f"Write-behind commit of {len(latest)} writes failed (attempt {attempt + 1}): {str(e)}")
+                time.sleep(0.05 * (2 ** attempt))
+        else:
+            # Keep the overlay entries so this process still serves the writes, and retry them with the next batch
+            metrics.incr("store.write_behind.failed_writes", len(latest))
+            self._handle(pending, latest)
+            return
+
+        metrics.incr("store.write_behind.commits")
+        metrics.observe("store.write_behind.batch_size", len(pending))
+        with self._overlay_lock:
+            for key, (seq, _) in latest.items():
+                entry = self._overlay.get(key)
+                # A newer write may have arrived meanwhile; only drop entries now in the backend
+                if entry is not None and entry[0] == seq:
+                    del self._overlay[key]
+        self._handle(pending, {})
+
+    def _handle(self, pending: List[Tuple[int, PutOp]], failed: Dict[Tuple[tuple, str], Tuple[int, PutOp]]) -> None:
+        with self._handled:
+            self._failed = failed
+            if pending:
+                self._handled_sequence = pending[-1][0]
+            self._handled.notify_all()
+
+    def flush(self) -> None:
+        """
+        Block until every write queued before the call has been committed to the backend.
+        Writes queued after the call are not waited for, so flush() returns under sustained writes.
+
+        Raises:
+            WriteBehindError: If some of those writes could not be committed (they are retried later)
+        """
+        with self._enqueue_lock:
+            target = self._last_sequence
+        with self._handled:
+            while self._handled_sequence < target:
+                self._handled.wait()
+            failed = sum(1 for seq, _ in self._failed.values() if seq <= target)
+        if failed:
+            raise WriteBehindError(f"{failed} writes could not be committed to the backend")
+
+    def close(self) -> None:
+        """
+        Flush outstanding writes and stop the background thread (idempotent).
+
+        Raises:
+            WriteBehindError: If some writes could not be committed; they are lost
+        """
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._flusher.join(timeout=5)
+        logger.info("Write-behind store flushed and closed")
@@ -0,0 +1,721 @@
+"""
+Offline Benchmarks for the Insurance Agent
+Runs the agent against scripted fake models so results are reproducible and free.
+
+Usage:
+    python benchmarks.py router [--questions 200]
+    python benchmarks.py resilience [--requests 200 --error-rate 0.2 --slow-rate 0.05]
+    python benchmarks.py http [--requests 500]
+    python benchmarks.py store-cas [--threads 16 --updates 500]
+    python benchmarks.py write-behind [--threads 16 --claims 200 --commit-latency 0.002]
+    python benchmarks.py snapshot [--claims 100000]
+    python benchmarks.py workers [--workers 1 2 4 --requests 400]
+    python benchmarks.py claim-search [--claims 1000000]
+    python benchmarks.py vector-search [--claims 200000 --probes 1 4 8 16]
+    python benchmarks.py date-range [--claims 1000000]
+    python benchmarks.py tool-selection [--questions 200 --prefill-ms-per-1k 40]
+    python benchmarks.py cassette-roundtrip [--turns 60]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+
+# Load environment variables
+load_dotenv()
+
+# Add the agenets directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
+
+import metrics
+from fake_llm import ScriptedChatModel
+from fake_servers import FakeOpenAIServer
+from http_client import connection_stats, get_http_client
+from index_registry import build_indexes
+from inmemory_store import bootstrap_memory_store, claims_namespace, get_versioned, run_transaction, search_all
+from insurance_tools import add_new_claim, get_claim_status, set_default_store, update_claim_status
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+from snapshot import SnapshotStore, write_snapshot
+from cassette import Cassette, RecordingChatModel, replay_turns
+from claim_search import ClaimSearchIndex, tokenize
+from date_index import SortedDateIndex, to_ordinal
+from vector_index import HashingEmbeddings, IVFIndex, brute_force_search, embed_texts
+from write_behind_store import WriteBehindStore
+from insurance_tools import TOOLS
+from model_router import ModelRouter, ModelTier, SMALL_TIER, LARGE_TIER
+from tool_selection import ToolSelector, schema_tokens
+from fake_llm import _plan_tool_calls
+from resilience import CircuitBreaker, RateLimiter, ResiliencePolicy, ResilientModel
+from simple_agent import active_store, build_agent
+from worker_pool import WorkerPool
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SAMPLE_QUESTIONS = [
+    "status of claim c4",
+    "policy p3 details",
+    "premium for p7",
+    "contact info for u1",
+    "Show me all the claims for customer u2 and explain how much coverage remains",
+    "Compare policy p2 and p8 and tell me which has the lower deductible",
+    "File a new claim for u1 on policy p1 for 1200 dollars",
+    "What is my name?",
+]
+
+
+def bench_router(args):
+    """Compare the tiered router with an all-large-model baseline."""
+    def tiers():
+        return {
+            SMALL_TIER: ModelTier(SMALL_TIER, lambda: ScriptedChatModel(latency_s=args.small_latency), 0.00015, 0.0006),
+            LARGE_TIER: ModelTier(LARGE_TIER, lambda: ScriptedChatModel(latency_s=args.large_latency), 0.0025, 0.01),
+        }
+
+    questions = [SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)] for i in range(args.questions)]
+    report = {}
+    for label, router in (
+        ("routed", ModelRouter(tiers(), TOOLS)),
+        ("large_only", ModelRouter(tiers(), TOOLS, classifier=lambda question: LARGE_TIER)),
+    ):
+        metrics.reset()
+        agent = build_agent(model=router)
+        start = time.perf_counter()
+        for i, question in enumerate(questions):
+            agent.invoke({"messages": [HumanMessage(content=question)]},
+                         config={"configurable": {"thread_id": f"bench_{i}"}})
+        elapsed = time.perf_counter() - start
+        snap = metrics.snapshot()
+        report[label] = {
+            "questions": len(questions),
+            "wall_seconds": round(elapsed, 3),
+            "decisions": {k: v for k, v in snap["counters"].items() if k.startswith("router.")},
+            "cost_usd": {k: round(v, 5) for k, v in snap["counters"].items() if k.startswith("llm.cost_usd")},
+            "latency_ms": {k: v for k, v in snap["timings"].items() if k.startswith("llm.latency_ms")},
+        }
+    print(json.dumps(report, indent=2))
+
+
+SELECTION_QUESTIONS = SAMPLE_QUESTIONS + [
+    "Is there a repair shop near customer u3?",
+    "Which policies expire in the next 30 days?",
+    "Find claims similar to c5",
+    "Search claims mentioning water damage",
+    "How much will insurance pay for claim c2?",
+    "Quote the renewal for p4",
+    "List all claims under investigation",
+    "Update claim c6 to Approved",
+    "Claims filed between 2024-01-01 and 2024-06-30",
+    "Hello, can you help me?",
+]
+
+
+def bench_tool_selection(args):
+    """Prompt tokens, latency and tool recall with per-turn tool subsets vs. every tool bound."""
+    selector = ToolSelector(TOOLS)
+    full_tokens = schema_tokens(TOOLS)
+    subset_tokens, missed, fallbacks = [], [], 0
+    for question in SELECTION_QUESTIONS:
+        names = selector.select_names(question)
+        if names is None:
+            fallbacks += 1
+            subset_tokens.append(full_tokens)
+            continue
+        subset_tokens.append(schema_tokens([t for t in TOOLS if t.name in names]))
+        # Tools the scripted model plans for the question must be in the subset
+        missed.extend(f"{question!r}: {call['name']}" for call in _plan_tool_calls(question) if call["name"] not in names)
+    report = {
+        "tools": len(TOOLS),
+        "schema_tokens_full": full_tokens,
+        "schema_tokens_subset_avg": round(sum(subset_tokens) / len(subset_tokens), 1),
+        "full_set_fallbacks": fallbacks,
+        "missed_planned_tools": missed,
+    }
+
+    def tiers():
+        def model():
+            return ScriptedChatModel(latency_s=args.latency, prefill_s_per_1k_tokens=args.prefill_ms_per_1k / 1000)
+        return {SMALL_TIER: ModelTier(SMALL_TIER, model), LARGE_TIER: ModelTier(LARGE_TIER, model)}
+
+    questions = [SELECTION_QUESTIONS[i % len(SELECTION_QUESTIONS)] for i in range(args.questions)]
+    for label, router in (
+        ("all_tools", ModelRouter(tiers(), TOOLS)),
+        ("selected_tools", ModelRouter(tiers(), TOOLS, tool_selector=ToolSelector(TOOLS))),
+    ):
+        metrics.reset()
+        agent = build_agent(model=router)
+        start = time.perf_counter()
+        for i, question in enumerate(questions):
+            agent.invoke({"messages": [HumanMessage(content=question)]},
+                         config={"configurable": {"thread_id": f"select_{i}"}})
+        elapsed = time.perf_counter() - start
+        snap = metrics.snapshot()
+        calls = sum(v for k, v in snap["counters"].items() if k.startswith("llm.calls"))
+        input_tokens = sum(v for k, v in snap["counters"].items() if k.startswith("llm.input_tokens"))
+        report[label] = {
+            "model_calls": int(calls),
+            "input_tokens_per_call": round(input_tokens / calls, 1) if calls else 0.0,
+            "turn_ms_avg": round(elapsed * 1000 / len(questions), 2),
+            "decisions": {k: v for k, v in snap["counters"].items() if k.startswith("tool_selection.")},
+        }
+    baseline, selected = report["all_tools"], report["selected_tools"]
+    report["input_token_reduction"] = round(1 - selected["input_tokens_per_call"] / baseline["input_tokens_per_call"], 3)
+    report["turn_latency_reduction"] = round(1 - selected["turn_ms_avg"] / baseline["turn_ms_avg"], 3)
+    print(json.dumps(report, indent=2))
+
+
+def bench_cassette_roundtrip(args):
+    """Record scripted turns with per-turn tool subsets, replay them, and fail on any cassette miss."""
+    path = os.path.join(tempfile.mkdtemp(prefix="cassette-"), "roundtrip.jsonl.gz")
+    cassette = Cassette(path)
+
+    def model():
+        return RecordingChatModel(inner=ScriptedChatModel(), cassette=cassette)
+
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    router = ModelRouter({SMALL_TIER: ModelTier(SMALL_TIER, model), LARGE_TIER: ModelTier(LARGE_TIER, model)},
+                         TOOLS, tool_selector=ToolSelector(TOOLS))
+    agent = build_agent(model=router, store=store, checkpointer=InMemorySaver())
+    for turn in range(args.turns):
+        # Three-turn conversations, so later prompts carry earlier turns' tool calls
+        agent.invoke({"messages": [HumanMessage(content=SELECTION_QUESTIONS[turn % len(SELECTION_QUESTIONS)])]},
+                     config={"configurable": {"thread_id": f"roundtrip_{turn // 3}"}})
+    cassette.close()
+
+    report = {"recorded_responses": len(cassette.entries)}
+    for label, tool_selection in (("same_selection", True), ("all_tools", False)):
+        metrics.reset()
+        result = replay_turns(Cassette(path), tool_selection=tool_selection)
+        hits = metrics.snapshot()["counters"]
+        report[label] = {
+            "turns": result["turns"],
+            "misses": result["misses"],
+            "exact_hits": int(hits.get("cassette.hits{match=exact}", 0)),
+            "structural_hits": int(hits.get("cassette.hits{match=structural}", 0)),
+        }
+    print(json.dumps(report, indent=2))
+    if any(report[label]["misses"] for label in ("same_selection", "all_tools")):
+        logger.error("Replay missed recorded responses")
+        sys.exit(1)
+
+
+def bench_resilience(args):
+    """Drive ChatOpenAI against a fault-injecting fake server with and without the resilience layer."""
+    from langchain_openai import ChatOpenAI
+
+    report = {}
+    with FakeOpenAIServer(latency_s=args.latency, error_rate=args.error_rate,
+                          slow_rate=args.slow_rate, slow_latency_s=args.slow_latency) as server:
+        raw = ChatOpenAI(model="gpt-4o", base_url=server.base_url, api_key="fake", max_retries=0)
+        variants = {
+            "raw": raw,
+            "retry": ResilientModel(raw, ResiliencePolicy(
+                limiter=RateLimiter(args.rpm), breaker=CircuitBreaker(failure_threshold=50),
+                base_delay_s=0.01, max_delay_s=0.2), name="retry"),
+            "retry_hedged": ResilientModel(raw, ResiliencePolicy(
+                limiter=RateLimiter(args.rpm), breaker=CircuitBreaker(failure_threshold=50),
+                base_delay_s=0.01, max_delay_s=0.2, hedge_after_s=args.latency * 4), name="retry_hedged"),
+        }
+        for label, model in variants.items():
+            metrics.reset()
+
+            def call(i):
+                start = time.perf_counter()
+                try:
+                    model.invoke([HumanMessage(content=f"status of claim c{i % 10 + 1}")])
+                    metrics.observe("bench.latency_ms", (time.perf_counter() - start) * 1000)
+                    return True
+                except Exception:
+                    return False
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(call, range(args.requests)))
+            snap = metrics.snapshot()
+            report[label] = {
+                "success_rate": round(sum(results) / len(results), 3),
+                "latency_ms": snap["timings"].get("bench.latency_ms"),
+                "retries": snap["counters"].get(f"llm.retries{{tier={label}}}", 0),
+                "hedges": snap["counters"].get(f"llm.hedges{{tier={label}}}", 0),
+            }
+        report["server_requests"] = server.request_count
+    print(json.dumps(report, indent=2))
+
+
+def bench_http(args):
+    """Pooled shared client vs. a fresh connection per request, against the local fake server."""
+    import httpx
+
+    report = {}
+    with FakeOpenAIServer() as server:
+        url = f"{server.base_url}/chat/completions"
+        body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "status of claim c2"}]}
+
+        metrics.reset()
+        start = time.perf_counter()
+        client = get_http_client()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda i: client.post(url, json=body), range(args.requests)))
+        report["pooled"] = {"wall_seconds": round(time.perf_counter() - start, 3), **connection_stats(url)}
+
+        start = time.perf_counter()
+
+        def fresh(i):
+            with httpx.Client() as one_shot:
+                one_shot.post(url, json=body)
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(fresh, range(args.requests)))
+        report["fresh_connection_per_request"] = {"wall_seconds": round(time.perf_counter() - start, 3),
+                                                  "connections_opened": args.requests}
+    print(json.dumps(report, indent=2))
+
+
+def bench_store_cas(args):
+    """
+    Stress concurrent claim updates: naive read-modify-write loses updates,
+    optimistic transactions must not. Exits non-zero if any update is lost.
+    """
+    claim_ids = [f"c{i}" for i in range(1, args.claims + 1)]
+    expected = args.threads * args.updates
+    report = {}
+
+    def naive(store, claim_id):
+        claim = dict(store.get(claims_namespace, claim_id).value)
+        time.sleep(0)  # yield, as real I/O would between read and write
+        claim["revision_count"] = claim.get("revision_count", 0) + 1
+        store.put(claims_namespace, claim_id, claim)
+
+    def transactional(store, claim_id):
+        def bump(tx):
+            claim = tx.get(claims_namespace, claim_id)
+            time.sleep(0)
+            claim["revision_count"] = claim.get("revision_count", 0) + 1
+            tx.put(claims_namespace, claim_id, claim)
+        run_transaction(store, bump, max_attempts=1000)
+
+    for label, update in (("naive_read_modify_write", naive), ("optimistic_transaction", transactional)):
+        metrics.reset()
+        store = InMemoryStore()
+        bootstrap_memory_store(store)
+
+        def worker(thread_index):
+            for i in range(args.updates):
+                update(store, claim_ids[(thread_index + i) % len(claim_ids)])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(worker, range(args.threads)))
+        elapsed = time.perf_counter() - start
+        applied = sum(get_versioned(store, claims_namespace, c)[0].get("revision_count", 0) for c in claim_ids)
+        report[label] = {
+            "expected_updates": expected,
+            "applied_updates": applied,
+            "lost_updates": expected - applied,
+            "conflict_retries": metrics.snapshot()["counters"].get("store.tx_conflicts", 0),
+            "updates_per_second": round(expected / elapsed),
+        }
+
+    # The status-update tool itself under concurrency: every call must succeed and bump the version once
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    set_default_store(store)
+    statuses = ["Processing", "Approved", "Under Investigation"]
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(
+            lambda i: update_claim_status.invoke({"claim_id": claim_ids[i % len(claim_ids)],
+                                                  "new_status": statuses[i % len(statuses)]}),
+            range(args.threads * 20)))
+    versions = sum(get_versioned(store, claims_namespace, c)[1] for c in claim_ids)
+    report["update_claim_status_tool"] = {
+        "calls": len(results),
+        "failed": sum(1 for r in results if not r.get("success")),
+        "version_bumps": versions,
+    }
+    print(json.dumps(report, indent=2))
+    if report["optimistic_transaction"]["lost_updates"] or versions != len(results):
+        sys.exit(1)
+
+
+class _SlowCommitStore(InMemoryStore):
+    """InMemoryStore that pays a fixed cost per write batch, like an fsync per commit."""
+
+    def __init__(self, commit_latency_s: float):
+        super().__init__()
+        self.commit_latency_s = commit_latency_s
+        self.commits = 0
+        self._commit_lock = threading.Lock()
+
+    def batch(self, ops):
+        ops = list(ops)
+        if any(isinstance(op, PutOp) for op in ops):
+            # One durable commit at a time, as with a single WAL
+            with self._commit_lock:
+                self.commits += 1
+                time.sleep(self.commit_latency_s)
+                return super().batch(ops)
+        return super().batch(ops)
+
+
+def bench_write_behind(args):
+    """Claim-write throughput with one commit per put vs. write-behind grouped commits."""
+    report = {}
+    for label in ("direct", "write_behind"):
+        metrics.reset()
+        backend = _SlowCommitStore(0.0)
+        bootstrap_memory_store(backend)
+        backend.commit_latency_s = args.commit_latency
+        backend.commits = 0
+        store = WriteBehindStore(backend) if label == "write_behind" else backend
+        set_default_store(store)
+
+        def worker(thread_index):
+            read_your_writes = True
+            for i in range(args.claims):
+                created = add_new_claim.invoke({"customer_id": "u1", "policy_id": "p1", "amount": 100.0 + i})
+                status = get_claim_status.invoke({"claim_id": created["claim_id"]})
+                read_your_writes &= status.get("status") == "Processing"
+                update_claim_status.invoke({"claim_id": created["claim_id"], "new_status": "Approved"})
+            return read_your_writes
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            consistent = all(pool.map(worker, range(args.threads)))
+        elapsed = time.perf_counter() - start
+        if isinstance(store, WriteBehindStore):
+            store.close()
+        writes = args.threads * args.claims * 2
+        report[label] = {
+            "writes": writes,
+            "backend_commits": backend.commits,
+            "writes_per_second": round(writes / elapsed),
+            "read_your_writes": consistent,
+        }
+    print(json.dumps(report, indent=2))
+
+
+def bench_snapshot(args):
+    """Startup time: re-inserting every record and rebuilding the indexes vs. mapping a binary snapshot."""
+    statuses = ["Processing", "Approved", "Denied", "Closed", "Under Investigation"]
+    claims = [{
+        "policy_id": f"p{i % 5000}",
+        "user_id": f"u{i % 2000}",
+        "claim_type": "Vehicle Damage",
+        "claim_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "amount": float(100 + i % 9000),
+        "status": statuses[i % len(statuses)],
+        "description": f"Synthetic claim {i} for snapshot benchmarking",
+    } for i in range(args.claims)]
+
+    start = time.perf_counter()
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    for i, claim in enumerate(claims):
+        store.put(claims_namespace, f"s{i}", claim)
+    bootstrap_s = time.perf_counter() - start
+    start = time.perf_counter()
+    build_indexes(store)
+    index_build_s = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), "store.snap")
+    start = time.perf_counter()
+    write_snapshot(store, path)
+    write_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    snapshot = SnapshotStore(path)
+    open_s = time.perf_counter() - start
+    start = time.perf_counter()
+    build_indexes(snapshot)
+    index_load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    scanned = len(search_all(snapshot, claims_namespace))
+    scan_s = time.perf_counter() - start
+
+    keys = [f"s{random.randrange(args.claims)}" for _ in range(1000)]
+    start = time.perf_counter()
+    memory_items = [store.get(claims_namespace, key) for key in keys]
+    memory_get_us = (time.perf_counter() - start) / len(keys) * 1e6
+    start = time.perf_counter()
+    mapped_items = [snapshot.get(claims_namespace, key) for key in keys]
+    snapshot_get_us = (time.perf_counter() - start) / len(keys) * 1e6
+    mismatches = sum(mapped.value != memory.value for mapped, memory in zip(mapped_items, memory_items))
+
+    print(json.dumps({
+        "records": args.claims + 30,
+        "snapshot_bytes": os.path.getsize(path),
+        "bootstrap_ms": round(bootstrap_s * 1000, 1),
+        "snapshot_write_ms": round(write_s * 1000, 1),
+        "snapshot_open_ms": round(open_s * 1000, 3),
+        "index_build_ms": round(index_build_s * 1000, 1),
+        "index_load_ms": round(index_load_s * 1000, 1),
+        "snapshot_scan_ms": round(scan_s * 1000, 1),
+        "scanned_claims": scanned,
+        "in_memory_get_us": round(memory_get_us, 2),
+        "snapshot_get_us": round(snapshot_get_us, 2),
+        "mismatched_records": mismatches,
+    }, indent=2))
+
+
+def _scripted_worker_agent(store):
+    from langgraph.checkpoint.memory import InMemorySaver
+    return build_agent(model=ScriptedChatModel(), store=store, checkpointer=InMemorySaver())
+
+
+def bench_workers(args):
+    """Agent throughput with 1..N pre-forked worker processes (CPU-bound: scripted model, no fast path)."""
+    questions = [q for q in SAMPLE_QUESTIONS if not q.startswith("File")]
+    report = {"cpu_count": os.cpu_count()}
+    baseline = None
+    for workers in args.workers:
+        with WorkerPool(active_store, workers=workers, agent_factory=_scripted_worker_agent,
+                        threads_per_worker=2, use_fast_path=False) as pool:
+            # Warm every worker so startup cost is not measured
+            for session in range(workers * 4):
+                pool.ask(f"warm_{session}", questions[0])
+            metrics.reset()
+            start = time.perf_counter()
+            futures = [pool.submit(f"session_{i % args.sessions}", questions[i % len(questions)])
+                       for i in range(args.requests)]
+            responses = [f.result() for f in futures]
+            elapsed = time.perf_counter() - start
+        # Calls the parent's store server handled (workers read policies and claims from the mapped snapshot)
+        store_calls = {series.split("method=")[1].rstrip("}"): count
+                       for series, count in metrics.snapshot()["counters"].items()
+                       if series.startswith("workers.store_calls")}
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput
+        report[f"workers_{workers}"] = {
+            "requests_per_second": round(throughput, 1),
+            "speedup": round(throughput / baseline, 2),
+            "errors": sum("error" in r for r in responses),
+            "workers_used": len({r["worker"] for r in responses}),
+            "parent_store_calls_per_request": {method: round(count / args.requests, 2)
+                                               for method, count in store_calls.items()},
+        }
+    print(json.dumps(report, indent=2))
+
+
+def _synthetic_descriptions():
+    damage = ["water", "fire", "storm", "hail", "collision", "theft", "flood", "smoke", "wind", "vandalism"]
+    objects = ["roof", "kitchen", "basement", "windshield", "bumper", "garage", "fence", "engine", "window", "door"]
+    causes = ["burst pipe", "lightning strike", "hit and run", "fallen tree", "electrical fault",
+              "ice dam", "rear-end collision", "break-in", "overflowing drain", "grease fire"]
+    return damage, objects, causes
+
+
+def bench_claim_search(args):
+    """BM25 index query latency vs. scanning every claim description."""
+    damage, objects, causes = _synthetic_descriptions()
+    rng = random.Random(7)
+    claims = [(f"s{i}", {
+        "user_id": f"u{i % 5000}",
+        "claim_type": f"{rng.choice(damage).title()} Damage",
+        "description": f"{rng.choice(damage)} damage to {rng.choice(objects)} from {rng.choice(causes)}",
+    }) for i in range(args.claims)]
+
+    start = time.perf_counter()
+    index = ClaimSearchIndex()
+    index.add_many(claims)
+    build_s = time.perf_counter() - start
+
+    queries = ["water damage basement", "hail roof", "windshield", "kitchen grease fire", "theft garage break-in"]
+    index_ms, scan_ms = [], []
+    for query in queries:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits, total = index.search(query, limit=10)
+            index_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        terms = set(tokenize(query))
+        scanned = sum(1 for _, claim in claims
+                      if terms & set(tokenize(f"{claim['claim_type']} {claim['description']}")))
+        scan_ms.append((time.perf_counter() - start) * 1000)
+        logger.info(f"'{query}': {total} matches (scan found {scanned}), top hit {hits[0] if hits else None}")
+
+    index_ms.sort()
+    print(json.dumps({
+        "claims": args.claims,
+        "index_build_s": round(build_s, 2),
+        "index_query_ms_p50": round(index_ms[len(index_ms) // 2], 2),
+        "index_query_ms_p99": round(index_ms[int(len(index_ms) * 0.99)], 2),
+        "full_scan_ms_avg": round(sum(scan_ms) / len(scan_ms), 1),
+    }, indent=2))
+
+
+def bench_vector_search(args):
+    """IVF recall@k and latency vs. exact brute-force search over embedded claim descriptions."""
+    damage, objects, causes = _synthetic_descriptions()
+    rng = random.Random(11)
+    syllables = ["ka", "lo", "mi", "ren", "tor", "vel", "sha", "dun", "pir", "gol", "fen", "bri"]
+    places = ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(3000)]
+    texts = [f"{rng.choice(damage)} damage to {rng.choice(objects)} from {rng.choice(causes)} "
+             f"at {rng.choice(places)} near {rng.choice(places)}" for _ in range(args.claims)]
+
+    embeddings = HashingEmbeddings()
+    start = time.perf_counter()
+    vectors = embed_texts(embeddings, texts)
+    embed_s = time.perf_counter() - start
+    start = time.perf_counter()
+    index = IVFIndex(embeddings.dim)
+    index.add([f"s{i}" for i in range(len(texts))], vectors)
+    build_s = time.perf_counter() - start
+
+    query_rows = [rng.randrange(args.claims) for _ in range(args.queries)]
+    exact, exact_ms = [], []
+    for row in query_rows:
+        start = time.perf_counter()
+        exact.append({f"s{i}" for i in brute_force_search(vectors, vectors[row], args.k)})
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    report = {
+        "claims": args.claims,
+        "embed_s": round(embed_s, 2),
+        "index_build_s": round(build_s, 2),
+        "brute_force_ms_p50": round(sorted(exact_ms)[len(exact_ms) // 2], 3),
+    }
+    for probes in args.probes:
+        latencies, recalls = [], []
+        for row, truth in zip(query_rows, exact):
+            start = time.perf_counter()
+            hits = index.search(vectors[row], k=args.k, n_probe=probes)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(truth & {hit_id for hit_id, _ in hits}) / len(truth))
+        report[f"ivf_probe_{probes}"] = {
+            "recall_at_k": round(sum(recalls) / len(recalls), 3),
+            "latency_ms_p50": round(sorted(latencies)[len(latencies) // 2], 3),
+        }
+    print(json.dumps(report, indent=2))
+
+
+def bench_date_range(args):
+    """Sorted ordinal-date index range queries vs. scanning and comparing claim date strings."""
+    rng = random.Random(13)
+    first_day = to_ordinal("2015-01-01")
+    claim_dates = [(f"s{i}", date.fromordinal(first_day + rng.randrange(3650)).isoformat())
+                   for i in range(args.claims)]
+
+    start = time.perf_counter()
+    index = SortedDateIndex()
+    index.bulk_load([(claim_id, to_ordinal(claim_date)) for claim_id, claim_date in claim_dates])
+    build_s = time.perf_counter() - start
+
+    index_ms, scan_ms = [], []
+    for _ in range(args.queries):
+        low = first_day + rng.randrange(3650 - args.window_days)
+        start_date, end_date = date.fromordinal(low).isoformat(), date.fromordinal(low + args.window_days).isoformat()
+        start = time.perf_counter()
+        found = index.range(low, low + args.window_days)
+        index_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        scanned = [claim_id for claim_id, claim_date in claim_dates if start_date <= claim_date <= end_date]
+        scan_ms.append((time.perf_counter() - start) * 1000)
+        if len(found) != len(scanned):
+            logger.error(f"Index returned {len(found)} claims, scan found {len(scanned)}")
+
+    index_ms.sort()
+    print(json.dumps({
+        "claims": args.claims,
+        "window_days": args.window_days,
+        "avg_matches": round(args.claims * (args.window_days + 1) / 3650),
+        "index_build_s": round(build_s, 2),
+        "index_query_ms_p50": round(index_ms[len(index_ms) // 2], 3),
+        "index_query_ms_p99": round(index_ms[int(len(index_ms) * 0.99)], 3),
+        "full_scan_ms_avg": round(sum(scan_ms) / len(scan_ms), 1),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    router_parser = subparsers.add_parser("router", help="Tiered model routing vs. large model only")
+    router_parser.add_argument("--questions", type=int, default=200)
+    router_parser.add_argument("--small-latency", type=float, default=0.02)
+    router_parser.add_argument("--large-latency", type=float, default=0.2)
+    router_parser.set_defaults(func=bench_router)
+
+    resilience_parser = subparsers.add_parser("resilience", help="Retries, hedging and breaker vs. raw client")
+    resilience_parser.add_argument("--requests", type=int, default=200)
+    resilience_parser.add_argument("--concurrency", type=int, default=16)
+    resilience_parser.add_argument("--rpm", type=float, default=60000)
+    resilience_parser.add_argument("--latency", type=float, default=0.02)
+    resilience_parser.add_argument("--error-rate", type=float, default=0.2)
+    resilience_parser.add_argument("--slow-rate", type=float, default=0.05)
+    resilience_parser.add_argument("--slow-latency", type=float, default=1.0)
+    resilience_parser.set_defaults(func=bench_resilience)
+
+    http_parser = subparsers.add_parser("http", help="Shared pooled HTTP client vs. fresh connections")
+    http_parser.add_argument("--requests", type=int, default=500)
+    http_parser.add_argument("--concurrency", type=int, default=8)
+    http_parser.set_defaults(func=bench_http)
+
+    cas_parser = subparsers.add_parser("store-cas", help="Concurrent claim updates: lost-update stress test")
+    cas_parser.add_argument("--threads", type=int, default=16)
+    cas_parser.add_argument("--updates", type=int, default=500)
+    cas_parser.add_argument("--claims", type=int, default=3)
+    cas_parser.set_defaults(func=bench_store_cas)
+
+    wb_parser = subparsers.add_parser("write-behind", help="Claim-write throughput with grouped commits")
+    wb_parser.add_argument("--threads", type=int, default=16)
+    wb_parser.add_argument("--claims", type=int, default=100)
+    wb_parser.add_argument("--commit-latency", type=float, default=0.002)
+    wb_parser.set_defaults(func=bench_write_behind)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Warm start from an mmap snapshot vs. bootstrap")
+    snapshot_parser.add_argument("--claims", type=int, default=100000)
+    snapshot_parser.set_defaults(func=bench_snapshot)
+
+    workers_parser = subparsers.add_parser("workers", help="Throughput scaling with pre-forked worker processes")
+    workers_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    workers_parser.add_argument("--requests", type=int, default=400)
+    workers_parser.add_argument("--sessions", type=int, default=64)
+    workers_parser.set_defaults(func=bench_workers)
+
+    search_parser = subparsers.add_parser("claim-search", help="BM25 claim search vs. full description scan")
+    search_parser.add_argument("--claims", type=int, default=1000000)
+    search_parser.add_argument("--repeat", type=int, default=20)
+    search_parser.set_defaults(func=bench_claim_search)
+
+    vector_parser = subparsers.add_parser("vector-search", help="IVF similarity search recall/latency vs. brute force")
+    vector_parser.add_argument("--claims", type=int, default=200000)
+    vector_parser.add_argument("--queries", type=int, default=200)
+    vector_parser.add_argument("--k", type=int, default=10)
+    vector_parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16])
+    vector_parser.set_defaults(func=bench_vector_search)
+
+    date_parser = subparsers.add_parser("date-range", help="Sorted date index range queries vs. full scan")
+    date_parser.add_argument("--claims", type=int, default=1000000)
+    date_parser.add_argument("--queries", type=int, default=50)
+    date_parser.add_argument("--window-days", type=int, default=30)
+    date_parser.set_defaults(func=bench_date_range)
+
+    selection_parser = subparsers.add_parser("tool-selection", help="Per-turn tool subsets vs. binding every tool")
+    selection_parser.add_argument("--questions", type=int, default=200)
+    selection_parser.add_argument("--latency", type=float, default=0.0, help="Fixed model latency (s)")
+    selection_parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0,
+                                  help="Model latency per 1K prompt tokens (ms)")
+    selection_parser.set_defaults(func=bench_tool_selection)
+
+    roundtrip_parser = subparsers.add_parser("cassette-roundtrip", help="Record then replay with per-turn tool subsets")
+    roundtrip_parser.add_argument("--turns", type=int, default=60)
+    roundtrip_parser.set_defaults(func=bench_cassette_roundtrip)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,24 @@ Interactive Chat Interface for Insurance Agent
 Allows users to have a continuous conversation with the insurance agent.
 """
 
+import os
 import sys
 from langchain_core.messages import HumanMessage
-from agenets.simple_agent import agent
-from agenets.utils import get_logger
+
+# Add the agenets directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
+
+from simple_agent import agent, shutdown
+from fast_path import try_fast_path
+from resilience import CircuitOpenError, ResponseCache, is_retryable_error
+from profiling import choose_mode, profile_request
+from utils import get_logger
 
 logger = get_logger(__name__)
 
+# Recent answers, served when the LLM is unavailable
+response_cache = ResponseCache()
+
 
 def print_banner():
     """Print welcome banner."""
@@ -21,7 +32,9 @@ def print_banner():
     print("  • Policy information, coverage, and premiums")
     print("  • Claims status and history")
     print("  • Coverage calculations and deductible information")
-    print("\nType 'quit' or 'exit' to end the conversation.")
+    print("\nType '/login <customer ID>' to chat as a customer, '/logout' to stop.")
+    print("Type '/profile' (or '/profile cprofile') to profile the next question.")
+    print("Type 'quit' or 'exit' to end the conversation.")
     print("="*80 + "\n")
 
 
@@ -92,6 +105,8 @@ def run_chat_loop():
     print_banner()
     
     thread_id = 0  # Session ID for message threading
+    profile_next = None  # Profiling mode armed by /profile for the next question
+    customer_id = os.environ.get("CUSTOMER_ID")  # Logged-in customer, whose context goes into the prompt
     
     try:
         while True:
@@ -108,26 +123,70 @@ def run_chat_loop():
                 print("Please ask a question or type 'quit' to exit.\n")
                 continue
             
+            if user_question.lower().startswith("/profile"):
+                parts = user_question.split()
+                profile_next = choose_mode(parts[1] if len(parts) > 1 else "on")
+                if profile_next:
+                    print(f"\nThe next question will be profiled ({profile_next}).\n")
+                else:
+                    print("\nProfiling disarmed.\n")
+                continue
+            
+            if user_question.lower().startswith("/login"):
+                parts = user_question.split()
+                if len(parts) < 2:
+                    print("\nUsage: /login <customer ID>\n")
+                    continue
+                customer_id = parts[1]
+                print(f"\nLogged in as customer {customer_id}.\n")
+                continue
+            
+            if user_question.lower() == "/logout":
+                customer_id = None
+                print("\nLogged out.\n")
+                continue
+            
             logger.info(f"User question: {user_question}")
             
             try:
-                # Invoke agent with user question
                 print("\nAgent: ", end="", flush=True)
                 
-                result = agent.invoke(
-                    {"messages": [HumanMessage(content=user_question)]},
-                    config={"configurable": {"thread_id": f"chat_session_{thread_id}"}}
-                )
+                # Exact-form lookups are answered directly without the LLM
+                fast_answer = try_fast_path(user_question)
+                if fast_answer is not None:
+                    print(fast_answer)
+                    print()
+                    continue
+                
+                # Invoke agent with user question (profiled when armed or sampled)
+                mode, profile_next = choose_mode(profile_next), None
+                with profile_request(f"chat_session_{thread_id}", mode) as profile:
+                    result = agent.invoke(
+                        {"messages": [HumanMessage(content=user_question)]},
+                        config={"configurable": {"thread_id": f"chat_session_{thread_id}", "customer_id": customer_id}}
+                    )
                 
                 # Extract and print response
                 response = extract_response(result)
+                response_cache.put(user_question, response, scope=customer_id)
                 print(response)
+                if profile["path"]:
+                    print(f"(Profile written to {profile['path']})")
                 print()
                 
                 logger.info(f"Agent response sent successfully")
                 thread_id += 1
                 
             except Exception as e:
+                if isinstance(e, CircuitOpenError) or is_retryable_error(e):
+                    logger.warning(f"LLM unavailable, serving degraded answer: {str(e)}")
+                    cached = response_cache.get(user_question, scope=customer_id)
+                    if cached is not None:
+                        print(f"{cached}\n(The assistant is busy right now; this is a recent answer to the same question.)\n")
+                    else:
+                        print("\nSorry, I'm handling a lot of requests right now. "
+                              "Simple lookups like 'claim c2 status' still work; please try again shortly.\n")
+                    continue
                 logger.error(f"Error invoking agent: {str(e)}")
                 print(f"\nSorry, I encountered an error: {str(e)}")
                 print("Please try again.\n")
@@ -147,3 +206,6 @@ if __name__ == "__main__":
         logger.error(f"Fatal error: {str(e)}")
         print(f"Fatal error: {str(e)}")
         sys.exit(1)
+    finally:
+        # Flush batched store writes before exiting
+        shutdown()
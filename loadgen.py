@@ -0,0 +1,429 @@
+"""
+Closed-Loop Load Generator for the Insurance Agent
+Simulates N virtual customers holding multi-turn conversations: each user sends
+a question, waits for the answer, thinks, and asks the next one. Questions mix
+lookups, claim creation and claim status updates for the user's own policies
+and claims. The load steps through increasing user counts and reports
+throughput vs. latency per step, the saturation point, and (in-process) where
+the time goes per tool and per store operation.
+
+Targets:
+    inprocess   Agent in this process on the scripted model (--llm fake) or a recorded cassette (--llm replay)
+    http        A running serve.py (python serve.py --fake-llm, or with LLM_CASSETTE_MODE=replay)
+
+Usage:
+    python loadgen.py --users 1 2 4 8 16 32 --duration 30 --think-time 1
+    python loadgen.py --llm replay --cassette traffic.jsonl.gz --latency-scale 1 --users 4 8 16
+    python loadgen.py --target http --url http://localhost:8000 --users 8 16 32 64 --csv curve.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+# Load environment variables
+load_dotenv()
+
+# Add the agenets directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
+
+import metrics
+from inmemory_store import claim_info, commit_transaction, policy_info, user_info
+from langgraph.store.base import BaseStore, GetOp, ListNamespacesOp, PutOp, SearchOp
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+LOOKUP, CREATE, UPDATE = "lookup", "create", "update"
+DEFAULT_MIX = {LOOKUP: 0.7, CREATE: 0.15, UPDATE: 0.15}
+
+LOOKUP_TEMPLATES = [
+    "status of claim {claim}",
+    "policy {policy} details",
+    "premium for {policy}",
+    "contact info for {user}",
+    "What claims does customer {user} have?",
+    "Show me all the claims for customer {user} and explain how much coverage remains",
+]
+CREATE_TEMPLATE = "File a new claim for {user} on policy {policy} for {amount} dollars"
+UPDATE_TEMPLATE = "Update claim {claim} to {status}"
+UPDATE_STATUSES = ("Processing", "Under Investigation", "Approved", "Denied", "Closed")
+
+_OP_NAMES = {GetOp: "get", PutOp: "put", SearchOp: "search", ListNamespacesOp: "list_namespaces"}
+
+
+# ===========================
+# CONVERSATIONS
+# ===========================
+
+def _customers() -> List[Dict[str, Any]]:
+    """Bootstrapped customers with their policy and claim IDs (the same data serve.py starts with)."""
+    customers = []
+    for user in user_info:
+        policies = [p["policy_id"] for p in policy_info if p["user_id"] == user["user_id"]]
+        claims = [c["claim_id"] for c in claim_info if c["user_id"] == user["user_id"]]
+        if policies:
+            customers.append({"user": user["user_id"], "policies": policies, "claims": claims})
+    return customers
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'lookup=0.7,create=0.15,update=0.15' -> normalized weights."""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown question type '{name}'. Valid options: {', '.join(DEFAULT_MIX)}")
+        weights[name.strip()] = float(weight)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class SyntheticConversations:
+    """
+    Multi-turn conversations of a random customer about their own policies and claims.
+
+    Args:
+        mix: Weights of question types (lookup, create, update)
+        turns: (min, max) turns per conversation
+    """
+
+    def __init__(self, mix: Dict[str, float], turns: tuple = (2, 6)):
+        self.mix = mix
+        self.turns = turns
+        self.customers = _customers()
+
+    def __call__(self, rng: random.Random) -> Dict[str, Any]:
+        customer = rng.choice(self.customers)
+        questions = []
+        for _ in range(rng.randint(*self.turns)):
+            kind = rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            if kind == UPDATE and not customer["claims"]:
+                kind = LOOKUP
+            values = {
+                "user": customer["user"],
+                "policy": rng.choice(customer["policies"]),
+                "claim": rng.choice(customer["claims"]) if customer["claims"] else "c1",
+            }
+            if kind == CREATE:
+                question = CREATE_TEMPLATE.format(amount=rng.randrange(200, 20000, 50), **values)
+            elif kind == UPDATE:
+                question = UPDATE_TEMPLATE.format(status=rng.choice(UPDATE_STATUSES), **values)
+            else:
+                question = rng.choice(LOOKUP_TEMPLATES).format(**values)
+            questions.append((kind, question))
+        return {"customer_id": customer["user"], "questions": questions}
+
+
+class RecordedConversations:
+    """Conversations recorded in a cassette, replayed in random order (their prompts match the recording)."""
+
+    def __init__(self, cassette):
+        threads: Dict[str, List[str]] = defaultdict(list)
+        for turn in cassette.turns():
+            threads[turn["thread"]].append(turn["question"])
+        if not threads:
+            raise ValueError(f"Cassette {cassette.path} has no recorded turns")
+        self.conversations = list(threads.values())
+
+    def __call__(self, rng: random.Random) -> Dict[str, Any]:
+        return {"customer_id": None, "questions": [("recorded", q) for q in rng.choice(self.conversations)]}
+
+
+# ===========================
+# INSTRUMENTATION
+# ===========================
+
+class _TimedStore(BaseStore):
+    """BaseStore wrapper recording store.op_ms{op=...} for every batch and transaction commit."""
+
+    def __init__(self, backend: BaseStore):
+        self.backend = backend
+
+    @staticmethod
+    def _op_name(ops: List[Any]) -> str:
+        names = {_OP_NAMES.get(type(op), type(op).__name__) for op in ops}
+        return names.pop() if len(names) == 1 else "mixed"
+
+    def batch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        with metrics.timed("store.op_ms", op=self._op_name(ops)):
+            return self.backend.batch(ops)
+
+    async def abatch(self, ops: Iterable[Any]) -> List[Any]:
+        ops = list(ops)
+        with metrics.timed("store.op_ms", op=self._op_name(ops)):
+            return await self.backend.abatch(ops)
+
+    def commit_versioned(self, read_versions: Dict, writes: Dict) -> Dict:
+        # Committed against the backend, so the commit's own gets and puts are not counted twice
+        with metrics.timed("store.op_ms", op="commit"):
+            return commit_transaction(self.backend, read_versions, writes)
+
+
+class _ToolTimingCallback(BaseCallbackHandler):
+    """Records tool.latency_ms{tool=...} and tool errors for the agent's tool calls."""
+
+    def __init__(self):
+        self._started: Dict[Any, tuple] = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._started[run_id] = ((serialized or {}).get("name", "unknown"), time.perf_counter())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started:
+            metrics.observe("tool.latency_ms", (time.perf_counter() - started[1]) * 1000, tool=started[0])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started:
+            metrics.incr("tool.errors", tool=started[0])
+
+
+# ===========================
+# TARGETS
+# ===========================
+
+def inprocess_target(args) -> Callable[[str, str, Optional[str]], None]:
+    """Send a question to an agent in this process over an instrumented, freshly bootstrapped store."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from inmemory_store import bootstrap_memory_store
+    from insurance_tools import TOOLS, set_default_store
+    from model_router import LARGE_TIER, SMALL_TIER, ModelRouter, ModelTier
+    from simple_agent import build_agent
+    from tool_selection import ToolSelector, tool_selection_enabled
+
+    if args.llm == "replay":
+        from cassette import ReplayChatModel, get_cassette
+        cassette = get_cassette(args.cassette)
+
+        def model():
+            return ReplayChatModel(cassette=cassette, latency_scale=args.latency_scale)
+    else:
+        from fake_llm import ScriptedChatModel
+
+        def model():
+            return ScriptedChatModel(latency_s=args.model_latency,
+                                     prefill_s_per_1k_tokens=args.prefill_ms_per_1k / 1000)
+
+    backend = InMemoryStore()
+    bootstrap_memory_store(backend)
+    store = _TimedStore(backend)
+    set_default_store(store)
+    selector = ToolSelector(TOOLS) if tool_selection_enabled() else None
+    router = ModelRouter({SMALL_TIER: ModelTier(SMALL_TIER, model), LARGE_TIER: ModelTier(LARGE_TIER, model)},
+                         TOOLS, tool_selector=selector)
+    agent = build_agent(model=router, store=store, checkpointer=InMemorySaver())
+    callback = _ToolTimingCallback()
+
+    def send(session_id: str, question: str, customer_id: Optional[str]) -> None:
+        agent.invoke({"messages": [HumanMessage(content=question)]},
+                     config={"configurable": {"thread_id": session_id, "customer_id": customer_id},
+                             "callbacks": [callback]})
+    return send
+
+
+def http_target(args) -> Callable[[str, str, Optional[str]], None]:
+    """POST a question to a running serve.py."""
+    from http_client import get_http_client
+
+    client = get_http_client()
+    url = args.url.rstrip("/") + "/chat"
+
+    def send(session_id: str, question: str, customer_id: Optional[str]) -> None:
+        headers = {"X-Customer-ID": customer_id} if customer_id else {}
+        response = client.post(url, json={"session_id": session_id, "question": question},
+                               headers=headers, timeout=args.timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    return send
+
+
+# ===========================
+# LOAD STEPS
+# ===========================
+
+def _virtual_user(index: int, send, conversations, think_time_s: float, stop: threading.Event,
+                  measuring: threading.Event, seed: int) -> None:
+    rng = random.Random(seed * 1000 + index)
+    while not stop.is_set():
+        conversation = conversations(rng)
+        session_id = f"vu{index}-{uuid.uuid4().hex[:8]}"
+        for kind, question in conversation["questions"]:
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                send(session_id, question, conversation["customer_id"])
+                ok = True
+            except Exception as e:
+                ok = False
+                logger.warning(f"Virtual user {index} request failed: {str(e)}")
+            if measuring.is_set():
+                turn_ms = (time.perf_counter() - start) * 1000
+                # Unlabeled series for the overall percentiles, labeled one for the per-type breakdown
+                metrics.observe("loadgen.turn_ms", turn_ms)
+                metrics.observe("loadgen.turn_ms", turn_ms, kind=kind)
+                metrics.incr("loadgen.turns" if ok else "loadgen.errors", kind=kind)
+            if think_time_s:
+                # Exponential think time between turns (mean think_time_s)
+                stop.wait(rng.expovariate(1.0 / think_time_s))
+
+
+def run_step(users: int, send, conversations, duration_s: float, warmup_s: float,
+             think_time_s: float, seed: int = 7) -> Dict[str, Any]:
+    """
+    Run a number of virtual users for warmup_s + duration_s and measure the steady part.
+
+    Returns:
+        Throughput, latency percentiles, error rate and per-type, per-tool and per-store-op breakdowns
+    """
+    stop, measuring = threading.Event(), threading.Event()
+    threads = [threading.Thread(target=_virtual_user, name=f"vu-{i}", daemon=True,
+                                args=(i, send, conversations, think_time_s, stop, measuring, seed))
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup_s)
+    metrics.reset()
+    measuring.set()
+    start = time.perf_counter()
+    time.sleep(duration_s)
+    measuring.clear()
+    elapsed = time.perf_counter() - start
+    snap = metrics.snapshot()
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    counters, timings = snap["counters"], snap["timings"]
+    turns = sum(v for k, v in counters.items() if k.startswith("loadgen.turns"))
+    errors = sum(v for k, v in counters.items() if k.startswith("loadgen.errors"))
+    # Percentiles of all turns together (averaging per-type percentiles is not a percentile)
+    overall = timings.get("loadgen.turn_ms", {})
+    by_kind = {k[len("loadgen.turn_ms{kind="):-1]: v for k, v in timings.items() if k.startswith("loadgen.turn_ms{")}
+
+    def latency(field: str) -> float:
+        return round(overall.get(field, 0.0), 2)
+
+    def breakdown(prefix: str, label: str) -> Dict[str, Any]:
+        rows = {k[len(prefix) + len(label) + 2:-1]: v for k, v in timings.items() if k.startswith(prefix + "{")}
+        return {name: {"count": v["count"], "avg_ms": v["avg"], "p95_ms": v["p95"],
+                       "ms_per_turn": round(v["sum"] / turns, 3) if turns else 0.0}
+                for name, v in sorted(rows.items(), key=lambda kv: -kv[1]["sum"])}
+
+    return {
+        "users": users,
+        "throughput_rps": round(turns / elapsed, 2),
+        "latency_ms_avg": latency("avg"),
+        "latency_ms_p50": latency("p50"),
+        "latency_ms_p95": latency("p95"),
+        "latency_ms_p99": latency("p99"),
+        "error_rate": round(errors / (turns + errors), 4) if turns + errors else 0.0,
+        "by_type": {kind: {"count": v["count"], "avg_ms": v["avg"], "p95_ms": v["p95"]} for kind, v in by_kind.items()},
+        "tools": breakdown("tool.latency_ms", "tool"),
+        "store_ops": breakdown("store.op_ms", "op"),
+    }
+
+
+def find_saturation(steps: List[Dict[str, Any]], min_gain: float = 0.1) -> Dict[str, Any]:
+    """
+    The saturation point: the last user count whose next step raised throughput by less than min_gain.
+
+    Beyond it, added users only queue: latency grows while throughput stays flat.
+    """
+    best = max(steps, key=lambda step: step["throughput_rps"])
+    for current, following in zip(steps, steps[1:]):
+        if following["throughput_rps"] < current["throughput_rps"] * (1 + min_gain):
+            return {"saturated": True, "users": current["users"], "throughput_rps": current["throughput_rps"],
+                    "latency_ms_p95": current["latency_ms_p95"], "max_throughput_rps": best["throughput_rps"]}
+    last = steps[-1]
+    return {"saturated": False, "users": last["users"], "throughput_rps": last["throughput_rps"],
+            "latency_ms_p95": last["latency_ms_p95"], "max_throughput_rps": best["throughput_rps"]}
+
+
+def print_curve(steps: List[Dict[str, Any]], saturation: Dict[str, Any]) -> None:
+    print(f"\n{'users':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for step in steps:
+        marker = "  <- saturation" if saturation["saturated"] and step["users"] == saturation["users"] else ""
+        print(f"{step['users']:>6} {step['throughput_rps']:>8.2f} {step['latency_ms_p50']:>9.1f} "
+              f"{step['latency_ms_p95']:>9.1f} {step['latency_ms_p99']:>9.1f} {step['error_rate']:>7.2%}{marker}")
+    if not saturation["saturated"]:
+        print(f"Not saturated at {saturation['users']} users; add larger steps.")
+    print()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Closed-loop load test of the insurance agent")
+    parser.add_argument("--target", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="serve.py address (http target)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="HTTP request timeout (s)")
+    parser.add_argument("--llm", choices=["fake", "replay"], default="fake", help="Model for the inprocess target")
+    parser.add_argument("--cassette", help="Recorded cassette (--llm replay)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Replayed share of recorded latency")
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Scripted model latency per call (s)")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=20.0, help="Scripted model latency per 1K prompt tokens")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Virtual users per step")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before each step")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean think time between turns (s)")
+    parser.add_argument("--turns", type=int, nargs=2, default=[2, 6], metavar=("MIN", "MAX"),
+                        help="Turns per conversation")
+    parser.add_argument("--mix", default="lookup=0.7,create=0.15,update=0.15", help="Question type weights")
+    parser.add_argument("--csv", help="Write the throughput/latency curve to this CSV file")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    args = parser.parse_args()
+    if args.llm == "replay" and not args.cassette:
+        parser.error("--llm replay needs --cassette")
+    return args
+
+
+def main():
+    args = parse_args()
+    send = http_target(args) if args.target == "http" else inprocess_target(args)
+    if args.target == "inprocess" and args.llm == "replay":
+        from cassette import get_cassette
+        conversations = RecordedConversations(get_cassette(args.cassette))
+    else:
+        conversations = SyntheticConversations(parse_mix(args.mix), tuple(args.turns))
+
+    steps = []
+    for users in sorted(args.users):
+        logger.info(f"Load step: {users} virtual users for {args.duration:.0f}s")
+        step = run_step(users, send, conversations, args.duration, args.warmup, args.think_time)
+        steps.append(step)
+        logger.info(f"{users} users: {step['throughput_rps']} req/s, p95 {step['latency_ms_p95']} ms")
+    saturation = find_saturation(steps)
+    report = {"target": args.target, "llm": args.llm if args.target == "inprocess" else "server",
+              "think_time_s": args.think_time, "steps": steps, "saturation": saturation}
+
+    print_curve(steps, saturation)
+    print(json.dumps(report, indent=2))
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["users", "throughput_rps", "latency_ms_p50", "latency_ms_p95", "latency_ms_p99", "error_rate"])
+            for step in steps:
+                writer.writerow([step["users"], step["throughput_rps"], step["latency_ms_p50"],
+                                 step["latency_ms_p95"], step["latency_ms_p99"], step["error_rate"]])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
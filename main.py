@@ -1,12 +1,22 @@
 """
 Insurance Agent Test Script
 Tests the insurance agent with 3 sample questions covering customer info, claims, and policies.
+
+Batch mode runs a JSONL file of questions concurrently and streams JSONL results:
+    python main.py --batch questions.jsonl --output results.jsonl --workers 8 --rate 4
+Each input line needs an "id" (or "request_id") and a "question" (or "title"/"body").
+Re-running with the same output file resumes after the last completed question.
 """
 
+import argparse
+import json
 import os
 import sys
+import time
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import RunnableLambda
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +25,9 @@ load_dotenv()
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
 
 try:
-    from simple_agent import agent, active_store
+    from simple_agent import agent, active_store, build_agent, shutdown
+    from fake_llm import ScriptedChatModel
+    from fast_path import try_fast_path
     from utils import get_logger
     from inmemory_store import bootstrap_memory_store
 except ImportError as e:
@@ -94,11 +106,169 @@ def test_agent():
     logger.info(f"{'=' * 80}\n")
 
 
+def load_batch_questions(path: str) -> list:
+    """
+    Read batch questions from a JSONL file.
+    
+    Args:
+        path: JSONL file with one question object per line
+    
+    Returns:
+        List of {"id", "question"} dictionaries
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or "\n\n".join(
+                part for part in (record.get("title"), record.get("body")) if part
+            )
+            if not question:
+                logger.warning(f"Skipping line {line_number}: no question text")
+                continue
+            question_id = str(record.get("id") or record.get("request_id") or line_number)
+            questions.append({"id": question_id, "question": question})
+    return questions
+
+
+def load_completed_ids(path: str) -> set:
+    """
+    Return the IDs already answered successfully in an existing results file.
+    
+    A partially written last line from a crash is truncated away, so the next
+    append starts on a fresh line; that item is re-run.
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            logger.warning(f"Truncated a partially written last line in {path}")
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record and record.get("id") is not None:
+                completed.add(record["id"])
+    return completed
+
+
+def _token_usage(messages) -> dict:
+    """Sum the token usage reported on all AI messages of a run."""
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    for message in messages:
+        if isinstance(message, AIMessage) and message.usage_metadata:
+            for key in usage:
+                usage[key] += message.usage_metadata.get(key, 0)
+    return usage
+
+
+def run_batch(input_path: str, output_path: str, workers: int = 4, rate: float = 0.0,
+              batch_agent=None, use_fast_path: bool = False) -> dict:
+    """
+    Run a JSONL file of questions through the agent concurrently.
+    
+    Args:
+        input_path: JSONL questions file
+        output_path: JSONL results file (appended to, one line per completed question)
+        workers: Maximum number of concurrent agent runs
+        rate: Maximum agent runs started per second (0 for unlimited)
+        batch_agent: Agent to use (defaults to the configured agent)
+        use_fast_path: Answer exact-form lookups without the agent
+    
+    Returns:
+        Summary with counts and wall time
+    """
+    batch_agent = batch_agent or agent
+    questions = load_batch_questions(input_path)
+    completed = load_completed_ids(output_path)
+    pending = [q for q in questions if q["id"] not in completed]
+    logger.info(f"Batch: {len(questions)} questions, {len(completed)} already done, {len(pending)} to run "
+                f"with {workers} workers")
+    
+    limiter = InMemoryRateLimiter(requests_per_second=rate, max_bucket_size=max(1, workers)) if rate > 0 else None
+    
+    def run_one(item: dict) -> dict:
+        if limiter:
+            limiter.acquire()
+        start = time.perf_counter()
+        record = {"id": item["id"], "question": item["question"]}
+        try:
+            answer = try_fast_path(item["question"]) if use_fast_path else None
+            if answer is not None:
+                record.update(answer=answer, route="fast_path", usage=_token_usage([]))
+            else:
+                result = batch_agent.invoke(
+                    {"messages": [HumanMessage(content=item["question"])]},
+                    config={"configurable": {"thread_id": f"batch_{item['id']}"}}
+                )
+                messages = result.get("messages", [])
+                record.update(
+                    answer=messages[-1].content if messages else "",
+                    route="agent",
+                    tool_calls=[c["name"] for m in messages if isinstance(m, AIMessage) for c in m.tool_calls],
+                    usage=_token_usage(messages),
+                )
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+    
+    succeeded = failed = 0
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        runner = RunnableLambda(run_one)
+        for _, record in runner.batch_as_completed(pending, config={"max_concurrency": workers}):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if "error" in record:
+                failed += 1
+                logger.error(f"❌ {record['id']} failed: {record['error']}")
+            else:
+                succeeded += 1
+    
+    summary = {
+        "total": len(questions),
+        "skipped": len(questions) - len(pending),
+        "succeeded": succeeded,
+        "failed": failed,
+        "wall_seconds": round(time.perf_counter() - start, 2),
+    }
+    logger.info(f"Batch completed: {summary}")
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Insurance agent test harness and batch runner")
+    parser.add_argument("--batch", metavar="QUESTIONS_JSONL", help="Run questions from a JSONL file")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file (resumable)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent agent runs")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max agent runs started per second (0 = unlimited)")
+    parser.add_argument("--fast-path", action="store_true", help="Answer exact-form lookups without the LLM")
+    parser.add_argument("--fake-llm", action="store_true", help="Use the offline scripted model instead of OpenAI")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        test_agent()
+        if args.batch:
+            batch_agent = build_agent(model=ScriptedChatModel()) if args.fake_llm else agent
+            run_batch(args.batch, args.output, workers=args.workers, rate=args.rate,
+                      batch_agent=batch_agent, use_fast_path=args.fast_path)
+        else:
+            test_agent()
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        shutdown()
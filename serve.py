@@ -0,0 +1,152 @@
+"""
+HTTP Front-End for the Insurance Agent
+Serves the agent from a pre-forked pool of worker processes that share one store.
+Requests are routed by session ID so each conversation stays on one worker.
+
+Usage:
+    python serve.py --port 8000 --workers 4
+    curl -X POST localhost:8000/chat -d '{"session_id": "alice", "question": "status of claim c2"}'
+    curl -X POST localhost:8000/chat -H 'X-Profile: sampling' -d '{"question": "claims for u2"}'   # profiled
+    curl -X POST localhost:8000/chat -H 'X-Customer-ID: u2' -d '{"session_id": "bob", "question": "any open claims?"}'
+    curl localhost:8000/memory   # bytes per store namespace (parent), plus each worker's indexes, caches and sessions
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Add the agenets directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
+
+# Nothing imported here starts a thread; simple_agent is imported once the worker zygote is running
+from insurance_agent import build_agent
+from worker_pool import WorkerPool, WorkerZygote, default_agent_factory
+from memory_report import memory_report
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def fake_agent_factory(store):
+    """Worker agent backed by the offline scripted model (no API key needed)."""
+    from fake_llm import ScriptedChatModel
+    from langgraph.checkpoint.memory import InMemorySaver
+    return build_agent(model=ScriptedChatModel(), store=store, checkpointer=InMemorySaver())
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    pool: WorkerPool = None
+    store = None
+    request_timeout_s: float = 120.0
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "workers": self.pool.workers})
+        elif self.path == "/memory":
+            self._send_json(200, self._memory())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _memory(self) -> dict:
+        """The store-owning process's report combined with every worker's."""
+        store_report = memory_report(self.store)
+        workers = self.pool.memory_reports(timeout=self.request_timeout_s)
+        reports = [store_report] + [report for report in workers if "error" not in report]
+        return {
+            "accounted_bytes": sum(report["accounted_bytes"] for report in reports),
+            "rss_bytes": sum(report["rss_bytes"] or 0 for report in reports),
+            "sessions": sum(report["sessions"]["sessions"] for report in reports),
+            "store_process": store_report,
+            "workers": workers,
+        }
+
+    def do_POST(self):
+        if self.path != "/chat":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Request body must be JSON"})
+            return
+        question = str(body.get("question", "")).strip()
+        if not question:
+            self._send_json(400, {"error": "Missing 'question'"})
+            return
+        session_id = body.get("session_id") or self.headers.get("X-Session-ID") or uuid.uuid4().hex
+        profile = self.headers.get("X-Profile") or body.get("profile")
+        # Authenticated customer, set only by the auth proxy in front of this server (never taken from the body)
+        customer_id = self.headers.get("X-Customer-ID") or None
+        try:
+            response = self.pool.ask(str(session_id), question, timeout=self.request_timeout_s,
+                                     profile=profile, customer_id=customer_id)
+        except Exception as e:
+            logger.error(f"Request for session {session_id} failed: {str(e)}")
+            self._send_json(503, {"error": str(e), "session_id": session_id})
+            return
+        if "error" not in response:
+            self._send_json(200, response)
+        elif response.get("retryable"):
+            # The LLM is unavailable and there is no fast-path or cached answer to fall back on
+            self._send_json(503, response)
+        else:
+            self._send_json(500, response)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the insurance agent over HTTP from worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=8, help="Concurrent requests per worker")
+    parser.add_argument("--fake-llm", action="store_true", help="Use the offline scripted model")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Fork the zygote before simple_agent wires the store, which can start threads (write-behind flusher,
+    # shard clients), and before the HTTP server; workers forked from it inherit no held locks
+    zygote = WorkerZygote().start()
+    from simple_agent import active_store, shutdown
+    pool = WorkerPool(active_store, workers=args.workers,
+                      agent_factory=fake_agent_factory if args.fake_llm else default_agent_factory,
+                      threads_per_worker=args.threads_per_worker, zygote=zygote).start()
+    ChatHandler.pool = pool
+    ChatHandler.store = active_store
+    httpd = ThreadingHTTPServer((args.host, args.port), ChatHandler)
+    httpd.daemon_threads = True
+    logger.info(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        pool.close()
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,17 @@ Google Places API - Nearby Search Test
 Searches for restaurants near a specified location using Google Places API.
 """
 
-import requests
 import json
 import os
+import sys
+import httpx
 from dotenv import load_dotenv
 
+# Add the agenets directory to the path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agenets'))
+
+from http_client import connection_stats, get_http_client
+
 # Load environment variables
 load_dotenv()
 
@@ -55,7 +61,7 @@ print(f"\n" + "="*80 + "\n")
 try:
     # Make the POST request
     print("Sending request to Google Places API...")
-    response = requests.post(url, json=payload, headers=headers)
+    response = get_http_client().post(url, json=payload, headers=headers)
     
     # Check if request was successful
     if response.status_code == 200:
@@ -90,11 +96,12 @@ try:
         print(f"❌ Error: HTTP {response.status_code}")
         print(f"Response: {response.text}\n")
         
-except requests.exceptions.RequestException as e:
+except httpx.HTTPError as e:
     print(f"❌ Request failed: {str(e)}")
 except json.JSONDecodeError as e:
     print(f"❌ Failed to parse response: {str(e)}")
 except Exception as e:
     print(f"❌ Unexpected error: {str(e)}")
 
+print(f"\nConnection stats: {connection_stats(url)}")
 print("\n" + "="*80)
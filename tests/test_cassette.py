@@ -0,0 +1,79 @@
+"""Cassettes recorded by a process that exits, is killed or runs beside another recorder replay in full."""
+
+import os
+import subprocess
+import sys
+
+from langchain_core.messages import HumanMessage
+
+import cassette
+from cassette import Cassette, ReplayChatModel, cassette_files, get_cassette
+
+AGENETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "agenets")
+
+RECORD = """
+import os, sys
+sys.path.insert(0, {agenets!r})
+from langchain_core.messages import HumanMessage
+from cassette import RecordingChatModel, get_cassette
+from fake_llm import ScriptedChatModel
+
+model = RecordingChatModel(inner=ScriptedChatModel(), cassette=get_cassette({path!r}))
+for question in {questions!r}:
+    model.invoke([HumanMessage(content=question)])
+if {kill!r}:
+    os._exit(0)
+"""
+
+
+def _record(path, questions, kill=False):
+    script = RECORD.format(agenets=AGENETS, path=str(path), questions=questions, kill=kill)
+    subprocess.run([sys.executable, "-c", script], check=True, timeout=120)
+
+
+def _replay(path, question):
+    """The replayed response to a question and the one recorded for it."""
+    recording = get_cassette(str(path))
+    response = ReplayChatModel(cassette=recording).invoke([HumanMessage(content=question)])
+    recorded = next(entry["response"]["data"] for entry in recording.entries if entry["question"] == question)
+    return (response.content, response.tool_calls), (recorded["content"], recorded["tool_calls"])
+
+
+def _fresh(monkeypatch):
+    monkeypatch.setattr(cassette, "_cassettes", {})
+
+
+def test_recording_replays_after_exit_and_kill(tmp_path, monkeypatch):
+    path = tmp_path / "traffic.jsonl.gz"
+    _record(path, ["status of claim c1", "policies of u1"])
+    _record(path, ["claims of u2"], kill=True)
+    _fresh(monkeypatch)
+    assert len(get_cassette(str(path)).entries) == 3
+    replayed, recorded = _replay(path, "claims of u2")
+    assert replayed == recorded and recorded[1]
+
+
+def test_cut_off_entry_is_dropped_and_recording_continues(tmp_path, monkeypatch):
+    path = tmp_path / "traffic.jsonl.gz"
+    _record(path, ["status of claim c1", "policies of u1"])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+    assert [entry["question"] for entry in Cassette(str(path)).entries] == ["status of claim c1"]
+    _record(path, ["claims of u2"])
+    assert [entry["question"] for entry in Cassette(str(path)).entries] == ["status of claim c1", "claims of u2"]
+
+
+def test_concurrent_recorders_write_separate_files(tmp_path, monkeypatch):
+    path = tmp_path / "traffic.jsonl.gz"
+    _record(path, ["status of claim c1"])
+    recorder = Cassette(str(path))
+    recorder.record(dict(recorder.entries[0], question="parent question"))
+    # The parent holds the cassette, so the child records to its own file
+    _record(path, ["claims of u2"])
+    recorder.close()
+    assert len(cassette_files(str(path))) == 2
+    _fresh(monkeypatch)
+    questions = [turn["question"] for turn in get_cassette(str(path)).turns()]
+    assert questions == ["status of claim c1", "parent question", "claims of u2"]
+    replayed, recorded = _replay(path, "claims of u2")
+    assert replayed == recorded
@@ -0,0 +1,94 @@
+"""Change log ordering and replay (change-data-capture)."""
+
+import threading
+
+from langgraph.store.memory import InMemoryStore
+
+from change_log import ChangeCapturingStore, ChangeLog
+from inmemory_store import (VERSION_FIELD, bootstrap_memory_store, claims_namespace, policies_namespace,
+                            run_transaction, search_all)
+from write_behind_store import WriteBehindStore
+
+
+def _replay(log: ChangeLog) -> InMemoryStore:
+    store = InMemoryStore()
+    for event in log.read(0):
+        store.put(tuple(event["namespace"]), event["key"], event["value"])
+    return store
+
+
+def test_concurrent_commits_reach_the_log_in_commit_order():
+    log = ChangeLog()
+    store = ChangeCapturingStore(InMemoryStore(), log)
+    bootstrap_memory_store(store)
+    statuses = ["Processing", "Approved", "Under Investigation", "Denied"]
+
+    def writer(thread_index):
+        for i in range(200):
+            def update(tx):
+                claim = tx.get(claims_namespace, "c2")
+                claim["status"] = statuses[(thread_index + i) % len(statuses)]
+                tx.put(claims_namespace, "c2", claim)
+            run_transaction(store, update, max_attempts=10000)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    versions = [event["value"][VERSION_FIELD] for event in log.read(0)
+                if event["key"] == "c2" and VERSION_FIELD in event["value"]]
+    assert versions == list(range(1, 8 * 200 + 1))
+    assert _replay(log).get(claims_namespace, "c2").value == store.get(claims_namespace, "c2").value
+
+
+def test_replay_from_offset_zero_rebuilds_claims_and_policies():
+    log = ChangeLog()
+    store = ChangeCapturingStore(InMemoryStore(), log)
+    bootstrap_memory_store(store)
+    run_transaction(store, lambda tx: tx.put(claims_namespace, "c1", {**tx.get(claims_namespace, "c1"),
+                                                                      "status": "Closed"}))
+
+    replayed = _replay(log)
+    for namespace in (claims_namespace, policies_namespace):
+        expected = {item.key: item.value for item in search_all(store, namespace)}
+        assert {item.key: item.value for item in search_all(replayed, namespace)} == expected
+
+
+def test_write_behind_captures_the_latest_write_per_flushed_batch():
+    log = ChangeLog()
+    store = WriteBehindStore(ChangeCapturingStore(InMemoryStore(), log), max_batch=1000, max_delay_s=0.5)
+    for amount in range(5):
+        store.put(claims_namespace, "c99", {"user_id": "u1", "amount": amount})
+    store.flush()
+    store.close()
+
+    events = [event for event in log.read(0) if event["key"] == "c99"]
+    assert [event["value"]["amount"] for event in events] == [4]
+
+
+def test_subscribers_receive_events_in_offset_order():
+    import asyncio
+
+    log = ChangeLog()
+
+    async def consume():
+        received = []
+        async for event in log.subscribe(from_offset=0):
+            received.append(event["offset"])
+            if len(received) == 400:
+                return received
+
+    async def main():
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        threads = [threading.Thread(target=lambda i=i: [log.append(claims_namespace, f"k{i}-{n}", {"n": n})
+                                                        for n in range(100)]) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return await asyncio.wait_for(consumer, timeout=10)
+
+    assert asyncio.run(main()) == list(range(400))
@@ -0,0 +1,84 @@
+"""Claim search index stays bounded and current under repeated claim updates."""
+
+from langgraph.store.memory import InMemoryStore
+
+from change_log import ChangeCapturingStore, ChangeLog
+from claim_search import ClaimSearchIndex, get_claim_index
+from inmemory_store import bootstrap_memory_store, claims_namespace, run_transaction
+from insurance_tools import add_new_claim, set_default_store, update_claim_status
+
+
+def _logged_store():
+    store = ChangeCapturingStore(InMemoryStore(), ChangeLog())
+    bootstrap_memory_store(store)
+    return store
+
+
+def _set_description(store, claim_id, description):
+    def update(tx):
+        claim = tx.get(claims_namespace, claim_id)
+        claim["description"] = description
+        tx.put(claims_namespace, claim_id, claim)
+    run_transaction(store, update)
+
+
+def test_status_updates_do_not_grow_the_index():
+    store = _logged_store()
+    set_default_store(store)
+    statuses = ["Approved", "Processing"]
+    for i in range(5000):
+        update_claim_status.invoke({"claim_id": "c2", "new_status": statuses[i % 2]})
+        if i % 500 == 0:
+            get_claim_index(store)
+
+    index = get_claim_index(store)
+    assert len(index) == 10 and len(index._claim_ids) == 10
+
+
+def test_new_claim_is_indexed_once():
+    store = _logged_store()
+    set_default_store(store)
+    get_claim_index(store)
+    created = add_new_claim.invoke({"customer_id": "u1", "policy_id": "p1", "amount": 300.0,
+                                    "description": "Cracked tooth repaired at the dentist"})
+
+    index = get_claim_index(store)
+    assert len(index._claim_ids) == 11
+    assert index.search("cracked tooth")[0][0][0] == created["claim_id"]
+
+
+def test_description_changes_are_compacted():
+    store = _logged_store()
+    get_claim_index(store)
+    for i in range(2000):
+        _set_description(store, "c2", f"Collision damage revision {i} hit and run")
+        if i % 100 == 0:
+            get_claim_index(store)
+
+    index = get_claim_index(store)
+    # Dead entries never exceed the compaction threshold share of all entries
+    assert len(index._claim_ids) <= 10 / (1 - index.compact_fraction) + 1
+    hits, total = index.search("revision 1999")
+    assert total == 1 and hits[0][0] == "c2"
+
+
+def test_compaction_keeps_rankings():
+    def claim(i, rewritten):
+        if rewritten and i % 2 == 0:
+            return {"claim_type": "Fire", "description": f"kitchen {i}", "user_id": f"u{i % 3}"}
+        return {"claim_type": "Water Damage" if i % 2 else "Fire", "description": f"pipe {i}", "user_id": f"u{i % 3}"}
+
+    index = ClaimSearchIndex(compact_fraction=0.2)
+    for i in range(50):
+        index.add(f"c{i}", claim(i, False))
+    for i in range(0, 50, 2):
+        index.add(f"c{i}", claim(i, True))
+    fresh = ClaimSearchIndex()
+    fresh.add_many((f"c{i}", claim(i, True)) for i in range(50))
+
+    assert len(index._claim_ids) < 75
+    for query, customer in (("water damage pipe", None), ("kitchen fire", "u1"), ("water", "u2")):
+        hits, total = index.search(query, limit=50, customer_id=customer)
+        fresh_hits, fresh_total = fresh.search(query, limit=50, customer_id=customer)
+        assert total == fresh_total
+        assert [claim_id for claim_id, _ in hits] == [claim_id for claim_id, _ in fresh_hits]
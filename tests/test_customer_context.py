@@ -0,0 +1,33 @@
+"""An invalidation during a render keeps the rendered context out of the cache."""
+
+import threading
+
+import customer_context
+from customer_context import CustomerContextCache
+
+
+def test_invalidation_mid_render_is_not_lost(monkeypatch):
+    renders = []
+    rendering, finish = threading.Event(), threading.Event()
+
+    def render(store, customer_id):
+        renders.append(customer_id)
+        if len(renders) == 1:
+            rendering.set()
+            finish.wait()
+        return f"{customer_id} render {len(renders)}"
+
+    monkeypatch.setattr(customer_context, "render_customer_context", render)
+    cache, store = CustomerContextCache(), object()
+    first = []
+    thread = threading.Thread(target=lambda: first.append(cache.get(store, "u2")))
+    thread.start()
+    rendering.wait()
+    cache.invalidate("u2")
+    finish.set()
+    thread.join()
+
+    assert first == ["u2 render 1"]
+    assert cache.get(store, "u2") == "u2 render 2"
+    assert cache.get(store, "u2") == "u2 render 2" and len(renders) == 2
+    assert not cache._loading and not cache._generations
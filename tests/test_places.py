@@ -0,0 +1,65 @@
+"""Provider searches against the local Places stand-in, the geohash cache and its snapshot."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import metrics
+import places
+from fake_servers import FakePlacesServer
+from places import find_providers_near_address
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    with FakePlacesServer() as fake:
+        monkeypatch.setenv("GOOGLE_GEOCODE_URL", fake.geocode_url)
+        monkeypatch.setenv("PLACES_API_URL", fake.places_url)
+        monkeypatch.setenv("PLACES_CACHE_PATH", str(tmp_path / "places.json"))
+        monkeypatch.delenv("PLACES_OFFLINE", raising=False)
+        monkeypatch.setattr(places, "_cache", None)
+        yield fake
+
+
+def test_search_goes_through_the_server_once(server):
+    metrics.reset()
+    first = find_providers_near_address("12 Elm Street, Springfield", "repair_shop")
+    assert len(first["providers"]) == 5 and first["providers"][0]["name"] == "Car Repair #1"
+    assert server.request_count == 2
+
+    assert find_providers_near_address("12 elm street, springfield ", "repair_shop") == first
+    assert server.request_count == 2
+    assert metrics.snapshot()["counters"]["places.cache_hits"] == 1
+
+
+def test_snapshot_reloads_and_serves_offline(server, monkeypatch):
+    first = find_providers_near_address("12 Elm Street, Springfield", "clinic")
+    monkeypatch.setattr(places, "_cache", None)
+    monkeypatch.setenv("PLACES_OFFLINE", "1")
+    assert find_providers_near_address("12 Elm Street, Springfield", "clinic") == first
+    with pytest.raises(LookupError):
+        find_providers_near_address("99 Unknown Road", "clinic")
+    with pytest.raises(LookupError):
+        find_providers_near_address("12 Elm Street, Springfield", "dentist")
+    assert server.request_count == 2
+
+
+def test_geocode_is_saved_when_the_search_fails(server, monkeypatch):
+    monkeypatch.setenv("PLACES_API_URL", server.url + "/missing")
+    with pytest.raises(httpx.HTTPStatusError):
+        find_providers_near_address("12 Elm Street, Springfield", "clinic")
+    with open(places.get_provider_cache().snapshot_path) as f:
+        assert list(json.load(f)["geocodes"]) == ["12 elm street, springfield"]
+
+
+def test_concurrent_misses_all_succeed_and_are_saved(server):
+    addresses = [f"{i} Oak Avenue, Shelbyville" for i in range(40)]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda address: find_providers_near_address(address, "pharmacy"), addresses))
+    assert all(len(result["providers"]) == 5 for result in results)
+    with open(places.get_provider_cache().snapshot_path) as f:
+        snapshot = json.load(f)
+    assert len(snapshot["geocodes"]) == 40
+    assert len(snapshot["results"]) == len({result["geohash"] for result in results})
@@ -0,0 +1,28 @@
+"""Tools read the records a question mentions from the prefetch."""
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.store.memory import InMemoryStore
+
+import metrics
+from inmemory_store import bootstrap_memory_store, claims_namespace, policies_namespace, search_all, user_namespace
+from prefetch import cached_get, cached_search, start_prefetch
+
+
+def test_mentioned_customer_is_served_from_the_prefetch():
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    metrics.reset()
+    assert start_prefetch(store, "t1", "What claims does u2 have?") == 3
+
+    def tool(_):
+        return (cached_get(store, user_namespace, "u2"),
+                cached_search(store, policies_namespace, {"user_id": "u2"}),
+                cached_search(store, claims_namespace, {"user_id": "u2"}))
+
+    customer, policies, claims = RunnableLambda(tool).invoke(None, config={"configurable": {"thread_id": "t1"}})
+    assert customer.value == store.get(user_namespace, "u2").value
+    assert claims and claims == search_all(store, claims_namespace, filter={"user_id": "u2"})
+    assert policies == search_all(store, policies_namespace, filter={"user_id": "u2"})
+    hits = metrics.snapshot()["counters"]
+    assert [hits.get(f"prefetch.hits{{namespace={namespace}}}") for namespace in ("users", "policies", "claims")] \
+        == [1, 1, 1]
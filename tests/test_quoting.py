@@ -0,0 +1,24 @@
+"""Renewal quotes keep the policy's own deductible."""
+
+from langgraph.store.memory import InMemoryStore
+
+from inmemory_store import bootstrap_memory_store
+from insurance_tools import quote_policy_renewal, set_default_store
+from quoting import DEDUCTIBLES, quote_policies, type_codes
+
+
+def test_renewal_keeps_the_policy_deductible():
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    set_default_store(store)
+    quote = quote_policy_renewal.invoke({"policy_id": "p5", "as_of_date": "2025-06-01"})
+    assert quote["policy_type"] == "Auto" and quote["deductible"] == 250.0
+
+
+def test_missing_deductible_uses_the_type_default():
+    policies = {
+        "a": {"policy_type": "Home", "coverage_amount": 100000, "deductible": 0.0},
+        "b": {"policy_type": "Home", "coverage_amount": 100000},
+    }
+    quote = quote_policies(policies, {}, [], as_of="2025-06-01")
+    assert list(quote["deductible"]) == [0.0, DEDUCTIBLES[type_codes(["Home"])[0]]]
@@ -0,0 +1,49 @@
+"""Hedged calls are charged per request and recorded once; workers degrade when the LLM is unavailable."""
+
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from resilience import RateLimiter, ResiliencePolicy, ResilientModel, ResponseCache, record_call
+from worker_pool import _degraded_answer
+
+
+def test_hedged_call_records_only_the_winner():
+    calls = []
+    recorded = []
+    lock = threading.Lock()
+
+    def model(question):
+        with lock:
+            calls.append(question)
+            attempt = len(calls)
+        # The first attempt is slow, so the backup wins
+        time.sleep(0.3 if attempt == 1 else 0.01)
+        record_call(lambda: recorded.append(attempt))
+        return f"answer {attempt}"
+
+    limiter = RateLimiter(requests_per_minute=6)
+    resilient = ResilientModel(RunnableLambda(model), ResiliencePolicy(limiter=limiter, hedge_after_s=0.05))
+    assert resilient.invoke("q") == "answer 2"
+    time.sleep(0.4)
+    assert len(calls) == 2 and recorded == [2]
+    # One request token per attempt
+    assert limiter.requests._tokens < 4.5
+
+
+def test_unhedged_call_records_immediately():
+    recorded = []
+    resilient = ResilientModel(RunnableLambda(lambda q: record_call(lambda: recorded.append(q)) or q),
+                               ResiliencePolicy(hedge_after_s=1.0))
+    assert resilient.invoke("q") == "q" and recorded == ["q"]
+
+
+def test_degraded_answer_prefers_fast_path_then_cache():
+    cache = ResponseCache()
+    cache.put("any open claims?", "You have one open claim.", scope="u2")
+    no_fast_path = lambda question: None  # noqa: E731
+    assert _degraded_answer("claim c2 status", None, cache, lambda q: "c2 is Approved")["route"] == "fast_path"
+    assert _degraded_answer("Any open claims", "u2", cache, no_fast_path) == {
+        "answer": "You have one open claim.", "route": "cache", "degraded": True}
+    assert _degraded_answer("any open claims?", "u3", cache, no_fast_path)["retryable"] is True
@@ -0,0 +1,55 @@
+"""Sharded scans page through each shard once and the route cache stays bounded."""
+
+from langgraph.store.base import PutOp
+from langgraph.store.memory import InMemoryStore
+
+import metrics
+import sharded_store
+from inmemory_store import claims_namespace
+from sharded_store import ShardedStore
+
+
+def _store(claims=3000):
+    store = ShardedStore({f"shard-{i}": InMemoryStore() for i in range(3)})
+    store.batch([PutOp(claims_namespace, f"sc{i:05d}", {"user_id": f"u{i % 40}", "status": ["Open", "Closed"][i % 2]})
+                 for i in range(claims)])
+    return store
+
+
+def _pages(store, limit, **kwargs):
+    items, offset = [], 0
+    while True:
+        page = store.search(claims_namespace, limit=limit, offset=offset, **kwargs)
+        items.extend(page)
+        if len(page) < limit:
+            return items
+        offset += limit
+
+
+def test_paged_scan_resumes_from_cursors():
+    store = _store()
+    metrics.reset()
+    keys = [item.key for item in _pages(store, 70)]
+    assert len(keys) == len(set(keys)) == 3000
+    closed = [item.key for item in _pages(store, 40, filter={"status": "Closed"})]
+    assert sorted(closed) == [f"sc{i:05d}" for i in range(1, 3000, 2)]
+    assert "sharded_store.cursor_misses" not in str(metrics.snapshot())
+    store.close()
+
+
+def test_pages_without_a_cursor_match_the_scan():
+    store = _store()
+    keys = [item.key for item in _pages(store, 70)]
+    fresh = _store()
+    assert [item.key for item in fresh.search(claims_namespace, limit=70, offset=1400)] == keys[1400:1470]
+    store.close()
+    fresh.close()
+
+
+def test_route_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(sharded_store, "MAX_ROUTES", 100)
+    store = _store(500)
+    for i in range(500):
+        assert store.get(claims_namespace, f"sc{i:05d}").value["user_id"] == f"u{i % 40}"
+    assert len(store._routes) == 100
+    store.close()
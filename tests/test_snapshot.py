@@ -0,0 +1,99 @@
+"""Snapshots page by seeking and carry indexes that load instead of rebuilding."""
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+import metrics
+from claim_search import get_claim_index
+from date_index import get_date_indexes
+from inmemory_store import bootstrap_memory_store, claims_namespace, search_all
+from insurance_tools import add_new_claim, set_default_store, update_claim_status
+from snapshot import SnapshotStore, write_snapshot
+from vector_index import get_semantic_index
+
+CLAIMS = 2500
+
+
+@pytest.fixture
+def stores(tmp_path):
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    for i in range(CLAIMS):
+        store.put(claims_namespace, f"s{i:05d}", {
+            "policy_id": f"p{i % 12 + 1}",
+            "user_id": f"u{i % 10 + 1}",
+            "claim_type": ["Vehicle Damage", "Water Damage", "Theft"][i % 3],
+            "claim_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "amount": float(100 + i),
+            "status": "Processing",
+            "description": f"Synthetic claim {i} burst pipe flooded kitchen" if i % 7 == 0
+            else f"Synthetic claim {i} rear bumper dented in parking lot",
+        })
+    path = str(tmp_path / "store.snap")
+    write_snapshot(store, path)
+    snapshot = SnapshotStore(path)
+    yield store, snapshot
+    snapshot.close()
+
+
+def _keys(items):
+    return [(item.namespace, item.key) for item in items]
+
+
+def test_unfiltered_pages_cover_every_record_once(stores):
+    store, snapshot = stores
+    snapshot.delete(claims_namespace, "s00003")
+    snapshot.delete(claims_namespace, "c1")
+    snapshot.put(claims_namespace, "s00010", {"status": "Approved"})
+    snapshot.put(claims_namespace, "z1", {"status": "Approved"})
+
+    pages = []
+    offset = 0
+    while True:
+        page = snapshot.search((), limit=37, offset=offset)
+        pages.extend(page)
+        if len(page) < 37:
+            break
+        offset += 37
+    expected = {(item.namespace, item.key) for item in search_all(store, ())}
+    expected -= {(claims_namespace, "s00003"), (claims_namespace, "c1")}
+    expected.add((claims_namespace, "z1"))
+    assert len(pages) == len(expected) and set(_keys(pages)) == expected
+    claim_keys = [key for key in _keys(pages) if key[0] == claims_namespace]
+    assert _keys(snapshot.search(claims_namespace, limit=5, offset=3)) == claim_keys[3:8]
+
+
+def test_filtered_pages_match_a_full_scan(stores):
+    _, snapshot = stores
+    snapshot.put(claims_namespace, "s00004", {"status": "Approved"})
+    approved = _keys(search_all(snapshot, claims_namespace, filter={"status": "Approved"}))
+    assert _keys(snapshot.search(claims_namespace, filter={"status": "Approved"}, limit=2, offset=1)) == approved[1:3]
+
+
+def test_indexes_load_from_the_snapshot(stores):
+    store, snapshot = stores
+    metrics.reset()
+    claims, semantic, dates = get_claim_index(snapshot), get_semantic_index(snapshot), get_date_indexes(snapshot)
+    assert "indexes.load_ms" in str(metrics.snapshot())
+
+    assert claims.search("burst pipe kitchen", limit=20) == get_claim_index(store).search("burst pipe kitchen", limit=20)
+    query = semantic.embed("Water Damage. burst pipe flooded kitchen")
+    assert semantic.claims._centroids is not None
+    assert semantic.claims.search(query, k=10) == get_semantic_index(store).claims.search(query, k=10)
+    assert dates.claims_by_date.range(0, 10 ** 7) == get_date_indexes(store).claims_by_date.range(0, 10 ** 7)
+
+
+def test_loaded_indexes_accept_writes(stores):
+    _, snapshot = stores
+    set_default_store(snapshot)
+    claims, semantic = get_claim_index(snapshot), get_semantic_index(snapshot)
+    add_new_claim.invoke({"customer_id": "u1", "policy_id": "p1", "amount": 300.0,
+                          "description": "Chipped molar fixed by the orthodontist"})
+    for i in range(1000):
+        update_claim_status.invoke({"claim_id": f"s{i:05d}", "new_status": "Approved"})
+
+    hits, total = claims.search("orthodontist molar")
+    assert total == 1 and snapshot.get(claims_namespace, hits[0][0]).value["user_id"] == "u1"
+    query = semantic.embed("Medical. Chipped molar fixed by the orthodontist")
+    assert semantic.claims.search(query, k=1)[0][0] == hits[0][0]
+    assert len(claims) == CLAIMS + 11
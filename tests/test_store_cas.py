@@ -0,0 +1,80 @@
+"""Optimistic transactions under concurrent read-modify-write (no lost updates)."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+from inmemory_store import (ConflictError, Transaction, bootstrap_memory_store, claims_namespace,
+                            compare_and_swap, get_versioned, run_transaction, search_all)
+from insurance_tools import set_default_store, update_claim_status
+
+CLAIM_IDS = [f"c{i}" for i in range(1, 11)]
+
+
+def _bump(store, claim_id):
+    def bump(tx):
+        claim = tx.get(claims_namespace, claim_id)
+        time.sleep(0)  # yield between read and write, as real I/O would
+        claim["revision_count"] = claim.get("revision_count", 0) + 1
+        tx.put(claims_namespace, claim_id, claim)
+    run_transaction(store, bump, max_attempts=1000)
+
+
+def test_concurrent_transactions_lose_no_updates():
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    threads, updates = 16, 200
+
+    def worker(thread_index):
+        for i in range(updates):
+            _bump(store, CLAIM_IDS[(thread_index + i) % len(CLAIM_IDS)])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+
+    values = [get_versioned(store, claims_namespace, claim_id) for claim_id in CLAIM_IDS]
+    assert sum(value["revision_count"] for value, _ in values) == threads * updates
+    assert sum(version for _, version in values) == threads * updates
+
+
+def test_update_claim_status_bumps_the_version_once_per_call():
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    set_default_store(store)
+    statuses = ["Processing", "Approved", "Under Investigation"]
+    calls = 320
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(
+            lambda i: update_claim_status.invoke({"claim_id": CLAIM_IDS[i % len(CLAIM_IDS)],
+                                                  "new_status": statuses[i % len(statuses)]}),
+            range(calls)))
+
+    assert all(result.get("success") for result in results)
+    assert sum(get_versioned(store, claims_namespace, claim_id)[1] for claim_id in CLAIM_IDS) == calls
+
+
+def test_stale_reads_conflict():
+    store = InMemoryStore()
+    bootstrap_memory_store(store)
+    stale = Transaction(store)
+    claim = stale.get(claims_namespace, "c1")
+    _bump(store, "c1")
+    stale.put(claims_namespace, "c1", {**claim, "status": "Closed"})
+
+    with pytest.raises(ConflictError):
+        stale.commit()
+    with pytest.raises(ConflictError):
+        compare_and_swap(store, claims_namespace, "c1", 0, claim)
+    assert get_versioned(store, claims_namespace, "c1")[0]["status"] == "Approved"
+
+
+def test_search_all_returns_every_matching_record():
+    store = InMemoryStore()
+    for i in range(2500):
+        store.put(claims_namespace, f"s{i}", {"status": "Approved" if i % 3 else "Denied"})
+
+    assert len({item.key for item in search_all(store, claims_namespace)}) == 2500
+    denied = search_all(store, claims_namespace, filter={"status": "Denied"})
+    assert {item.key for item in denied} == {f"s{i}" for i in range(0, 2500, 3)}
@@ -0,0 +1,44 @@
+"""Repeated tool calls are answered only from earlier successful results."""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from tool_dedup import find_duplicates
+
+
+def _call(call_id, name="get_claim_status", claim_id="c1"):
+    return {"id": call_id, "name": name, "args": {"claim_id": claim_id}}
+
+
+def _step(*calls):
+    return AIMessage(content="", tool_calls=list(calls))
+
+
+def _result(call_id, content='{"status": "Approved"}', status="success"):
+    return ToolMessage(content=content, tool_call_id=call_id, status=status)
+
+
+def test_repeat_of_a_successful_call_is_back_referenced():
+    messages = [HumanMessage("status of c1?"), _step(_call("a")), _result("a"), _step(_call("b"), _call("c", claim_id="c2"))]
+    duplicates = find_duplicates(messages)
+    assert [(m.tool_call_id, "tool_call_id a" in m.content) for m in duplicates] == [("b", True)]
+
+
+def test_repeats_in_the_same_step_execute():
+    assert find_duplicates([HumanMessage("status of c1?"), _step(_call("a"), _call("b"))]) == []
+
+
+def test_repeats_of_failed_calls_execute():
+    messages = [HumanMessage("status of c1?"),
+                _step(_call("a"), _call("b", claim_id="c2")),
+                _result("a", "Store timed out", status="error"),
+                _result("b", '{"error": "Claim c2 not found"}'),
+                _step(_call("c"), _call("d", claim_id="c2"))]
+    assert find_duplicates(messages) == []
+
+
+def test_reads_beside_a_write_are_not_reused():
+    messages = [HumanMessage("approve c1"),
+                _step(_call("a"), _call("w", name="update_claim_status")),
+                _result("a"), _result("w", '{"success": true}'),
+                _step(_call("b"))]
+    assert find_duplicates(messages) == []
@@ -0,0 +1,71 @@
+"""Vector index re-embeds only changed text and reclaims replaced rows."""
+
+import numpy as np
+from langgraph.store.memory import InMemoryStore
+
+from change_log import ChangeCapturingStore, ChangeLog
+from inmemory_store import bootstrap_memory_store, claims_namespace, run_transaction
+from insurance_tools import add_new_claim, set_default_store, update_claim_status
+from vector_index import IVFIndex, get_semantic_index
+
+
+def _logged_store():
+    store = ChangeCapturingStore(InMemoryStore(), ChangeLog())
+    bootstrap_memory_store(store)
+    return store
+
+
+def test_status_updates_are_not_re_embedded():
+    store = _logged_store()
+    set_default_store(store)
+    semantic = get_semantic_index(store)
+    statuses = ["Approved", "Processing"]
+    for i in range(2000):
+        update_claim_status.invoke({"claim_id": "c2", "new_status": statuses[i % 2]})
+    get_semantic_index(store)
+    assert len(semantic.claims) == 10 and semantic.claims._size == 10
+
+
+def test_new_claim_is_embedded_once():
+    store = _logged_store()
+    set_default_store(store)
+    get_semantic_index(store)
+    add_new_claim.invoke({"customer_id": "u1", "policy_id": "p1", "amount": 300.0,
+                          "description": "Cracked tooth repaired at the dentist"})
+    assert get_semantic_index(store).claims._size == 11
+
+
+def test_description_changes_are_compacted():
+    store = _logged_store()
+    semantic = get_semantic_index(store)
+    for i in range(500):
+        def update(tx):
+            claim = tx.get(claims_namespace, "c2")
+            claim["description"] = f"Collision damage revision {i} hit and run"
+            tx.put(claims_namespace, "c2", claim)
+        run_transaction(store, update)
+        get_semantic_index(store)
+
+    assert semantic.claims._size <= 10 / (1 - semantic.claims.compact_fraction) + 1
+    query = semantic.embed("Vehicle Damage. Collision damage revision 499 hit and run")
+    assert semantic.claims.search(query, k=1)[0][0] == "c2"
+
+
+def test_retraining_reclaims_dead_rows():
+    rng = np.random.default_rng(0)
+
+    def vectors(n):
+        matrix = rng.normal(size=(n, 16)).astype(np.float32)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    index = IVFIndex(16, min_train_size=200)
+    ids = [f"v{i}" for i in range(400)]
+    index.add(ids, vectors(400))
+    assert index._centroids is not None
+    for _ in range(5):
+        index.add(ids[:100], vectors(100))
+
+    assert len(index) == 400
+    assert index._size <= 400 / (1 - index.compact_fraction) + 1
+    replaced = index.get_vector("v0")
+    assert index.search(replaced, k=1, n_probe=len(index._centroids))[0][0] == "v0"
@@ -0,0 +1,133 @@
+"""Workers read a mapped replica of the parent store and are restarted by the zygote."""
+
+import os
+import signal
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+from langgraph.store.memory import InMemoryStore
+
+import metrics
+from change_log import ChangeCapturingStore, ChangeLog
+from inmemory_store import bootstrap_memory_store, claims_namespace, run_transaction
+from worker_pool import WorkerPool, WorkerZygote
+
+# Held by a parent thread while workers start
+_PARENT_LOCK = threading.Lock()
+
+
+def _set_status(store, claim_id, status):
+    def update(tx):
+        claim = tx.get(claims_namespace, claim_id)
+        claim["status"] = status
+        tx.put(claims_namespace, claim_id, claim)
+    run_transaction(store, update)
+
+
+class StatusAgent:
+    """Answers "<claim id>" with the claim's status, "set <claim id> <status>" by updating it, "pid" with its pid."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def invoke(self, state, config=None):
+        words = state["messages"][0].content.split()
+        if words[0] == "set":
+            _set_status(self.store, words[1], words[2])
+            answer = "ok"
+        elif words[0] == "pid":
+            answer = str(os.getpid())
+        else:
+            answer = f"{type(self.store).__name__} {self.store.get(claims_namespace, words[0]).value['status']}"
+        return {"messages": [AIMessage(content=answer)]}
+
+
+def _pool(store):
+    return WorkerPool(store, workers=2, agent_factory=StatusAgent, threads_per_worker=2, use_fast_path=False)
+
+
+def _sessions(pool):
+    """One session ID routed to each worker."""
+    sessions = {}
+    for i in range(100):
+        sessions.setdefault(pool.worker_for(f"s{i}"), f"s{i}")
+    return sessions[0], sessions[1]
+
+
+def _logged_store():
+    store = ChangeCapturingStore(InMemoryStore(), ChangeLog())
+    bootstrap_memory_store(store)
+    return store
+
+
+def test_workers_read_the_replica_and_see_every_commit():
+    store = _logged_store()
+    with _pool(store) as pool:
+        first, second = _sessions(pool)
+        metrics.reset()
+        assert pool.ask(first, "c2", timeout=30)["answer"] == "ReplicaStore Processing"
+        assert "method=batch" not in str(metrics.snapshot())
+
+        assert pool.ask(first, "set c2 Denied", timeout=30)["answer"] == "ok"
+        assert store.get(claims_namespace, "c2").value["status"] == "Denied"
+        assert pool.ask(second, "c2", timeout=30)["answer"] == "ReplicaStore Denied"
+        _set_status(store, "c2", "Approved")
+        assert pool.ask(first, "c2", timeout=30)["answer"] == "ReplicaStore Approved"
+
+
+def test_concurrent_worker_transactions_lose_no_updates():
+    store = _logged_store()
+    before = [store.get(claims_namespace, f"c{i}").value.get("_version", 0) for i in range(1, 6)]
+    with _pool(store) as pool:
+        first, second = _sessions(pool)
+        futures = [pool.submit(session, f"set c{i % 5 + 1} s{i}") for i in range(40) for session in (first, second)]
+        assert all(future.result(timeout=60)["answer"] == "ok" for future in futures)
+    versions = [store.get(claims_namespace, f"c{i}").value["_version"] for i in range(1, 6)]
+    assert sum(versions) - sum(before) == 80
+
+
+def test_dead_worker_is_replaced():
+    store = _logged_store()
+    with _pool(store) as pool:
+        first, _ = _sessions(pool)
+        pid = int(pool.ask(first, "pid", timeout=30)["answer"])
+        os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if int(pool.ask(first, "pid", timeout=30)["answer"]) != pid:
+                    break
+            except RuntimeError:
+                # Sent to the dead worker before the pool noticed
+                pass
+            time.sleep(0.1)
+        else:
+            raise AssertionError("Worker was not restarted")
+        assert pool.ask(first, "c2", timeout=30)["answer"] == "ReplicaStore Processing"
+
+
+def _agent_after_parent_lock(store):
+    with _PARENT_LOCK:
+        return StatusAgent(store)
+
+
+def test_workers_inherit_no_lock_held_by_a_parent_thread():
+    zygote = WorkerZygote().start()
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with _PARENT_LOCK:
+            held.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        with WorkerPool(_logged_store(), workers=1, agent_factory=_agent_after_parent_lock,
+                        use_fast_path=False, zygote=zygote) as pool:
+            assert pool.ask("s1", "c2", timeout=30)["answer"] == "ReplicaStore Processing"
+    finally:
+        release.set()
+        thread.join()
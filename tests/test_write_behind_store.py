@@ -0,0 +1,64 @@
+"""Write-behind flushes report failed commits and do not wait for later writes."""
+
+import threading
+import time
+
+import pytest
+from langgraph.store.memory import InMemoryStore
+
+import write_behind_store
+from write_behind_store import WriteBehindError, WriteBehindStore
+
+
+class FlakyStore(InMemoryStore):
+    """InMemoryStore whose batches fail while `failing` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = False
+
+    def batch(self, ops):
+        if self.failing:
+            raise ConnectionError("backend unavailable")
+        return super().batch(ops)
+
+
+def test_failed_writes_raise_until_committed(monkeypatch):
+    monkeypatch.setattr(write_behind_store, "_COMMIT_ATTEMPTS", 1)
+    backend = FlakyStore()
+    store = WriteBehindStore(backend, max_delay_s=0.001)
+    backend.failing = True
+    store.put(("claims",), "c1", {"status": "Approved"})
+    with pytest.raises(WriteBehindError):
+        store.flush()
+    assert store.get(("claims",), "c1").value == {"status": "Approved"}
+
+    backend.failing = False
+    store.put(("claims",), "c2", {"status": "Denied"})
+    store.flush()
+    assert backend.get(("claims",), "c1").value == {"status": "Approved"}
+    assert backend.get(("claims",), "c2").value == {"status": "Denied"}
+    store.close()
+
+
+def test_flush_returns_under_sustained_writes():
+    store = WriteBehindStore(InMemoryStore(), max_delay_s=0.001)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            store.put(("claims",), f"c{i % 100}", {"n": i})
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        time.sleep(0.05)
+        store.put(("claims",), "marker", {"n": -1})
+        store.flush()
+        assert store.backend.get(("claims",), "marker") is not None
+    finally:
+        stop.set()
+        thread.join()
+    store.close()